@@ -0,0 +1,33 @@
+from pathlib import Path
+
+from extractors.excel_extractor import extract_header_text_from_excel
+from extractors.image_extractor import extract_text_from_image, iter_multipage_image_text
+from extractors.pdf_extractor import extract_header_text_from_pdf
+from utils.filters import is_useful_line, clean_text
+
+EXCEL_EXTENSIONS = {".xls", ".xlsx"}
+PDF_EXTENSIONS = {".pdf"}
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg"}
+TIFF_EXTENSIONS = {".tif", ".tiff"}
+SUPPORTED_EXTENSIONS = EXCEL_EXTENSIONS | PDF_EXTENSIONS | IMAGE_EXTENSIONS | TIFF_EXTENSIONS
+
+
+def extract_document_text(path):
+    """
+    Headless counterpart of the upload branch in mainapp.py: returns the
+    header-relevant text of an Excel, PDF, image or TIFF file.
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+
+    if suffix in EXCEL_EXTENSIONS:
+        _, text = extract_header_text_from_excel(path)
+        return text
+    if suffix in PDF_EXTENSIONS:
+        return clean_text(extract_header_text_from_pdf(path, budget_filter=is_useful_line))
+    if suffix in IMAGE_EXTENSIONS:
+        return extract_text_from_image(path)
+    if suffix in TIFF_EXTENSIONS:
+        return "\n".join(text for _, text in iter_multipage_image_text(path))
+
+    raise ValueError(f"Unsupported file format: {path.suffix}")
@@ -1,10 +1,229 @@
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+import openpyxl
 import pandas as pd
 import streamlit as st
+import xlrd
 from utils.filters import is_excluded_line
 
+try:
+    from python_calamine import CalamineWorkbook
+except ImportError:  # optional fast reader
+    CalamineWorkbook = None
+
+EXCLUDED_SHEETS = ["sheet1", "xdo_metadata"]
+# Only this top-left block is ever scanned for labels.
+HEADER_SCAN_ROWS = 100
+HEADER_SCAN_COLS = 20
+PREVIEW_ROWS = 40
+WORKBOOK_CACHE_SIZE = 8
+# Full sheets are large; only the one being previewed is kept, not one per cached workbook.
+FULL_SHEET_CACHE_SIZE = 1
+
+XLSX_MAGIC = b"PK\x03\x04"
+XLS_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+
+
+def _file_bytes(uploaded_file):
+    if isinstance(uploaded_file, (bytes, bytearray)):
+        return bytes(uploaded_file)
+    if hasattr(uploaded_file, "getvalue"):
+        return uploaded_file.getvalue()
+    with open(uploaded_file, "rb") as f:
+        return f.read()
+
+
+def sniff_excel_format(data):
+    """Returns "xlsx" for zip-based workbooks, "xls" for legacy OLE2 files, None otherwise."""
+    if data[:4] == XLSX_MAGIC:
+        return "xlsx"
+    if data[:8] == XLS_MAGIC:
+        return "xls"
+    return None
+
+
+def _select_engines(file_format):
+    """
+    Returns (window_engine, full_engine). calamine parses whole sheets fastest,
+    but always materializes the full sheet, so for .xlsx header windows the
+    streaming openpyxl read-only reader wins; for .xls (where xlrd also loads
+    the full sheet) calamine is preferred for both.
+    """
+    fallback = "openpyxl" if file_format == "xlsx" else "xlrd"
+    full_engine = "calamine" if CalamineWorkbook is not None else fallback
+    window_engine = "openpyxl" if file_format == "xlsx" else full_engine
+    return window_engine, full_engine
+
+
+def _cell_text(value):
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _xlrd_cell_value(cell, datemode):
+    if cell.ctype == xlrd.XL_CELL_DATE:
+        try:
+            return xlrd.xldate.xldate_as_datetime(cell.value, datemode)
+        except xlrd.xldate.XLDateError:
+            return cell.value
+    if cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK):
+        return None
+    return cell.value
+
+
+class ExcelWorkbook:
+    """
+    An opened workbook plus the header windows already read from it, so
+    switching sheets back and forth or rerunning the app never re-parses the
+    file.
+    """
+
+    def __init__(self, data, digest=None):
+        self.data = data
+        self.digest = digest or hashlib.sha256(data).hexdigest()
+        self.format = sniff_excel_format(data)
+        if self.format is None:
+            raise ValueError("Unrecognized Excel file: expected .xlsx (zip) or .xls (OLE2) content.")
+        self.engine, self.full_engine = _select_engines(self.format)
+        self._windows = {}
+        # Cached workbooks are shared between sessions; the readers are not thread-safe.
+        self._lock = threading.Lock()
+
+        if self.engine == "calamine":
+            self._book = CalamineWorkbook.from_filelike(io.BytesIO(data))
+            self.sheet_names = list(self._book.sheet_names)
+        elif self.engine == "openpyxl":
+            self._book = openpyxl.load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+            self.sheet_names = list(self._book.sheetnames)
+        else:
+            self._book = xlrd.open_workbook(file_contents=data, on_demand=True)
+            self.sheet_names = self._book.sheet_names()
+
+    def _read_rows(self, sheet_name, max_rows, max_cols):
+        if self.engine == "calamine":
+            sheet = self._book.get_sheet_by_name(sheet_name)
+            return [
+                [_cell_text(value) for value in row[:max_cols]]
+                for row in sheet.to_python(skip_empty_area=False, nrows=max_rows)
+            ]
+        if self.engine == "openpyxl":
+            return [
+                [_cell_text(value) for value in row]
+                for row in self._book[sheet_name].iter_rows(max_row=max_rows, max_col=max_cols, values_only=True)
+            ]
+        sheet = self._book.sheet_by_name(sheet_name)
+        try:
+            return [
+                [_cell_text(_xlrd_cell_value(cell, self._book.datemode)) for cell in sheet.row_slice(r, 0, min(max_cols, sheet.ncols))]
+                for r in range(min(max_rows, sheet.nrows))
+            ]
+        finally:
+            self._book.unload_sheet(sheet_name)
+
+    def header_window(self, sheet_name, max_rows=HEADER_SCAN_ROWS, max_cols=HEADER_SCAN_COLS):
+        """
+        The top-left max_rows x max_cols block of a sheet as strings; the rest
+        of the sheet is never materialized.
+        """
+        key = (sheet_name, max_rows, max_cols)
+        with self._lock:
+            if key not in self._windows:
+                rows = self._read_rows(sheet_name, max_rows, max_cols)
+                width = max((len(row) for row in rows), default=0)
+                self._windows[key] = pd.DataFrame([row + [""] * (width - len(row)) for row in rows])
+            return self._windows[key]
+
+    def full_sheet(self, sheet_name):
+        """
+        The whole sheet as strings, only needed when a full preview is
+        requested. Reruns showing the same preview reuse it; see
+        FULL_SHEET_CACHE_SIZE.
+        """
+        key = (self.digest, sheet_name)
+        with self._lock:
+            with _full_sheet_cache_lock:
+                if key in _full_sheet_cache:
+                    _full_sheet_cache.move_to_end(key)
+                    return _full_sheet_cache[key]
+            df = pd.read_excel(io.BytesIO(self.data), sheet_name=sheet_name, header=None, engine=self.full_engine)
+            df = df.fillna("").astype(str)
+            with _full_sheet_cache_lock:
+                _full_sheet_cache[key] = df
+                while len(_full_sheet_cache) > FULL_SHEET_CACHE_SIZE:
+                    _full_sheet_cache.popitem(last=False)
+            return df
+
+
+_workbook_cache = OrderedDict()
+_workbook_cache_lock = threading.Lock()
+_full_sheet_cache = OrderedDict()
+_full_sheet_cache_lock = threading.Lock()
+
+
+def get_workbook(data):
+    """ExcelWorkbook for these bytes, reused across reruns by content hash (small LRU)."""
+    key = hashlib.sha256(data).hexdigest()
+    with _workbook_cache_lock:
+        if key in _workbook_cache:
+            _workbook_cache.move_to_end(key)
+            return _workbook_cache[key]
+    workbook = ExcelWorkbook(data, key)
+    with _workbook_cache_lock:
+        _workbook_cache[key] = workbook
+        while len(_workbook_cache) > WORKBOOK_CACHE_SIZE:
+            _workbook_cache.popitem(last=False)
+    return workbook
+
+
+def release_full_sheets():
+    """Drops the cached full sheet, e.g. once its preview is closed."""
+    with _full_sheet_cache_lock:
+        _full_sheet_cache.clear()
+
+
+def header_text_from_window(window_df):
+    seen = set()
+    ordered_lines = []
+
+    for row in window_df.values.tolist():
+        for cell in row:
+            clean = cell.strip()
+            if clean and not is_excluded_line(clean) and clean not in seen:
+                seen.add(clean)
+                ordered_lines.append(clean)
+
+    return "\n".join(ordered_lines)
+
+
+def usable_sheet_names(workbook):
+    return [s for s in workbook.sheet_names if s.lower() not in EXCLUDED_SHEETS]
+
+
+def extract_header_text_from_excel(excel_file, sheet_name=None):
+    """
+    Headless variant of extract_text_from_excel: returns (sheet_name, text)
+    for the given sheet, or the first usable one.
+    """
+    workbook = get_workbook(_file_bytes(excel_file))
+    sheet_names = usable_sheet_names(workbook)
+    if not sheet_names:
+        raise ValueError("No usable sheets found in this Excel file.")
+    sheet_name = sheet_name or sheet_names[0]
+    return sheet_name, header_text_from_window(workbook.header_window(sheet_name))
+
+
 def extract_text_from_excel(uploaded_file):
-    excel = pd.ExcelFile(uploaded_file, engine="xlrd")  # For .xls files
-    sheet_names = [s for s in excel.sheet_names if s.lower() not in ["sheet1", "xdo_metadata"]]
+    try:
+        workbook = get_workbook(_file_bytes(uploaded_file))
+    except ValueError as e:
+        return None, None, str(e)
+    sheet_names = usable_sheet_names(workbook)
 
     if not sheet_names:
         return None, None, "No usable sheets found in this Excel file."
@@ -16,24 +235,19 @@ def extract_text_from_excel(uploaded_file):
         key="sheet_selector"
     )
 
-    df = pd.read_excel(excel, sheet_name=selected_sheet, header=None)
-    df = df.fillna("").astype(str)
+    df = workbook.header_window(selected_sheet)
 
-    st.write("📊 Excel Preview (first 40 rows):")
-    st.dataframe(df.head(40))
+    st.write(f"📊 Excel Preview (first {PREVIEW_ROWS} rows):")
+    st.dataframe(df.head(PREVIEW_ROWS))
 
-    scanned_block = df.iloc[:100, :20]
-    seen = set()
-    ordered_lines = []
-
-    for row in scanned_block.values.tolist():
-        for cell in row:
-            clean = cell.strip()
-            if clean and not is_excluded_line(clean) and clean not in seen:
-                seen.add(clean)
-                ordered_lines.append(clean)
+    if st.checkbox("Load full sheet preview", key="excel_full_preview"):
+        full_df = workbook.full_sheet(selected_sheet)
+        st.write(f"📊 Full sheet: {len(full_df)} rows")
+        st.dataframe(full_df)
+    else:
+        release_full_sheets()
 
-    text = "\n".join(ordered_lines)
+    text = header_text_from_window(df)
 
     # unique key for text_area
     st.text_area(
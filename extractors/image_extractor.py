@@ -1,10 +1,184 @@
-from PIL import Image
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from PIL import Image, ImageSequence
 import pytesseract
 import numpy as np
 import cv2
 
-def extract_text_from_image(image_file):
-    image = Image.open(image_file)
-    image_cv = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-    gray = cv2.cvtColor(image_cv, cv2.COLOR_BGR2GRAY)
-    return pytesseract.image_to_string(gray)
+OCR_TARGET_DPI = int(os.getenv("OCR_TARGET_DPI", "300"))
+# Long-side cap for every image, DPI or not (phone photos are often 4000px+).
+OCR_MAX_DIMENSION = int(os.getenv("OCR_MAX_DIMENSION", "2500"))
+OCR_MIN_DIMENSION = 1000
+# DPI at or below this is a camera/screen default (72, 96), not a scan resolution.
+MIN_TRUSTED_DPI = 96
+OCR_PSM = int(os.getenv("OCR_PSM", "3"))
+OCR_OEM = int(os.getenv("OCR_OEM", "3"))
+# Fraction of the page height (from the top) searched for text; 1.0 = whole page.
+OCR_HEADER_FRACTION = float(os.getenv("OCR_HEADER_FRACTION", "1.0"))
+OCR_MAX_WORKERS = int(os.getenv("OCR_MAX_WORKERS", "2"))
+MIN_DESKEW_ANGLE = 0.5
+
+
+def _load_image(image_file):
+    if isinstance(image_file, Image.Image):
+        return image_file
+    if isinstance(image_file, (bytes, bytearray)):
+        return Image.open(io.BytesIO(image_file))
+    return Image.open(image_file)
+
+
+def _image_source(image_file):
+    """Picklable form of an upload for the worker processes."""
+    if isinstance(image_file, (str, Path)):
+        return str(image_file)
+    if isinstance(image_file, (bytes, bytearray)):
+        return bytes(image_file)
+    if isinstance(image_file, Image.Image):
+        buffer = io.BytesIO()
+        save_kwargs = {"dpi": image_file.info["dpi"]} if image_file.info.get("dpi") else {}
+        image_file.save(buffer, format="PNG", **save_kwargs)
+        return buffer.getvalue()
+    if hasattr(image_file, "getvalue"):
+        return image_file.getvalue()
+    return image_file.read()
+
+
+def to_grayscale(image):
+    image_cv = cv2.cvtColor(np.array(image.convert("RGB")), cv2.COLOR_RGB2BGR)
+    return cv2.cvtColor(image_cv, cv2.COLOR_BGR2GRAY)
+
+
+def normalize_resolution(gray, dpi=None, target_dpi=OCR_TARGET_DPI):
+    """
+    Rescales to target_dpi when a real scan DPI is known, otherwise brings
+    tiny images up to OCR_MIN_DIMENSION. The long side is always capped at
+    OCR_MAX_DIMENSION, so a 72 DPI phone photo is never blown up.
+    """
+    height, width = gray.shape[:2]
+    long_side = max(height, width)
+    if dpi and float(dpi) > MIN_TRUSTED_DPI:
+        scale = target_dpi / float(dpi)
+    elif long_side < OCR_MIN_DIMENSION:
+        scale = OCR_MIN_DIMENSION / long_side
+    else:
+        scale = 1.0
+    scale = min(scale, OCR_MAX_DIMENSION / long_side)
+    if abs(scale - 1.0) < 0.05:
+        return gray
+    interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC
+    return cv2.resize(gray, (max(1, int(width * scale)), max(1, int(height * scale))), interpolation=interpolation)
+
+
+def binarize(gray):
+    """Otsu threshold after a light blur; text ends up black on white."""
+    blurred = cv2.GaussianBlur(gray, (3, 3), 0)
+    _, binary = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return binary
+
+
+def deskew(binary):
+    coords = np.column_stack(np.where(binary < 128))
+    if len(coords) < 50:
+        return binary
+    angle = cv2.minAreaRect(coords[:, ::-1].astype(np.float32))[-1]
+    # OpenCV reports the rectangle angle in (0, 90]; map it to the smallest rotation.
+    if angle > 45:
+        angle -= 90
+    if abs(angle) < MIN_DESKEW_ANGLE:
+        return binary
+    height, width = binary.shape[:2]
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    return cv2.warpAffine(binary, matrix, (width, height), flags=cv2.INTER_CUBIC, borderValue=255)
+
+
+def detect_text_regions(binary, header_fraction=OCR_HEADER_FRACTION):
+    """
+    Bounding boxes (x, y, w, h) of text-like blocks, found by dilating the ink
+    horizontally so characters merge into words and lines.
+    """
+    height, width = binary.shape[:2]
+    inverted = 255 - binary
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(15, width // 80), max(3, height // 300)))
+    dilated = cv2.dilate(inverted, kernel, iterations=1)
+    contours, _ = cv2.findContours(dilated, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    limit = int(height * header_fraction)
+    regions = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        # Skip specks and page-sized blobs (borders, photos).
+        if h < 8 or w < 8 or (w > 0.95 * width and h > 0.5 * height):
+            continue
+        if y >= limit:
+            continue
+        regions.append((x, y, w, h))
+    return sorted(regions, key=lambda r: (r[1], r[0]))
+
+
+def preprocess_image(image, header_fraction=OCR_HEADER_FRACTION):
+    """
+    Returns the OCR-ready binary image cropped to the detected text regions;
+    everything outside those regions is painted white.
+    """
+    gray = normalize_resolution(to_grayscale(image), dpi=(image.info.get("dpi") or (None,))[0])
+    binary = deskew(binarize(gray))
+    regions = detect_text_regions(binary, header_fraction)
+    if not regions:
+        return binary
+
+    mask = np.full_like(binary, 255)
+    for x, y, w, h in regions:
+        mask[y:y + h, x:x + w] = binary[y:y + h, x:x + w]
+
+    pad = 10
+    x0 = max(0, min(r[0] for r in regions) - pad)
+    y0 = max(0, min(r[1] for r in regions) - pad)
+    x1 = min(binary.shape[1], max(r[0] + r[2] for r in regions) + pad)
+    y1 = min(binary.shape[0], max(r[1] + r[3] for r in regions) + pad)
+    return mask[y0:y1, x0:x1]
+
+
+def extract_text_from_image(image_file, psm=OCR_PSM, oem=OCR_OEM, header_fraction=OCR_HEADER_FRACTION):
+    image = _load_image(image_file)
+    prepared = preprocess_image(image, header_fraction)
+    return pytesseract.image_to_string(prepared, config=f"--oem {oem} --psm {psm}")
+
+
+def _ocr_worker(source, psm, oem, header_fraction):
+    return extract_text_from_image(source, psm=psm, oem=oem, header_fraction=header_fraction)
+
+
+def extract_text_from_images(image_files, workers=OCR_MAX_WORKERS, psm=OCR_PSM, oem=OCR_OEM, header_fraction=OCR_HEADER_FRACTION):
+    """OCRs a batch of images on a bounded process pool; results follow the input order."""
+    sources = [_image_source(image_file) for image_file in image_files]
+    if workers <= 1 or len(sources) <= 1:
+        return [_ocr_worker(source, psm, oem, header_fraction) for source in sources]
+    count = len(sources)
+    with ProcessPoolExecutor(max_workers=min(workers, count)) as executor:
+        return list(executor.map(_ocr_worker, sources, [psm] * count, [oem] * count, [header_fraction] * count))
+
+
+def iter_image_frames(image_file):
+    """Each page of a multi-page image (TIFF); a single-frame image yields itself."""
+    image = _load_image(image_file)
+    for frame in ImageSequence.Iterator(image):
+        yield frame.copy()
+
+
+def iter_multipage_image_text(image_file, workers=OCR_MAX_WORKERS, psm=OCR_PSM, oem=OCR_OEM, header_fraction=OCR_HEADER_FRACTION):
+    """
+    OCRs every frame of a multi-page TIFF on a bounded process pool, yielding
+    (page_index, text) in page order as each page completes.
+    """
+    sources = [_image_source(frame) for frame in iter_image_frames(image_file)]
+    count = len(sources)
+    if workers <= 1 or count <= 1:
+        for index, source in enumerate(sources):
+            yield index, _ocr_worker(source, psm, oem, header_fraction)
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, count)) as executor:
+        results = executor.map(_ocr_worker, sources, [psm] * count, [oem] * count, [header_fraction] * count)
+        yield from enumerate(results)
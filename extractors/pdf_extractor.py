@@ -1,19 +1,249 @@
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
 import pdfplumber
+from pdf2image import convert_from_bytes, convert_from_path
+from pdfplumber.utils import extract_text
+
+from extractors.image_extractor import extract_text_from_image
+
+# Below this many pages the process start-up costs more than it saves.
+PDF_PARALLEL_MIN_PAGES = 8
+
+# extract_headers_with_llm only ever looks at the first 5000 characters.
+HEADER_CHAR_BUDGET = 5000
+# Tables are only parsed on the leading pages, where report headers live.
+HEADER_TABLE_PAGES = 1
+
+# Pages without a text layer (scans) are rasterized at this DPI and OCR'd.
+OCR_PDF_DPI = int(os.getenv("OCR_PDF_DPI", "300"))
+OCR_PDF_WORKERS = int(os.getenv("OCR_PDF_WORKERS", "2"))
+
+
+def _pdf_source(pdf_file):
+    """A picklable source each worker can reopen: a path string or the raw bytes."""
+    if isinstance(pdf_file, (str, Path)):
+        return str(pdf_file)
+    if isinstance(pdf_file, (bytes, bytearray)):
+        return bytes(pdf_file)
+    if hasattr(pdf_file, "getvalue"):
+        return pdf_file.getvalue()
+    position = pdf_file.tell()
+    data = pdf_file.read()
+    pdf_file.seek(position)
+    return data
+
+
+def _open_pdf(source):
+    return pdfplumber.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+
+
+def _inside_any(obj, bboxes):
+    x = (obj["x0"] + obj["x1"]) / 2
+    y = (obj["top"] + obj["bottom"]) / 2
+    return any(x0 <= x <= x1 and top <= y <= bottom for x0, top, x1, bottom in bboxes)
+
+
+def _extract_page_lines(page, include_tables=True):
+    """
+    Single pass over the page layout: tables are located once, their rows are
+    emitted as "a | b | c" lines, and only characters outside the table
+    regions go through extract_text(), so table text is not duplicated.
+    """
+    if not include_tables:
+        return [(page.extract_text() or "").strip()]
+
+    tables = page.find_tables()
+    bboxes = [table.bbox for table in tables]
+    chars = [char for char in page.chars if not _inside_any(char, bboxes)] if bboxes else page.chars
+
+    # Extract regular text
+    lines = [(extract_text(chars) or "").strip()]
+
+    # Extract tables if any
+    for table in tables:
+        for row in table.extract():
+            row_text = " | ".join([cell.strip() if cell else "" for cell in row])
+            lines.append(row_text)
+
+    return lines
+
+
+def is_image_only_page(page):
+    """A scanned page: embedded images but no text layer."""
+    return not page.chars and bool(page.images)
+
+
+def _extract_page(page, include_tables=True):
+    return _extract_page_lines(page, include_tables), is_image_only_page(page)
+
 
-def extract_text_from_pdf(pdf_file):
-    full_text = []
+def _extract_pages(source, page_numbers):
+    """Worker entry point: returns [(page_number, lines, image_only)] for the given 0-based pages."""
+    with _open_pdf(source) as pdf:
+        return [(number, *_extract_page(pdf.pages[number])) for number in page_numbers]
 
-    with pdfplumber.open(pdf_file) as pdf:
-        for page in pdf.pages:
-            # Extract regular text
-            text = page.extract_text() or ""
-            full_text.append(text.strip())
 
-            # Extract tables if any
-            tables = page.extract_tables()
-            for table in tables:
-                for row in table:
-                    row_text = " | ".join([cell.strip() if cell else "" for cell in row])
-                    full_text.append(row_text)
+def _ocr_pdf_page(source, page_number, dpi):
+    """Worker entry point: rasterizes one 0-based page with pdf2image and OCRs it."""
+    if isinstance(source, bytes):
+        images = convert_from_bytes(source, dpi=dpi, first_page=page_number + 1, last_page=page_number + 1)
+    else:
+        images = convert_from_path(source, dpi=dpi, first_page=page_number + 1, last_page=page_number + 1)
+    if not images:
+        return ""
+    image = images[0]
+    image.info["dpi"] = (dpi, dpi)
+    return extract_text_from_image(image)
 
+
+def _ocr_failed(number, error, errors):
+    # Poppler and tesseract are system binaries that may be missing; a page
+    # that cannot be OCR'd is skipped instead of failing the whole document.
+    print(f"⚠️ OCR failed for PDF page {number + 1}, skipping it: {error}")
+    if errors is not None:
+        errors.append((number, str(error)))
+
+
+def iter_ocr_pdf_pages(source, page_numbers, dpi=OCR_PDF_DPI, workers=OCR_PDF_WORKERS, errors=None):
+    """
+    Rasterizes and OCRs the given 0-based pages in parallel, yielding
+    (page_number, text) in page order as soon as each page is ready. Pages
+    that fail are left out and recorded as (page_number, message) in errors.
+    """
+    if workers <= 1 or len(page_numbers) <= 1:
+        for number in page_numbers:
+            try:
+                text = _ocr_pdf_page(source, number, dpi)
+            except Exception as e:
+                _ocr_failed(number, e, errors)
+                continue
+            yield number, text
+        return
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(page_numbers))) as executor:
+        futures = [executor.submit(_ocr_pdf_page, source, number, dpi) for number in page_numbers]
+        try:
+            for number, future in zip(page_numbers, futures):
+                try:
+                    text = future.result()
+                except Exception as e:
+                    _ocr_failed(number, e, errors)
+                    continue
+                yield number, text
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def _select_pages(page_count, page_range=None, max_pages=None):
+    start, end = 1, page_count
+    if page_range:
+        start = max(1, page_range[0])
+        end = min(page_count, page_range[1] if page_range[1] else page_count)
+    numbers = list(range(start - 1, end))
+    if max_pages is not None:
+        numbers = numbers[:max_pages]
+    return numbers
+
+
+def _batches(numbers, batch_count):
+    size = max(1, -(-len(numbers) // batch_count))
+    return [numbers[i:i + size] for i in range(0, len(numbers), size)]
+
+
+def extract_text_from_pdf(pdf_file, max_pages=None, page_range=None, workers=None, ocr=True, ocr_errors=None):
+    """
+    Extracts page text and table rows in page order.
+
+    page_range is a 1-based inclusive (first, last) tuple and max_pages caps the
+    number of pages read. Documents with at least PDF_PARALLEL_MIN_PAGES selected
+    pages are split across a process pool of `workers` processes (default: CPU
+    count); workers=1 forces serial extraction. With ocr set, image-only pages
+    are rasterized and OCR'd instead of contributing nothing; pages whose OCR
+    fails are skipped and listed in ocr_errors when a list is passed.
+    """
+    source = _pdf_source(pdf_file)
+
+    with _open_pdf(source) as pdf:
+        page_numbers = _select_pages(len(pdf.pages), page_range, max_pages)
+        workers = workers or os.cpu_count() or 1
+        if workers == 1 or len(page_numbers) < PDF_PARALLEL_MIN_PAGES:
+            page_results = [(number, *_extract_page(pdf.pages[number])) for number in page_numbers]
+        else:
+            page_results = None
+
+    if page_results is None:
+        # Several batches per worker keeps the pool busy when page cost is uneven.
+        batches = _batches(page_numbers, workers * 2)
+        page_results = []
+        with ProcessPoolExecutor(max_workers=min(workers, len(batches))) as executor:
+            for batch_result in executor.map(_extract_pages, [source] * len(batches), batches):
+                page_results.extend(batch_result)
+        page_results.sort(key=lambda result: result[0])
+
+    if ocr:
+        scanned = [number for number, _, image_only in page_results if image_only]
+        if scanned:
+            print(f"🖨️ OCR'ing {len(scanned)} image-only PDF page(s)")
+            ocr_text = dict(iter_ocr_pdf_pages(source, scanned, errors=ocr_errors))
+            page_results = [
+                (number, [ocr_text.get(number, "")] if image_only else lines, image_only)
+                for number, lines, image_only in page_results
+            ]
+
+    full_text = [line for _, lines, _ in page_results for line in lines]
     return "\n".join([line for line in full_text if line.strip()])
+
+
+def _iter_page_blocks(source, pdf, table_pages, ocr, ocr_workers, ocr_errors=None):
+    pages = pdf.pages
+    number = 0
+    while number < len(pages):
+        page = pages[number]
+        if ocr and is_image_only_page(page):
+            # OCR this scanned page together with the scanned pages right after it.
+            window = [number]
+            while len(window) < max(1, ocr_workers) and window[-1] + 1 < len(pages) and is_image_only_page(pages[window[-1] + 1]):
+                window.append(window[-1] + 1)
+            for _, text in iter_ocr_pdf_pages(source, window, workers=ocr_workers, errors=ocr_errors):
+                yield text
+            number = window[-1] + 1
+            continue
+        yield from _extract_page_lines(page, include_tables=number < table_pages)
+        number += 1
+
+
+def iter_pdf_lines(pdf_file, char_budget=HEADER_CHAR_BUDGET, line_budget=None, table_pages=HEADER_TABLE_PAGES, budget_filter=None, ocr=True, ocr_workers=OCR_PDF_WORKERS, ocr_errors=None):
+    """
+    Yields non-empty lines page by page and stops as soon as char_budget
+    characters or line_budget lines have been produced (None disables a limit).
+
+    Only the first table_pages pages get extract_tables(); later pages yield
+    plain text. When budget_filter is given, lines it rejects are still
+    yielded but do not count towards the budget. Image-only pages are OCR'd
+    (ocr_workers at a time) when ocr is set; pages whose OCR fails are
+    skipped and listed in ocr_errors when a list is passed.
+    """
+    chars = 0
+    count = 0
+    source = _pdf_source(pdf_file)
+    with _open_pdf(source) as pdf:
+        for block in _iter_page_blocks(source, pdf, table_pages, ocr, ocr_workers, ocr_errors):
+            for line in block.split("\n"):
+                if not line.strip():
+                    continue
+                yield line
+                if budget_filter is not None and not budget_filter(line):
+                    continue
+                chars += len(line) + 1
+                count += 1
+                if (char_budget is not None and chars >= char_budget) or (line_budget is not None and count >= line_budget):
+                    return
+
+
+def extract_header_text_from_pdf(pdf_file, char_budget=HEADER_CHAR_BUDGET, line_budget=None, table_pages=HEADER_TABLE_PAGES, budget_filter=None, ocr=True, ocr_errors=None):
+    """Header-region text only: cost depends on the budget, not on the document length."""
+    return "\n".join(iter_pdf_lines(pdf_file, char_budget, line_budget, table_pages, budget_filter, ocr, ocr_errors=ocr_errors))
@@ -0,0 +1,176 @@
+import os
+import re
+import threading
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import faiss
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # retrieval is optional; mapping falls back to the plain prompt
+    faiss = None
+    SentenceTransformer = None
+
+from utils.metadata_catalog import SCHEMA_PREFIX_PATTERN
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+RETRIEVAL_INDEX_DIR = Path(os.getenv("RETRIEVAL_INDEX_DIR", ".cache/column_index"))
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "8"))
+RETRIEVAL_AUTO_RESOLVE_SCORE = float(os.getenv("RETRIEVAL_AUTO_RESOLVE_SCORE", "0.85"))
+# How far the best candidate must lead the runner-up when its column name is shared.
+RETRIEVAL_AUTO_RESOLVE_MARGIN = float(os.getenv("RETRIEVAL_AUTO_RESOLVE_MARGIN", "0.05"))
+
+# Above this many vectors an exact flat index gets too large/slow; switch to HNSW.
+FLAT_INDEX_LIMIT = 200_000
+ENCODE_BATCH_SIZE = 512
+
+CANDIDATES_NOTE = (
+    "Some entries include a \"candidates\" list of TABLE.COLUMN values retrieved from the R12 metadata. "
+    "When present, pick oracle_r12_table and oracle_r12_column from that list unless the hints clearly point elsewhere."
+)
+
+
+def _humanize(name):
+    return re.sub(r"[_#$]+", " ", name).strip().lower()
+
+
+def _column_text(table, column):
+    return f"{_humanize(column)} in {_humanize(table)}"
+
+
+def _entry_text(entry):
+    parts = [entry.get("extracted_label", "")]
+    for key in ("hint_column", "hint_table", "comment"):
+        if entry.get(key):
+            parts.append(_humanize(entry[key]))
+    return " ".join(p for p in parts if p)
+
+
+class ColumnRetriever:
+    """
+    FAISS index over every TABLE.COLUMN in a MetadataCatalog.
+
+    The index is persisted under index_dir keyed by catalog version and model
+    name, so it is only embedded again when the metadata changes.
+    """
+
+    def __init__(self, catalog, model_name=EMBEDDING_MODEL, index_dir=RETRIEVAL_INDEX_DIR):
+        if faiss is None or SentenceTransformer is None:
+            raise ImportError("faiss-cpu and sentence-transformers are required for candidate retrieval")
+
+        self.catalog = catalog
+        self.tables = catalog.pairs["table_name"].tolist()
+        self.columns = catalog.pairs["column_name"].tolist()
+        self.model = SentenceTransformer(model_name)
+
+        index_dir = Path(index_dir)
+        model_slug = re.sub(r"[^A-Za-z0-9]+", "_", model_name)
+        index_path = index_dir / f"{catalog.version}-{model_slug}.faiss"
+
+        if index_path.exists():
+            self.index = faiss.read_index(str(index_path))
+        else:
+            self.index = self._build_index()
+            index_dir.mkdir(parents=True, exist_ok=True)
+            faiss.write_index(self.index, str(index_path))
+
+    def _encode(self, texts):
+        return self.model.encode(
+            texts,
+            batch_size=ENCODE_BATCH_SIZE,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        ).astype(np.float32)
+
+    def _build_index(self):
+        print(f"🧭 Embedding {len(self.tables)} metadata column(s) for candidate retrieval...")
+        vectors = self._encode([_column_text(t, c) for t, c in zip(self.tables, self.columns)])
+        dim = vectors.shape[1]
+        if len(vectors) > FLAT_INDEX_LIMIT:
+            index = faiss.IndexHNSWFlat(dim, 32, faiss.METRIC_INNER_PRODUCT)
+        else:
+            index = faiss.IndexFlatIP(dim)
+        index.add(vectors)
+        return index
+
+    def search(self, entries, top_k=RETRIEVAL_TOP_K):
+        """Returns, per entry, a list of (table, column, cosine score) ordered best first."""
+        if not entries or self.index.ntotal == 0:
+            return [[] for _ in entries]
+        vectors = self._encode([_entry_text(entry) for entry in entries])
+        scores, ids = self.index.search(vectors, min(top_k, self.index.ntotal))
+        results = []
+        for row_scores, row_ids in zip(scores, ids):
+            results.append([
+                (self.tables[i], self.columns[i], float(score))
+                for score, i in zip(row_scores, row_ids)
+                if i >= 0
+            ])
+        return results
+
+
+_retrievers = {}
+_retrievers_lock = threading.Lock()
+
+
+def get_column_retriever(catalog, model_name=EMBEDDING_MODEL):
+    """Shared retriever per (catalog version, model); None if the optional dependencies are missing."""
+    if faiss is None or SentenceTransformer is None or catalog is None or len(catalog) == 0:
+        return None
+    key = (catalog.version, model_name)
+    with _retrievers_lock:
+        if key not in _retrievers:
+            try:
+                _retrievers[key] = ColumnRetriever(catalog, model_name=model_name)
+            except Exception as e:
+                print(f"⚠️ Candidate retrieval unavailable: {e}")
+                return None
+        return _retrievers[key]
+
+
+def _is_unambiguous(entry, candidates, margin, catalog=None):
+    """
+    True when the best candidate is clearly the one: its column name appears
+    only once in the top-k (and, with a catalog, in one table only), it leads
+    the runner-up by margin, or it is in the hinted table. Shared columns
+    (CREATION_DATE, ORG_ID ...) in near-identical tables fail all three and
+    are left to the LLM.
+    """
+    table, column, score = candidates[0]
+    unique_in_top_k = all(other_column != column for _, other_column, _ in candidates[1:])
+    if unique_in_top_k and (catalog is None or len(catalog.tables_for(column)) <= 1):
+        return True
+    if len(candidates) == 1 or score - candidates[1][2] >= margin:
+        return True
+    hint_table = re.sub(SCHEMA_PREFIX_PATTERN, "", (entry.get("hint_table") or "").strip().upper())
+    return bool(hint_table) and hint_table == table
+
+
+def apply_candidate_retrieval(entries, retriever, top_k=RETRIEVAL_TOP_K, auto_resolve_score=RETRIEVAL_AUTO_RESOLVE_SCORE, margin=RETRIEVAL_AUTO_RESOLVE_MARGIN):
+    """
+    Splits entries into (resolved_items, remaining_entries).
+
+    Entries whose best candidate scores at or above auto_resolve_score and is
+    unambiguous (see _is_unambiguous) are mapped locally; the rest get a
+    "candidates" list for the LLM to choose from.
+    """
+    resolved = []
+    remaining = []
+    catalog = getattr(retriever, "catalog", None)
+    for entry, candidates in zip(entries, retriever.search(entries, top_k)):
+        if candidates and candidates[0][2] >= auto_resolve_score and _is_unambiguous(entry, candidates, margin, catalog):
+            table, column, score = candidates[0]
+            print(f"🧭 Resolved locally ({score:.2f}): {entry['extracted_label']} -> {table}.{column}")
+            resolved.append({
+                "extracted_label": entry["extracted_label"],
+                "oracle_r12_table": table,
+                "oracle_r12_column": column
+            })
+            continue
+        entry = dict(entry)
+        if candidates:
+            entry["candidates"] = [f"{table}.{column}" for table, column, _ in candidates]
+        remaining.append(entry)
+    return resolved, remaining
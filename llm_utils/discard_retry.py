@@ -0,0 +1,141 @@
+import difflib
+import json
+import os
+import re
+
+from llm_utils.fast_matcher import get_fast_matcher, normalize_tokens
+from llm_utils.llm_json import json_mode_instruction
+from utils.metadata_catalog import SCHEMA_PREFIX_PATTERN, table_root
+
+DISCARD_RETRY_MAX_CANDIDATES = int(os.getenv("DISCARD_RETRY_MAX_CANDIDATES", "12"))
+# How close a column name must be to the suggestion to count as "similar".
+SIMILAR_COLUMN_CUTOFF = 0.6
+SIMILAR_COLUMNS_PER_TABLE = 4
+# Label-wide search: columns containing all label words, at most this many.
+LABEL_MATCH_LIMIT = 4
+
+RETRY_SYSTEM_PROMPT = (
+    "You are an Oracle R12 expert. Each entry is a report label whose previous mapping did not exist in the R12 metadata, "
+    "with its hints, the rejected suggestion and a closed list of TABLE.COLUMN candidates taken from the metadata.\n"
+    "For every entry pick the single best candidate, or leave table and column empty if none of them fits. "
+    "Never answer with a value that is not in that entry's candidates.\n"
+    "Return ONLY a JSON array like this:\n"
+    "[{\"extracted_label\": \"label1\", \"oracle_r12_table\": \"TABLE_NAME\", \"oracle_r12_column\": \"COLUMN_NAME\"}]"
+)
+
+
+def _identifier(text):
+    """Vendor Name -> VENDOR_NAME, AP.AP_INVOICES_ALL -> AP_INVOICES_ALL."""
+    text = re.sub(SCHEMA_PREFIX_PATTERN, "", (text or "").strip().upper())
+    return re.sub(r"[^A-Z0-9#$]+", "_", text).strip("_")
+
+
+def _root_variants(table, catalog):
+    """The table itself plus every catalog table sharing its root (_ALL, _B, _TL ...)."""
+    if not table:
+        return []
+    variants = catalog.table_roots.get(table_root(table), set()) | ({table} if table in catalog.table_column_map else set())
+    return sorted(variants)
+
+
+def _label_matches(label, catalog):
+    """Columns whose words include every word of the label, closest names first."""
+    matcher = get_fast_matcher(catalog)
+    label_tokens = set(normalize_tokens(label))
+    if matcher is None or not label_tokens:
+        return []
+    columns = [
+        column
+        for tokens, columns in matcher.token_index.items()
+        if label_tokens <= set(tokens)
+        for column in columns
+    ]
+    target = _identifier(label)
+    columns.sort(key=lambda column: (-difflib.SequenceMatcher(None, target, column).ratio(), column))
+    return columns[:LABEL_MATCH_LIMIT]
+
+
+def retry_candidates(item, catalog, max_candidates=DISCARD_RETRY_MAX_CANDIDATES):
+    """
+    Closed TABLE.COLUMN candidate list for a discarded mapping, in priority order:
+    the suggested (or hinted) column in any table, similar columns in the
+    suggested/hinted table and its variants, then columns matching the label words.
+    """
+    tables = [t for t in dict.fromkeys((_identifier(item.get("oracle_r12_table")), _identifier(item.get("hint_table")))) if t]
+    columns = [c for c in dict.fromkeys((_identifier(item.get("oracle_r12_column")), _identifier(item.get("hint_column")))) if c]
+    targets = columns + [_identifier(item.get("extracted_label"))]
+
+    candidates = {}
+    for column in columns:
+        for table in sorted(catalog.tables_for(column)):
+            candidates[(table, column)] = None
+
+    for table in tables:
+        for variant in _root_variants(table, catalog):
+            table_columns = catalog.columns_for(variant)
+            for target in targets:
+                for column in difflib.get_close_matches(target, table_columns, n=SIMILAR_COLUMNS_PER_TABLE, cutoff=SIMILAR_COLUMN_CUTOFF):
+                    candidates[(variant, column)] = None
+
+    if len(candidates) < max_candidates:
+        for column in _label_matches(item.get("extracted_label", ""), catalog):
+            owners = sorted(catalog.tables_for(column))
+            # Prefer the suggested table family when the column is widespread.
+            preferred = [t for t in owners if any(table_root(t) == table_root(s) for s in tables)]
+            for table in (preferred or owners)[:2]:
+                candidates[(table, column)] = None
+
+    return [f"{table}.{column}" for table, column in list(candidates)[:max_candidates]]
+
+
+def build_retry_entries(discarded_items, catalog, max_candidates=DISCARD_RETRY_MAX_CANDIDATES):
+    """Prompt entries for the discarded items that have at least one candidate."""
+    entries = []
+    for item in discarded_items:
+        candidates = retry_candidates(item, catalog, max_candidates)
+        if not candidates:
+            continue
+        entries.append({
+            "extracted_label": item.get("extracted_label", ""),
+            "hint_table": item.get("hint_table", ""),
+            "hint_column": item.get("hint_column", ""),
+            "comment": item.get("comment", ""),
+            "rejected": ".".join(p for p in (item.get("oracle_r12_table", ""), item.get("oracle_r12_column", "")) if p),
+            "candidates": candidates
+        })
+    return entries
+
+
+def build_retry_messages(entries, json_mode=False):
+    system_prompt = RETRY_SYSTEM_PROMPT
+    if json_mode:
+        system_prompt += "\n" + json_mode_instruction("mappings")
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": json.dumps(entries, indent=2)}
+    ]
+
+
+def accept_retry_choices(choices, entries, discarded_items):
+    """
+    Keeps only choices that are in the label's own candidate list. Returns
+    (recovered_items, still_discarded_items).
+    """
+    allowed = {entry["extracted_label"]: set(entry["candidates"]) for entry in entries}
+    recovered = []
+    recovered_labels = set()
+    for choice in choices:
+        label = choice.get("extracted_label", "")
+        table = _identifier(choice.get("oracle_r12_table"))
+        column = _identifier(choice.get("oracle_r12_column"))
+        if label in recovered_labels or f"{table}.{column}" not in allowed.get(label, ()):
+            continue
+        print(f"🔁 Recovered on retry: {label} -> {table}.{column}")
+        recovered_labels.add(label)
+        recovered.append({
+            "extracted_label": label,
+            "oracle_r12_table": table,
+            "oracle_r12_column": column
+        })
+    still_discarded = [item for item in discarded_items if item.get("extracted_label", "") not in recovered_labels]
+    return recovered, still_discarded
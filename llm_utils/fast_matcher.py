@@ -0,0 +1,140 @@
+import re
+import threading
+
+# Label words and column-name fragments normalized to one spelling, so that
+# "Invoice Number", "Invoice No" and INVOICE_NUM all become INVOICE NUMBER.
+ABBREVIATIONS = {
+    "NUM": "NUMBER",
+    "NO": "NUMBER",
+    "NBR": "NUMBER",
+    "#": "NUMBER",
+    "AMT": "AMOUNT",
+    "QTY": "QUANTITY",
+    "DESC": "DESCRIPTION",
+    "DT": "DATE",
+    "CURR": "CURRENCY",
+    "CCY": "CURRENCY",
+    "ACCT": "ACCOUNT",
+    "ADDR": "ADDRESS",
+    "ORG": "ORGANIZATION",
+    "VEND": "VENDOR",
+    "SUPPLIER": "VENDOR",
+    "CUST": "CUSTOMER",
+    "TRX": "TRANSACTION",
+    "TXN": "TRANSACTION",
+    "PCT": "PERCENT",
+    "UOM": "UNIT OF MEASURE",
+}
+
+STOP_WORDS = {"THE", "OF", "A", "AN"}
+
+VARIANT_SUFFIXES = ("", "_ALL", "_B", "_TL")
+
+
+def normalize_tokens(text):
+    """Upper-cases, splits on anything non-alphanumeric (keeping #) and expands abbreviations."""
+    tokens = []
+    for raw in re.findall(r"[A-Za-z0-9]+|#", str(text)):
+        token = raw.upper()
+        token = ABBREVIATIONS.get(token, token)
+        tokens.extend(t for t in token.split() if t not in STOP_WORDS)
+    return tuple(tokens)
+
+
+def _table_variants(table):
+    table = table.strip().upper()
+    return [table + suffix for suffix in VARIANT_SUFFIXES] if table else []
+
+
+class FastMatcher:
+    """
+    Resolves labels whose meaning is unambiguous from the metadata alone.
+
+    A label (or its hint_column) is matched when its normalized tokens equal
+    those of exactly one TABLE.COLUMN, optionally narrowed by hint_table or by
+    tables already chosen for other labels in the same report. Entries with a
+    comment are left to the LLM because comments usually describe a derivation.
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.token_index = {}
+        for column in catalog.column_tables:
+            self.token_index.setdefault(normalize_tokens(column), []).append(column)
+
+    def _candidates(self, entry):
+        hint_column = entry.get("hint_column", "").strip().upper()
+        if hint_column and self.catalog.tables_for(hint_column):
+            columns = [hint_column]
+        else:
+            columns = self.token_index.get(normalize_tokens(hint_column or entry["extracted_label"]), [])
+        return {(table, column) for column in columns for table in self.catalog.tables_for(column)}
+
+    def _narrow(self, entry, candidates, preferred_tables):
+        hint_table = entry.get("hint_table", "")
+        if hint_table:
+            variants = _table_variants(hint_table)
+            hinted = {c for c in candidates if c[0] in variants}
+            if not hinted:
+                return set()
+            # Prefer the hint exactly as typed over its _ALL/_B/_TL variants.
+            for variant in variants:
+                exact = {c for c in hinted if c[0] == variant}
+                if exact:
+                    return exact
+        if len(candidates) > 1 and preferred_tables:
+            preferred = {c for c in candidates if c[0] in preferred_tables}
+            if preferred:
+                return preferred
+        return candidates
+
+    def match(self, entries):
+        """Returns (resolved_items, remaining_entries) preserving entry order within each list."""
+        candidates_by_idx = {}
+        resolved_by_idx = {}
+
+        for idx, entry in enumerate(entries):
+            if entry.get("comment"):
+                continue
+            candidates = self._narrow(entry, self._candidates(entry), set())
+            if len(candidates) == 1:
+                resolved_by_idx[idx] = next(iter(candidates))
+            elif candidates:
+                candidates_by_idx[idx] = candidates
+
+        # Second pass: a shared column such as CREATION_DATE is resolved when
+        # exactly one of its tables is already used by another label.
+        preferred_tables = {table for table, _ in resolved_by_idx.values()}
+        for idx, candidates in candidates_by_idx.items():
+            narrowed = self._narrow(entries[idx], candidates, preferred_tables)
+            if len(narrowed) == 1:
+                resolved_by_idx[idx] = next(iter(narrowed))
+
+        resolved = []
+        remaining = []
+        for idx, entry in enumerate(entries):
+            if idx in resolved_by_idx:
+                table, column = resolved_by_idx[idx]
+                print(f"⚡ Fast-path match: {entry['extracted_label']} -> {table}.{column}")
+                resolved.append({
+                    "extracted_label": entry["extracted_label"],
+                    "oracle_r12_table": table,
+                    "oracle_r12_column": column
+                })
+            else:
+                remaining.append(entry)
+        return resolved, remaining
+
+
+_matchers = {}
+_matchers_lock = threading.Lock()
+
+
+def get_fast_matcher(catalog):
+    """Shared matcher per catalog version; building the token index walks every distinct column once."""
+    if catalog is None or len(catalog) == 0:
+        return None
+    with _matchers_lock:
+        if catalog.version not in _matchers:
+            _matchers[catalog.version] = FastMatcher(catalog)
+        return _matchers[catalog.version]
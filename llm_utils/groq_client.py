@@ -0,0 +1,354 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+
+import httpx
+
+from llm_utils.llm_cache import get_response_cache, make_cache_key
+
+GROQ_CHAT_URL = "https://api.groq.com/openai/v1/chat/completions"
+
+# Status codes worth retrying; anything else (401, 400, ...) fails immediately.
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+GROQ_TIMEOUT = float(os.getenv("GROQ_TIMEOUT", "60"))
+GROQ_CONNECT_TIMEOUT = float(os.getenv("GROQ_CONNECT_TIMEOUT", "10"))
+GROQ_MAX_CONNECTIONS = int(os.getenv("GROQ_MAX_CONNECTIONS", "10"))
+GROQ_HTTP2 = os.getenv("GROQ_HTTP2", "1").lower() not in ("0", "false", "no")
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def _http2_supported():
+    if not GROQ_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def get_http_client():
+    """
+    Process-wide pooled httpx client. Connections are kept alive between the
+    header, mapping and SQL calls so only the first one pays for TLS setup.
+    """
+    global _client
+    with _client_lock:
+        if _client is None or _client.is_closed:
+            _client = httpx.Client(
+                http2=_http2_supported(),
+                timeout=httpx.Timeout(GROQ_TIMEOUT, connect=GROQ_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=GROQ_MAX_CONNECTIONS,
+                    max_keepalive_connections=GROQ_MAX_CONNECTIONS,
+                    keepalive_expiry=120,
+                ),
+            )
+        return _client
+
+
+def close_http_client():
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+def _retry_after_seconds(response):
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def _backoff_delay(attempt, delay, max_delay):
+    # Full jitter: spreads out concurrent retries instead of synchronising them.
+    return random.uniform(0, min(max_delay, delay * (2 ** attempt)))
+
+
+def json_mode_enabled():
+    """
+    GROQ_JSON_MODE=1 asks for JSON mode (response_format json_object) on calls
+    that expect JSON back. The model must then answer with one JSON object, so
+    array prompts ask for a wrapper. Read at call time: the entry points load
+    .env after importing this module.
+    """
+    return os.getenv("GROQ_JSON_MODE", "0").lower() in ("1", "true", "yes")
+
+
+def build_chat_payload(model, messages, temperature=0.2, stream=False, json_mode=False):
+    payload = {
+        "model": model,
+        "messages": messages,
+        "temperature": temperature
+    }
+    if stream:
+        payload["stream"] = True
+    if json_mode:
+        payload["response_format"] = {"type": "json_object"}
+    return payload
+
+
+def forget_cached_completion(model, messages, temperature=0.2):
+    """Drops a cached response, e.g. when its content turned out to be unparseable."""
+    cache = get_response_cache()
+    if cache is not None:
+        cache.invalidate(make_cache_key(model, messages, temperature))
+
+
+def _auth_headers(api_key):
+    return {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+
+
+def _cached_completion(model, messages, temperature, use_cache):
+    """Returns (cache, cache_key, cached_result); cache is None when caching is off."""
+    cache = get_response_cache() if use_cache else None
+    if cache is None:
+        return None, None, None
+    cache_key = make_cache_key(model, messages, temperature)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        print("♻️ Using cached GROQ response")
+    return cache, cache_key, cached
+
+
+def _success_result(response, cache, cache_key):
+    try:
+        result = response.json()
+    except ValueError as e:
+        raise ValueError(f"✅ Status 200 but failed to parse JSON: {e}\nRaw: {response.text}")
+    if cache is not None:
+        cache.set(cache_key, result)
+    return result
+
+
+def _transport_retry_wait(ex, attempt, retries, delay, max_delay):
+    print(f"❌ Exception during GROQ call: {ex}")
+    if attempt == retries - 1:
+        raise RuntimeError(f"❌ GROQ API call failed after {retries} retries: {ex}") from ex
+    return _backoff_delay(attempt, delay, max_delay)
+
+
+def _status_retry_wait(response, attempt, retries, delay, max_delay):
+    """Seconds to wait before retrying a failed response, or raises HTTPStatusError."""
+    print(f"⚠️ Attempt {attempt + 1}: GROQ error {response.status_code}: {response.text}")
+    if response.status_code not in RETRYABLE_STATUS_CODES or attempt == retries - 1:
+        response.raise_for_status()
+
+    wait = _retry_after_seconds(response)
+    if wait is None:
+        wait = _backoff_delay(attempt, delay, max_delay)
+    elif wait > max_delay:
+        # Waiting longer than max_delay would stall the app; let the caller report it.
+        response.raise_for_status()
+    return wait
+
+
+def safe_groq_chat_completion(model, api_key, messages, temperature=0.2, retries=3, delay=1.0, max_delay=30.0, use_cache=True, json_mode=False):
+    """
+    Sends a chat completion request through the shared client.
+
+    Identical (model, messages, temperature) requests are answered from the
+    response cache when use_cache is set, without contacting the API.
+
+    Transport errors and retryable status codes are retried with exponential
+    backoff and jitter, honouring Retry-After when the server sends one
+    (a Retry-After longer than max_delay is raised instead of slept on).
+    Raises httpx.HTTPStatusError for HTTP failures so callers can inspect the
+    response (e.g. 429), and RuntimeError when the API cannot be reached.
+    json_mode sends response_format json_object (see json_mode_enabled).
+    """
+    headers = _auth_headers(api_key)
+    payload = build_chat_payload(model, messages, temperature, json_mode=json_mode)
+
+    cache, cache_key, cached = _cached_completion(model, messages, temperature, use_cache)
+    if cached is not None:
+        return cached
+
+    client = get_http_client()
+
+    for attempt in range(retries):
+        print(f"📤 Sending payload to GROQ API (attempt {attempt + 1}/{retries})...")
+        try:
+            response = client.post(GROQ_CHAT_URL, headers=headers, json=payload)
+        except httpx.TransportError as ex:
+            time.sleep(_transport_retry_wait(ex, attempt, retries, delay, max_delay))
+            continue
+
+        if response.is_success:
+            return _success_result(response, cache, cache_key)
+        time.sleep(_status_retry_wait(response, attempt, retries, delay, max_delay))
+
+
+def run_llm_steps(steps, model, api_key):
+    """
+    Drives a request generator: each dict it yields holds the
+    safe_groq_chat_completion arguments for one call (messages, json_mode),
+    and the response, or the exception the call raised, is sent back in.
+    Returns the generator's return value. Prompt building and parsing live
+    in the generator, so sync and async callers share them.
+    """
+    try:
+        request = next(steps)
+        while True:
+            try:
+                response = safe_groq_chat_completion(model=model, api_key=api_key, **request)
+            except Exception as e:
+                request = steps.throw(e)
+            else:
+                request = steps.send(response)
+    except StopIteration as done:
+        return done.value
+
+
+def _iter_sse_content(response):
+    """Content deltas from an OpenAI-style server-sent event stream."""
+    for line in response.iter_lines():
+        if not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            break
+        try:
+            chunk = json.loads(data)
+        except ValueError:
+            continue
+        choices = chunk.get("choices") or []
+        if choices:
+            content = (choices[0].get("delta") or {}).get("content")
+            if content:
+                yield content
+
+
+def stream_groq_chat_completion(model, api_key, messages, temperature=0.2, retries=3, delay=1.0, max_delay=30.0, use_cache=True):
+    """
+    Streaming variant of safe_groq_chat_completion: yields the completion text
+    piece by piece as the server sends it (SSE).
+
+    The assembled text is cached like a regular response, so a cached
+    completion is yielded in one piece and the non-streaming call can reuse
+    it. Retries only happen before the first piece arrives; a stream that
+    breaks after that raises RuntimeError.
+    """
+    headers = _auth_headers(api_key)
+    payload = build_chat_payload(model, messages, temperature, stream=True)
+
+    cache, cache_key, cached = _cached_completion(model, messages, temperature, use_cache)
+    if cached is not None:
+        yield cached["choices"][0]["message"]["content"]
+        return
+
+    client = get_http_client()
+
+    for attempt in range(retries):
+        print(f"📡 Streaming from GROQ API (attempt {attempt + 1}/{retries})...")
+        parts = []
+        wait = None
+        try:
+            with client.stream("POST", GROQ_CHAT_URL, headers=headers, json=payload) as response:
+                if response.is_success:
+                    for piece in _iter_sse_content(response):
+                        parts.append(piece)
+                        yield piece
+                else:
+                    response.read()
+                    wait = _status_retry_wait(response, attempt, retries, delay, max_delay)
+        except httpx.TransportError as ex:
+            if parts:
+                raise RuntimeError(f"❌ GROQ stream interrupted after {len(parts)} piece(s): {ex}") from ex
+            wait = _transport_retry_wait(ex, attempt, retries, delay, max_delay)
+
+        if wait is None:
+            if cache is not None:
+                cache.set(cache_key, {"choices": [{"message": {"role": "assistant", "content": "".join(parts)}}]})
+            return
+        time.sleep(wait)
+
+
+def create_async_http_client():
+    """
+    An httpx.AsyncClient with the same timeouts and pool limits as the shared
+    sync client. Async clients are bound to their event loop, so the caller
+    owns this one and closes it (async with / aclose()).
+    """
+    return httpx.AsyncClient(
+        http2=_http2_supported(),
+        timeout=httpx.Timeout(GROQ_TIMEOUT, connect=GROQ_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=GROQ_MAX_CONNECTIONS,
+            max_keepalive_connections=GROQ_MAX_CONNECTIONS,
+            keepalive_expiry=120,
+        ),
+    )
+
+
+async def async_safe_groq_chat_completion(model, api_key, messages, client=None, temperature=0.2, retries=3, delay=1.0, max_delay=30.0, use_cache=True, json_mode=False):
+    """
+    Async counterpart of safe_groq_chat_completion with the same cache,
+    retry policy and exceptions. Pass the AsyncClient from
+    create_async_http_client() to share connections; without one a
+    temporary client is opened for this call.
+    """
+    headers = _auth_headers(api_key)
+    payload = build_chat_payload(model, messages, temperature, json_mode=json_mode)
+
+    cache, cache_key, cached = _cached_completion(model, messages, temperature, use_cache)
+    if cached is not None:
+        return cached
+
+    if client is None:
+        async with create_async_http_client() as own_client:
+            return await _async_post_with_retries(own_client, headers, payload, cache, cache_key, retries, delay, max_delay)
+
+    return await _async_post_with_retries(client, headers, payload, cache, cache_key, retries, delay, max_delay)
+
+
+async def _async_post_with_retries(client, headers, payload, cache, cache_key, retries, delay, max_delay):
+    for attempt in range(retries):
+        print(f"📤 Sending payload to GROQ API (attempt {attempt + 1}/{retries})...")
+        try:
+            response = await client.post(GROQ_CHAT_URL, headers=headers, json=payload)
+        except httpx.TransportError as ex:
+            await asyncio.sleep(_transport_retry_wait(ex, attempt, retries, delay, max_delay))
+            continue
+
+        if response.is_success:
+            return _success_result(response, cache, cache_key)
+        await asyncio.sleep(_status_retry_wait(response, attempt, retries, delay, max_delay))
+
+
+async def run_llm_steps_async(steps, model, api_key, client=None):
+    """Async counterpart of run_llm_steps, sending the calls on client."""
+    try:
+        request = next(steps)
+        while True:
+            try:
+                response = await async_safe_groq_chat_completion(model=model, api_key=api_key, client=client, **request)
+            except Exception as e:
+                request = steps.throw(e)
+            else:
+                request = steps.send(response)
+    except StopIteration as done:
+        return done.value
@@ -1,7 +1,7 @@
-import json
-import requests
+from llm_utils.groq_client import run_llm_steps, run_llm_steps_async, forget_cached_completion, json_mode_enabled
+from llm_utils.llm_json import parse_llm_list, json_mode_instruction
 
-def extract_headers_with_llm(text, groq_model, groq_api_key):
+def build_header_messages(text, json_mode=False):
     system_prompt = """
 You are a document analysis expert. Given a snippet of a business document, extract only a Python list of column headers or labels. 
 Only return valid Python list syntax. No explanations.
@@ -17,31 +17,39 @@ Example Output:
 
 If the input contains only headers, return them all. If no headers are detected, return an empty list.
 """
+    if json_mode:
+        system_prompt += json_mode_instruction("headers") + "\n"
     user_prompt = f"Document Text:\n{text.strip()[:5000]}"
 
-    headers = {
-        "Authorization": f"Bearer {groq_api_key}",
-        "Content-Type": "application/json"
-    }
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+
+def parse_headers_response(result, groq_model, messages):
+    try:
+        headers = parse_llm_list(result["choices"][0]["message"]["content"])
+    except (KeyError, IndexError, TypeError, ValueError) as e:
+        forget_cached_completion(groq_model, messages)
+        print(f"❌ Failed to parse headers from GROQ response: {e}")
+        return []
+    return [str(h).strip() for h in headers if isinstance(h, (str, int, float)) and str(h).strip()]
 
-    data = {
-        "model": groq_model,
-        "messages": [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ],
-        "temperature": 0.2
-    }
+def _header_steps(text, groq_model):
+    """The header extraction flow as a request generator for run_llm_steps."""
+    json_mode = json_mode_enabled()
+    messages = build_header_messages(text, json_mode)
 
     try:
-        response = requests.post(
-            "https://api.groq.com/openai/v1/chat/completions",
-            headers=headers,
-            json=data
-        )
-        response.raise_for_status()
-        result = response.json()
-        return json.loads(result["choices"][0]["message"]["content"])
+        result = yield {"messages": messages, "json_mode": json_mode}
     except Exception as e:
         print(f"❌ Error contacting GROQ API: {e}")
         return []
+
+    return parse_headers_response(result, groq_model, messages)
+
+def extract_headers_with_llm(text, groq_model, groq_api_key):
+    return run_llm_steps(_header_steps(text, groq_model), groq_model, groq_api_key)
+
+async def extract_headers_with_llm_async(text, groq_model, groq_api_key, client=None):
+    return await run_llm_steps_async(_header_steps(text, groq_model), groq_model, groq_api_key, client)
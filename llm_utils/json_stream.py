@@ -0,0 +1,73 @@
+from llm_utils.llm_json import parse_llm_json
+
+
+class JsonArrayStreamParser:
+    """
+    Incremental parser for a streamed JSON array of objects.
+
+    feed() takes the next piece of LLM output and returns the objects that
+    became complete with it, so each mapping can be used as soon as its
+    closing brace arrives. Text before the opening '[' (prose, code fences)
+    is skipped. Each object is read with parse_llm_json, so single quotes,
+    comments and trailing commas are fine; objects that still do not parse
+    are collected in errors instead of stopping the stream.
+    """
+
+    def __init__(self):
+        self.started = False
+        self.finished = False
+        self.errors = []
+        self._depth = 0
+        self._quote = None
+        self._escaped = False
+        self._in_comment = False
+        self._current = []
+
+    def feed(self, text):
+        objects = []
+        for char in text:
+            if self.finished:
+                break
+            if not self.started:
+                if char == "[":
+                    self.started = True
+                continue
+
+            if self._depth == 0:
+                if char == "{":
+                    self._depth = 1
+                    self._current = [char]
+                elif char == "]":
+                    self.finished = True
+                continue
+
+            self._current.append(char)
+            if self._quote:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == self._quote:
+                    self._quote = None
+                continue
+            if self._in_comment:
+                self._in_comment = char != "\n"
+                continue
+
+            if char in "\"'":
+                self._quote = char
+            elif char == "#" or (char == "/" and self._current[-2:-1] == ["/"]):
+                # Braces or quotes in a comment must not count.
+                self._in_comment = True
+            elif char == "{":
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    raw = "".join(self._current)
+                    self._current = []
+                    try:
+                        objects.append(parse_llm_json(raw))
+                    except ValueError as e:
+                        self.errors.append((raw, str(e)))
+        return objects
@@ -1,71 +1,444 @@
-import time
+import asyncio
 import json
-import ast
-import pandas as pd
-import requests
-import re
-
-def safe_groq_chat_completion(model, api_key, messages, retries=3, delay=3):
-    url = "https://api.groq.com/openai/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "model": model,
-        "messages": messages,
-        "temperature": 0.2
-    }
-
-    for i in range(retries):
-        try:
-            print("\U0001F4E9 Sending payload to GROQ API:")
-            print(json.dumps(payload, indent=2))
-
-            response = requests.post(url, headers=headers, json=payload)
-            print("\U0001F4E9 GROQ raw response text:")
-            print(response.text)
-
-            if response.status_code == 200:
-                try:
-                    return response.json()
-                except Exception as e:
-                    raise ValueError(f"✅ Status 200 but failed to parse JSON: {e}\nRaw: {response.text}")
-            else:
-                print(f"❌ Attempt {i+1}: GROQ error {response.status_code}: {response.text}")
-                if i < retries - 1:
-                    time.sleep(delay)
-                else:
-                    raise RuntimeError(f"GROQ API failed: {response.status_code} - {response.text}")
-        except Exception as ex:
-            print(f"🚨 Exception during GROQ call: {ex}")
-            if i < retries - 1:
-                time.sleep(delay)
-            else:
-                raise RuntimeError(f"❌ GROQ API call failed after {retries} retries: {ex}")
+import queue
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
-def ask_llm_for_mappings(headers, user_table_map, user_column_map, user_comment_map, metadata_df=None, groq_model=None, groq_api_key=None):
-    validated_mappings = []
-    discarded_llm_items = []
-    metadata_lookup = set()
-    table_column_map = {}
+import httpx
+
+from llm_utils.candidate_retrieval import apply_candidate_retrieval, CANDIDATES_NOTE
+from llm_utils.discard_retry import build_retry_entries, build_retry_messages, accept_retry_choices
+from llm_utils.fast_matcher import get_fast_matcher, normalize_tokens
+from llm_utils.groq_client import run_llm_steps, run_llm_steps_async, stream_groq_chat_completion, forget_cached_completion, json_mode_enabled
+from llm_utils.json_stream import JsonArrayStreamParser
+from llm_utils.llm_json import parse_llm_list, json_mode_instruction
+from utils.metadata_catalog import MetadataCatalog
+
+MAPPING_CHUNK_TOKEN_BUDGET = 1500
+MAPPING_MAX_WORKERS = 4
+MAPPING_CHUNK_RETRIES = 2
+MAPPING_STATE_MAX_ENTRIES = 5000
+
+
+def build_mapping_messages(entries, context_note="", json_mode=False):
+    system_prompt = (
+        "You are an Oracle R12 expert. Using the label, hint_table, hint_column, and optional comment, map each label to the correct Oracle R12 TABLE and COLUMN.\n"
+        f"{context_note}\n"
+        "Return ONLY a JSON array like this:\n"
+        "[{\"extracted_label\": \"label1\", \"oracle_r12_table\": \"TABLE_NAME\", \"oracle_r12_column\": \"COLUMN_NAME\"}]"
+    )
+    if json_mode:
+        system_prompt += "\n" + json_mode_instruction("mappings")
+
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": json.dumps(entries, indent=2)}
+    ]
+
+
+def parse_mapping_response(response, groq_model, messages):
+    content = response["choices"][0]["message"]["content"].strip()
+    print("\U0001F4E8 Raw LLM Response:")
+    print(content)
+
+    try:
+        items = parse_llm_list(content)
+    except ValueError as e:
+        forget_cached_completion(groq_model, messages)
+        raise ValueError(f"❌ Failed to parse LLM mapping response:\n\n{content}\n\nError: {e}")
+    return [_mapping_item(item) for item in items if isinstance(item, dict)]
+
+
+def _mapping_item(item):
+    """String values only: Python-style answers may carry None or numbers."""
+    return {key: "" if value is None else str(value) for key, value in item.items()}
+
+
+class RequestedLabels:
+    """
+    Puts the requested label back on LLM items, which often echo it slightly
+    altered ("Invoice No" for "Invoice No:"). An item takes the first
+    unclaimed entry with the same label, then one with the same
+    normalize_tokens, then the entry at its own position if its label
+    matches no entry at all. Items that still match nothing are left as
+    they are.
+    """
+
+    def __init__(self, entries):
+        self.labels = [entry["extracted_label"] for entry in entries]
+        self.tokens = [normalize_tokens(label) for label in self.labels]
+        self.claimed = set()
+
+    def _claim(self, item, index):
+        self.claimed.add(index)
+        if item.get("extracted_label") == self.labels[index]:
+            return item
+        return dict(item, extracted_label=self.labels[index])
+
+    def _match(self, item, candidates, value):
+        for index, candidate in enumerate(candidates):
+            if index not in self.claimed and candidate == value:
+                return self._claim(item, index)
+        return None
+
+    def exact(self, item):
+        return self._match(item, self.labels, item.get("extracted_label", ""))
+
+    def normalized(self, item):
+        tokens = normalize_tokens(item.get("extracted_label", ""))
+        return self._match(item, self.tokens, tokens) if tokens else None
+
+    def positional(self, item, position):
+        label = item.get("extracted_label", "")
+        if label in self.labels or normalize_tokens(label) in self.tokens:
+            # A repeat of an entry that is already answered.
+            return None
+        if position < len(self.labels) and position not in self.claimed:
+            return self._claim(item, position)
+        return None
+
+    def attach(self, item, position):
+        """One item as it arrives (streaming); see attach_requested_labels for whole responses."""
+        return self.exact(item) or self.normalized(item) or self.positional(item, position) or item
+
+
+def attach_requested_labels(items, entries):
+    """
+    RequestedLabels over a whole response: every exact match is claimed
+    before any normalized one, and positions only count when the response
+    has one item per entry.
+    """
+    requested = RequestedLabels(entries)
+    attached = [requested.exact(item) for item in items]
+    attached = [result or requested.normalized(item) for item, result in zip(items, attached)]
+    if len(items) == len(entries):
+        attached = [result or requested.positional(item, position) for position, (item, result) in enumerate(zip(items, attached))]
+    return [result or item for item, result in zip(items, attached)]
+
+
+def _query_steps(entries, groq_model, context_note=""):
+    """One mapping request as a request generator for run_llm_steps."""
+    json_mode = json_mode_enabled()
+    messages = build_mapping_messages(entries, context_note, json_mode)
+    response = yield {"messages": messages, "json_mode": json_mode}
+    return attach_requested_labels(parse_mapping_response(response, groq_model, messages), entries)
 
-    if metadata_df is not None:
+
+def query_llm_for_mappings(entries, groq_model, groq_api_key, context_note=""):
+    return run_llm_steps(_query_steps(entries, groq_model, context_note), groq_model, groq_api_key)
+
+
+async def query_llm_for_mappings_async(entries, groq_model, groq_api_key, client=None, context_note=""):
+    return await run_llm_steps_async(_query_steps(entries, groq_model, context_note), groq_model, groq_api_key, client)
+
+
+def stream_llm_mappings(entries, groq_model, groq_api_key, context_note=""):
+    """
+    Streaming counterpart of query_llm_for_mappings: yields each mapping
+    object as soon as the streamed response completes it. If the output is
+    not a clean JSON array (comments, prose), the whole response goes through
+    parse_mapping_response and the labels not yielded yet follow at the end.
+    """
+    # JSON mode cannot be combined with streaming, so the tolerant parsers do the work here.
+    messages = build_mapping_messages(entries, context_note)
+    parser = JsonArrayStreamParser()
+    requested = RequestedLabels(entries)
+    content = []
+    seen_labels = set()
+    received = 0
+    for piece in stream_groq_chat_completion(model=groq_model, api_key=groq_api_key, messages=messages):
+        content.append(piece)
+        for item in parser.feed(piece):
+            if not isinstance(item, dict):
+                continue
+            item = requested.attach(_mapping_item(item), received)
+            received += 1
+            seen_labels.add(item.get("extracted_label", ""))
+            yield item
+
+    if not seen_labels or parser.errors:
+        response = {"choices": [{"message": {"content": "".join(content)}}]}
+        for item in attach_requested_labels(parse_mapping_response(response, groq_model, messages), entries):
+            if item.get("extracted_label", "") not in seen_labels:
+                yield item
+
+
+def _estimate_tokens(entry):
+    # ~4 characters per token is close enough for budgeting prompt chunks.
+    return len(json.dumps(entry, indent=2)) // 4 + 1
+
+
+def chunk_entries(entries, token_budget=MAPPING_CHUNK_TOKEN_BUDGET):
+    """Greedily packs entries into consecutive chunks of at most token_budget estimated tokens."""
+    chunks = []
+    current = []
+    current_tokens = 0
+    for entry in entries:
+        entry_tokens = _estimate_tokens(entry)
+        if current and current_tokens + entry_tokens > token_budget:
+            chunks.append(current)
+            current = []
+            current_tokens = 0
+        current.append(entry)
+        current_tokens += entry_tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _plan_chunks(entries, token_budget, action="Mapping"):
+    chunks = chunk_entries(entries, token_budget)
+    if chunks:
+        print(f"🧩 {action} {len(entries)} label(s) in {len(chunks)} chunk(s)")
+    return chunks
+
+
+def _report_chunk_failure(chunk, attempt, chunk_retries, error):
+    print(f"⚠️ Mapping chunk of {len(chunk)} label(s) failed (attempt {attempt + 1}/{chunk_retries + 1}): {error}")
+
+
+def _chunk_steps(chunk, groq_model, context_note, chunk_retries):
+    """A chunk's mapping request with up to chunk_retries extra attempts."""
+    for attempt in range(chunk_retries + 1):
         try:
-            if isinstance(metadata_df, (bytes, str)):
-                from io import StringIO
-                metadata_df = pd.read_csv(StringIO(metadata_df.decode("utf-8")), sep="|")
-            metadata_df.columns = [col.strip().lower() for col in metadata_df.columns]
+            return (yield from _query_steps(chunk, groq_model, context_note))
+        except httpx.HTTPStatusError:
+            # The client already retried what was retryable (429/5xx).
+            raise
         except Exception as e:
-            raise ValueError(f"❌ Failed to parse metadata CSV: {e}")
+            _report_chunk_failure(chunk, attempt, chunk_retries, e)
+            if attempt == chunk_retries:
+                raise
+
+
+def _empty_items(chunk):
+    return [
+        {"extracted_label": entry["extracted_label"], "oracle_r12_table": "", "oracle_r12_column": ""}
+        for entry in chunk
+    ]
+
+
+def _raise_chunk_errors(errors, chunks):
+    """
+    HTTP errors (429, 401 ...) are raised even if only one chunk hit them, so
+    callers can report them instead of showing discarded rows; anything else
+    only when every chunk failed.
+    """
+    for error in errors:
+        if isinstance(error, httpx.HTTPStatusError):
+            raise error
+    if errors and len(errors) == len(chunks):
+        raise errors[0]
+
+
+def _merge_chunk_outcomes(entries, chunks, outcomes):
+    """
+    Per-chunk items (or the exception the chunk failed with) as one list
+    ordered like the input labels. A chunk that failed for any reason but
+    an HTTP error contributes empty items, so its labels end up discarded;
+    see _raise_chunk_errors for what is raised.
+    """
+    results = []
+    errors = []
+    for chunk, outcome in zip(chunks, outcomes):
+        if isinstance(outcome, BaseException):
+            errors.append(outcome)
+            results.extend(_empty_items(chunk))
+        else:
+            results.extend(outcome)
+    _raise_chunk_errors(errors, chunks)
+    return order_by_labels(results, [entry["extracted_label"] for entry in entries])
+
+
+def _future_outcome(future):
+    try:
+        return future.result()
+    except Exception as e:
+        return e
+
+
+def map_entries_in_chunks(entries, groq_model, groq_api_key, chunk_token_budget=MAPPING_CHUNK_TOKEN_BUDGET, max_workers=MAPPING_MAX_WORKERS, chunk_retries=MAPPING_CHUNK_RETRIES, context_note=""):
+    """
+    Maps entries chunk by chunk on a bounded thread pool and returns the LLM
+    items ordered like the input labels.
+
+    A chunk that still fails after chunk_retries extra attempts contributes
+    empty items, so its labels end up discarded; the error is only raised if
+    every chunk failed. HTTP errors (429, 401 ...) from any chunk are raised.
+    """
+    chunks = _plan_chunks(entries, chunk_token_budget)
+    if not chunks:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as executor:
+        futures = [
+            executor.submit(run_llm_steps, _chunk_steps(chunk, groq_model, context_note, chunk_retries), groq_model, groq_api_key)
+            for chunk in chunks
+        ]
+        outcomes = [_future_outcome(future) for future in futures]
+    return _merge_chunk_outcomes(entries, chunks, outcomes)
 
-    for _, row in metadata_df.iterrows():
-        table = row['table_name'].strip().upper()
-        columns = [col.strip().upper() for col in str(row['column_list']).split(',')]
-        for col in columns:
-            metadata_lookup.add((table, col))
-            table_column_map.setdefault(table, set()).add(col)
 
+async def map_entries_in_chunks_async(entries, groq_model, groq_api_key, client=None, chunk_token_budget=MAPPING_CHUNK_TOKEN_BUDGET, max_concurrency=MAPPING_MAX_WORKERS, chunk_retries=MAPPING_CHUNK_RETRIES, context_note=""):
+    """
+    Async counterpart of map_entries_in_chunks: chunks are sent on the shared
+    AsyncClient with at most max_concurrency requests in flight, and failures
+    are handled the same way.
+    """
+    chunks = _plan_chunks(entries, chunk_token_budget)
+    if not chunks:
+        return []
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def map_chunk(chunk):
+        async with semaphore:
+            return await run_llm_steps_async(_chunk_steps(chunk, groq_model, context_note, chunk_retries), groq_model, groq_api_key, client)
+
+    outcomes = await asyncio.gather(*(map_chunk(chunk) for chunk in chunks), return_exceptions=True)
+    return _merge_chunk_outcomes(entries, chunks, outcomes)
+
+
+def map_entries_streaming(entries, groq_model, groq_api_key, chunk_token_budget=MAPPING_CHUNK_TOKEN_BUDGET, max_workers=MAPPING_MAX_WORKERS, chunk_retries=MAPPING_CHUNK_RETRIES, context_note=""):
+    """
+    Generator version of map_entries_in_chunks: chunks stream in parallel on
+    a bounded thread pool and items are yielded in arrival order.
+
+    A chunk is only retried if it failed before producing anything; labels a
+    failed chunk never returned are yielded as empty items (and so end up
+    discarded). The error is raised at the end if every chunk failed, or if
+    any chunk hit an HTTP error (429, 401 ...).
+    """
+    chunks = _plan_chunks(entries, chunk_token_budget, "Streaming")
+    if not chunks:
+        return
+    events = queue.Queue()
+
+    def stream_chunk(chunk):
+        received = set()
+        error = None
+        for attempt in range(chunk_retries + 1):
+            try:
+                for item in stream_llm_mappings(chunk, groq_model, groq_api_key, context_note):
+                    received.add(item.get("extracted_label", ""))
+                    events.put(("item", item))
+                events.put(("done", None))
+                return
+            except httpx.HTTPStatusError as e:
+                error = e
+                break
+            except Exception as e:
+                error = e
+                _report_chunk_failure(chunk, attempt, chunk_retries, e)
+                if received:
+                    break
+        for item in _empty_items(chunk):
+            if item["extracted_label"] not in received:
+                events.put(("item", item))
+        events.put(("done", error))
+
+    errors = []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as executor:
+        for chunk in chunks:
+            executor.submit(stream_chunk, chunk)
+        pending = len(chunks)
+        while pending:
+            kind, payload = events.get()
+            if kind == "item":
+                yield payload
+                continue
+            pending -= 1
+            if payload is not None:
+                errors.append(payload)
+    _raise_chunk_errors(errors, chunks)
+
+
+def order_by_labels(items, labels):
+    """Stable sort of mapping items by the position of their label in labels."""
+    label_order = {}
+    for idx, label in enumerate(labels):
+        label_order.setdefault(label, idx)
+    return sorted(items, key=lambda item: label_order.get(item.get("extracted_label", ""), len(labels)))
+
+
+class MappingState:
+    """
+    Per-label mapping results from earlier runs, keyed by (label, hint_table,
+    hint_column, comment, metadata version, model). Re-mapping only sends
+    labels whose key is not in here yet; results are merged back in label
+    order. Labels that came back unmapped (empty table and column, e.g. a
+    failed chunk) are not remembered, so they are retried next time.
+    """
+
+    def __init__(self, max_entries=MAPPING_STATE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        self._entries.clear()
+
+    @staticmethod
+    def keys_for(headers, user_table_map, user_column_map, user_comment_map, metadata_version, groq_model=None):
+        return {
+            label: (
+                label,
+                user_table_map.get(label, "").strip(),
+                user_column_map.get(label, "").strip(),
+                user_comment_map.get(label, "").strip(),
+                metadata_version,
+                groq_model,
+            )
+            for label in headers
+        }
+
+    def results_for(self, key):
+        """Stored [(status, item)] for a key; status is "validated" or "discarded"."""
+        return [(status, dict(item)) for status, item in self._entries.get(key, [])]
+
+    def dirty_labels(self, headers, keys):
+        """Labels of headers (duplicates kept) that have no stored result for their key."""
+        return [label for label in headers if keys[label] not in self._entries]
+
+    def merge(self, headers, keys, validated, discarded):
+        """
+        Stores the fresh results and returns (validated, discarded) for all of
+        headers: fresh results where present, stored ones otherwise. Fresh
+        results whose label is not one of the keys are returned at the end
+        without being stored.
+        """
+        fresh = OrderedDict()
+        for status, items in (("validated", validated), ("discarded", discarded)):
+            for item in items:
+                fresh.setdefault(item.get("extracted_label", ""), []).append((status, item))
+
+        for label, results in fresh.items():
+            if label not in keys:
+                continue
+            if any(status == "discarded" and not item["oracle_r12_table"] and not item["oracle_r12_column"] for status, item in results):
+                self._entries.pop(keys[label], None)
+                continue
+            self._entries[keys[label]] = results
+            self._entries.move_to_end(keys[label])
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+        merged_validated = []
+        merged_discarded = []
+        unmatched = [label for label in fresh if label not in keys]
+        for label in list(dict.fromkeys(headers)) + unmatched:
+            results = fresh.get(label) or self._entries.get(keys[label], [])
+            for status, item in results:
+                # Copies, so callers decorating the rows do not alter the stored results.
+                (merged_validated if status == "validated" else merged_discarded).append(dict(item))
+        return merged_validated, merged_discarded
+
+
+def prepare_mapping_entries(headers, user_table_map, user_column_map, user_comment_map, catalog, retriever=None, use_fast_path=True):
+    """
+    Builds the per-label entries and resolves what the fast matcher and the
+    retriever can. Returns (resolved_locally, entries_for_llm, context_note).
+    """
     user_entries = [
         {
             "extracted_label": label,
@@ -76,58 +449,43 @@ def ask_llm_for_mappings(headers, user_table_map, user_column_map, user_comment_
         for label in headers
     ]
 
-    print("\U0001F9EA Sending user entries to GROQ (mapping with hints):")
-    print(json.dumps(user_entries, indent=2))
+    resolved_locally = []
+    fast_matcher = get_fast_matcher(catalog) if use_fast_path else None
+    if fast_matcher is not None:
+        resolved_locally, user_entries = fast_matcher.match(user_entries)
 
-    def query_llm_for_mappings(entries, context_note=""):
-        system_prompt = (
-            "You are an Oracle R12 expert. Using the label, hint_table, hint_column, and optional comment, map each label to the correct Oracle R12 TABLE and COLUMN.\n"
-            f"{context_note}\n"
-            "Return ONLY a JSON array like this:\n"
-            "[{\"extracted_label\": \"label1\", \"oracle_r12_table\": \"TABLE_NAME\", \"oracle_r12_column\": \"COLUMN_NAME\"}]"
-        )
+    context_note = ""
+    if retriever is not None and user_entries:
+        retrieved, user_entries = apply_candidate_retrieval(user_entries, retriever)
+        resolved_locally += retrieved
+        context_note = CANDIDATES_NOTE
 
-        response = safe_groq_chat_completion(
-            model=groq_model,
-            api_key=groq_api_key,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": json.dumps(entries, indent=2)}
-            ]
-        )
+    if user_entries:
+        print("\U0001F9EA Sending user entries to GROQ (mapping with hints):")
+        print(json.dumps(user_entries, indent=2))
 
-        content = response["choices"][0]["message"]["content"].strip()
-        print("\U0001F4E8 Raw LLM Response:")
-        print(content)
+    return resolved_locally, user_entries, context_note
 
-        try:
-            content = re.sub(r"//.*", "", content)  # remove inline comments
-            json_match = re.search(r"\[\s*{.*?}\s*\]", content, re.DOTALL)
-            if not json_match:
-                raise ValueError(f"❌ Couldn't extract a valid JSON array:\n\n{content}")
-            clean_json = json_match.group(0)
-            return json.loads(clean_json)
-        except Exception as e:
-            raise ValueError(f"❌ Failed to parse LLM mapping response:\n\n{content}\n\nError: {e}")
 
-    llm_mappings = query_llm_for_mappings(user_entries)
+def validate_mappings(llm_mappings, catalog, user_table_map, user_column_map, user_comment_map):
+    """Splits mapping items into (validated, discarded) against the catalog."""
+    validated_mappings = []
+    discarded_llm_items = []
 
     for item in llm_mappings:
         label = item.get("extracted_label", "")
         llm_table = item.get("oracle_r12_table", "").strip().upper()
         llm_column = item.get("oracle_r12_column", "").strip().upper()
 
-        variants = [llm_table, llm_table + "_ALL", llm_table + "_B", llm_table + "_TL"]
-        found_match = False
+        resolved = catalog.resolve(llm_table, llm_column)
 
-        for variant in variants:
-            if (variant, llm_column) in metadata_lookup:
-                llm_table = variant
-                found_match = True
-                print(f"✅ Found Match: {llm_table}.{llm_column}")
-                break
-
-        if found_match:
+        if resolved:
+            resolved_table, llm_column, how = resolved
+            if how == "exact":
+                print(f"✅ Found Match: {resolved_table}.{llm_column}")
+            else:
+                print(f"🔧 Corrected ({how}): {llm_table}.{llm_column} -> {resolved_table}.{llm_column}")
+            llm_table = resolved_table
             validated_mappings.append({
                 "extracted_label": label,
                 "oracle_r12_table": llm_table,
@@ -154,4 +512,175 @@ def ask_llm_for_mappings(headers, user_table_map, user_column_map, user_comment_
             })
         print(json.dumps(discarded_output, indent=2))
 
-    return validated_mappings, discarded_llm_items, table_column_map
+    return validated_mappings, discarded_llm_items
+
+
+def _retry_steps(discarded_items, catalog, groq_model):
+    """The discarded-mapping retry pass as a request generator for run_llm_steps."""
+    entries = build_retry_entries(discarded_items, catalog)
+    if not entries:
+        return [], discarded_items
+    print(f"🔁 Retrying {len(entries)} discarded label(s) against metadata candidates")
+    json_mode = json_mode_enabled()
+    messages = build_retry_messages(entries, json_mode)
+    try:
+        response = yield {"messages": messages, "json_mode": json_mode}
+        choices = attach_requested_labels(parse_mapping_response(response, groq_model, messages), entries)
+    except Exception as e:
+        print(f"⚠️ Retry pass for discarded mappings failed: {e}")
+        return [], discarded_items
+    return accept_retry_choices(choices, entries, discarded_items)
+
+
+def retry_discarded_mappings(discarded_items, catalog, groq_model, groq_api_key):
+    """
+    Second pass over discarded mappings: one batched call asking the LLM to
+    choose from a closed candidate list per label. Returns (recovered,
+    still_discarded); on any failure everything stays discarded.
+    """
+    return run_llm_steps(_retry_steps(discarded_items, catalog, groq_model), groq_model, groq_api_key)
+
+
+async def retry_discarded_mappings_async(discarded_items, catalog, groq_model, groq_api_key, client=None):
+    """Async counterpart of retry_discarded_mappings."""
+    return await run_llm_steps_async(_retry_steps(discarded_items, catalog, groq_model), groq_model, groq_api_key, client)
+
+
+def _labels_to_map(headers, user_table_map, user_column_map, user_comment_map, catalog, groq_model, state):
+    """Returns (labels_to_map, state_keys); without a state every label is mapped."""
+    if state is None:
+        return headers, None
+    keys = state.keys_for(headers, user_table_map, user_column_map, user_comment_map, catalog.version, groq_model)
+    dirty = state.dirty_labels(headers, keys)
+    if len(dirty) < len(headers):
+        print(f"♻️ Reusing {len(headers) - len(dirty)} unchanged label mapping(s); re-mapping {len(dirty)}")
+    return dirty, keys
+
+
+class MappingRun:
+    """
+    The steps every ask_llm_for_mappings front end shares: picking the labels
+    to (re)map, local resolution, validation, the retry pass and the merge
+    with the MappingState. The front ends only send the LLM requests.
+    """
+
+    def __init__(self, headers, user_table_map, user_column_map, user_comment_map, catalog, groq_model, retriever=None, use_fast_path=True, state=None):
+        self.all_headers = headers
+        self.hints = (user_table_map, user_column_map, user_comment_map)
+        self.catalog = catalog
+        self.groq_model = groq_model
+        self.state = state
+        self.headers, self.state_keys = _labels_to_map(headers, *self.hints, catalog, groq_model, state)
+        self.resolved_locally, self.entries, self.context_note = prepare_mapping_entries(
+            self.headers, *self.hints, catalog, retriever, use_fast_path
+        )
+        self.validated = []
+        self.discarded = []
+
+    def reused(self):
+        """(status, item) events for the stored results of unchanged labels."""
+        if self.state is None:
+            return []
+        dirty = set(self.headers)
+        return [
+            event
+            for label in dict.fromkeys(self.all_headers)
+            if label not in dirty
+            for event in self.state.results_for(self.state_keys[label])
+        ]
+
+    def add(self, items):
+        """Validates items against the catalog; returns their ("validated"/"discarded", item) events."""
+        validated, discarded = validate_mappings(items, self.catalog, *self.hints)
+        self.validated.extend(validated)
+        self.discarded.extend(discarded)
+        return [("validated", item) for item in validated] + [("discarded", item) for item in discarded]
+
+    def retry_steps(self):
+        """Retry pass over the discarded items for run_llm_steps; returns ("recovered", item) events."""
+        if not self.discarded:
+            return []
+        recovered, self.discarded = yield from _retry_steps(self.discarded, self.catalog, self.groq_model)
+        self.validated.extend(recovered)
+        return [("recovered", item) for item in recovered]
+
+    def result(self):
+        """(validated, discarded, table_column_map) in label order, merged with the state."""
+        validated = order_by_labels(self.validated, self.headers)
+        discarded = order_by_labels(self.discarded, self.headers)
+        if self.state is not None:
+            validated, discarded = self.state.merge(self.all_headers, self.state_keys, validated, discarded)
+        return validated, discarded, self.catalog.table_column_map
+
+
+def ask_llm_for_mappings(headers, user_table_map, user_column_map, user_comment_map, metadata_df=None, groq_model=None, groq_api_key=None, catalog=None, chunk_token_budget=MAPPING_CHUNK_TOKEN_BUDGET, max_workers=MAPPING_MAX_WORKERS, retriever=None, use_fast_path=True, state=None, retry_discarded=True):
+    """
+    Maps headers to validated R12 table/columns. With a MappingState only
+    labels whose hints, comment, metadata or model changed are re-mapped.
+    With retry_discarded, unmatched suggestions get one batched second pass
+    against metadata candidates. Returns (validated, discarded, table_column_map).
+    """
+    if catalog is None:
+        catalog = MetadataCatalog.from_dataframe(metadata_df)
+    run = MappingRun(headers, user_table_map, user_column_map, user_comment_map, catalog, groq_model, retriever, use_fast_path, state)
+
+    llm_mappings = map_entries_in_chunks(
+        run.entries,
+        groq_model=groq_model,
+        groq_api_key=groq_api_key,
+        chunk_token_budget=chunk_token_budget,
+        max_workers=max_workers,
+        context_note=run.context_note
+    )
+    run.add(run.resolved_locally + llm_mappings)
+    if retry_discarded:
+        run_llm_steps(run.retry_steps(), groq_model, groq_api_key)
+    return run.result()
+
+
+async def ask_llm_for_mappings_async(headers, user_table_map, user_column_map, user_comment_map, catalog, groq_model=None, groq_api_key=None, client=None, chunk_token_budget=MAPPING_CHUNK_TOKEN_BUDGET, max_concurrency=MAPPING_MAX_WORKERS, retriever=None, use_fast_path=True, state=None, retry_discarded=True):
+    """Async counterpart of ask_llm_for_mappings; same return value."""
+    run = MappingRun(headers, user_table_map, user_column_map, user_comment_map, catalog, groq_model, retriever, use_fast_path, state)
+
+    llm_mappings = await map_entries_in_chunks_async(
+        run.entries,
+        groq_model=groq_model,
+        groq_api_key=groq_api_key,
+        client=client,
+        chunk_token_budget=chunk_token_budget,
+        max_concurrency=max_concurrency,
+        context_note=run.context_note
+    )
+    run.add(run.resolved_locally + llm_mappings)
+    if retry_discarded:
+        await run_llm_steps_async(run.retry_steps(), groq_model, groq_api_key, client)
+    return run.result()
+
+
+def ask_llm_for_mappings_stream(headers, user_table_map, user_column_map, user_comment_map, metadata_df=None, groq_model=None, groq_api_key=None, catalog=None, chunk_token_budget=MAPPING_CHUNK_TOKEN_BUDGET, max_workers=MAPPING_MAX_WORKERS, retriever=None, use_fast_path=True, state=None, retry_discarded=True):
+    """
+    Streaming counterpart of ask_llm_for_mappings. Yields (event, payload):
+    ("validated", item) / ("discarded", item) as soon as each mapping is known
+    and checked against the catalog, ("recovered", item) for discarded labels
+    fixed by the retry pass, and finally ("done", (validated, discarded,
+    table_column_map)) with the same value ask_llm_for_mappings returns.
+    """
+    if catalog is None:
+        catalog = MetadataCatalog.from_dataframe(metadata_df)
+    run = MappingRun(headers, user_table_map, user_column_map, user_comment_map, catalog, groq_model, retriever, use_fast_path, state)
+    yield from run.reused()
+    yield from run.add(run.resolved_locally)
+
+    for item in map_entries_streaming(
+        run.entries,
+        groq_model=groq_model,
+        groq_api_key=groq_api_key,
+        chunk_token_budget=chunk_token_budget,
+        max_workers=max_workers,
+        context_note=run.context_note
+    ):
+        yield from run.add([item])
+
+    if retry_discarded:
+        yield from run_llm_steps(run.retry_steps(), groq_model, groq_api_key)
+    yield "done", run.result()
@@ -0,0 +1,224 @@
+import json
+import re
+
+# Start positions tried before giving up; each attempt is a single linear scan.
+MAX_START_ATTEMPTS = 5
+
+_FENCE = "```"
+_START = re.compile(r"[\[{]")
+_NUMBER = re.compile(r"-?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?")
+_NAME = re.compile(r"[A-Za-z_$][\w$]*")
+_STRING_RUNS = {'"': re.compile(r'[^"\\]*'), "'": re.compile(r"[^'\\]*")}
+_ESCAPES = {'"': '"', "'": "'", "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+_LITERALS = {"true": True, "false": False, "null": None, "True": True, "False": False, "None": None}
+
+
+class LLMOutputError(ValueError):
+    """LLM output with no parsable JSON value; position is the offset the parser stopped at."""
+
+    def __init__(self, message, position=None):
+        super().__init__(message if position is None else f"{message} at position {position}")
+        self.position = position
+
+
+class _Parser:
+    """
+    Recursive-descent reader for the JSON LLMs actually write: code fences
+    and prose around the value, // /* */ and # comments, trailing commas,
+    single-quoted strings, bare keys, tuples and Python True/False/None.
+    """
+
+    def __init__(self, text, pos=0):
+        self.text = text
+        self.pos = pos
+        self.opened = 0
+
+    def error(self, message):
+        raise LLMOutputError(message, self.pos)
+
+    def at(self, token):
+        return self.text.startswith(token, self.pos)
+
+    def skip(self):
+        """Whitespace and comments outside strings."""
+        text = self.text
+        while self.pos < len(text):
+            if text[self.pos].isspace():
+                self.pos += 1
+            elif self.at("#") or self.at("//"):
+                end = text.find("\n", self.pos)
+                self.pos = len(text) if end == -1 else end + 1
+            elif self.at("/*"):
+                end = text.find("*/", self.pos + 2)
+                if end == -1:
+                    self.error("Unterminated comment")
+                self.pos = end + 2
+            else:
+                break
+
+    def value(self):
+        self.skip()
+        if self.pos >= len(self.text):
+            self.error("Unexpected end of output")
+        char = self.text[self.pos]
+        if char == "[":
+            return self.sequence("]")
+        if char == "(":
+            return self.sequence(")")
+        if char == "{":
+            return self.mapping()
+        if char in _STRING_RUNS:
+            return self.string()
+        match = _NUMBER.match(self.text, self.pos)
+        if match:
+            self.pos = match.end()
+            number = match.group()
+            return float(number) if any(c in number for c in ".eE") else int(number)
+        match = _NAME.match(self.text, self.pos)
+        if match and match.group() in _LITERALS:
+            self.pos = match.end()
+            return _LITERALS[match.group()]
+        self.error(f"Unexpected {char!r}")
+
+    def sequence(self, close):
+        self.pos += 1
+        self.opened += 1
+        items = []
+        while True:
+            self.skip()
+            if self.at(close):
+                self.pos += 1
+                return items
+            items.append(self.value())
+            self.skip()
+            if self.at(","):
+                self.pos += 1
+            elif not self.at(close):
+                self.error(f"Expected ',' or '{close}'")
+
+    def mapping(self):
+        self.pos += 1
+        self.opened += 1
+        result = {}
+        while True:
+            self.skip()
+            if self.at("}"):
+                self.pos += 1
+                return result
+            if self.pos < len(self.text) and self.text[self.pos] in _STRING_RUNS:
+                key = self.string()
+            else:
+                match = _NAME.match(self.text, self.pos)
+                if not match:
+                    self.error("Expected a key")
+                self.pos = match.end()
+                key = match.group()
+            self.skip()
+            if not self.at(":"):
+                self.error("Expected ':'")
+            self.pos += 1
+            result[key] = self.value()
+            self.skip()
+            if self.at(","):
+                self.pos += 1
+            elif not self.at("}"):
+                self.error("Expected ',' or '}'")
+
+    def string(self):
+        text = self.text
+        quote = text[self.pos]
+        self.pos += 1
+        parts = []
+        unicode_escapes = False
+        while True:
+            match = _STRING_RUNS[quote].match(text, self.pos)
+            parts.append(match.group())
+            self.pos = match.end()
+            if self.pos >= len(text):
+                self.error("Unterminated string")
+            if text[self.pos] == quote:
+                self.pos += 1
+                break
+            escape = text[self.pos + 1:self.pos + 2]
+            if escape == "u":
+                unicode_escapes = True
+                try:
+                    parts.append(chr(int(text[self.pos + 2:self.pos + 6], 16)))
+                except ValueError:
+                    self.error("Invalid \\u escape")
+                self.pos += 6
+            else:
+                parts.append(_ESCAPES.get(escape, escape))
+                self.pos += 2
+        value = "".join(parts)
+        if not unicode_escapes:
+            return value
+        try:
+            # Joins 😀-style surrogate pairs into one character.
+            return value.encode("utf-16", "surrogatepass").decode("utf-16")
+        except UnicodeDecodeError:
+            return value
+
+
+def parse_llm_json(text):
+    """
+    Returns the first JSON array or object in LLM output (inside the first
+    ``` fence when there is one), tolerating comments, trailing commas and
+    Python literal syntax. Each attempt is one pass over the text. A bracket
+    in prose ("[see below]") moves on to the next '[' or '{', at most
+    MAX_START_ATTEMPTS times; a broken value with nested structures is
+    reported instead, so a bad array never degrades to one inner object.
+    Raises LLMOutputError when nothing parses.
+    """
+    text = text or ""
+    stripped = text.strip()
+    if stripped[:1] in ("[", "{"):
+        # Well-formed output is the common case; the C decoder is faster.
+        try:
+            return json.loads(stripped)
+        except ValueError:
+            pass
+
+    offset = 0
+    fence = text.find(_FENCE)
+    if fence != -1:
+        # Skip the opening fence and its language tag (```json).
+        line_end = text.find("\n", fence)
+        offset = len(text) if line_end == -1 else line_end + 1
+
+    error = LLMOutputError("No JSON array or object found")
+    for _ in range(MAX_START_ATTEMPTS):
+        start = _START.search(text, offset)
+        if start is None:
+            if offset and fence != -1:
+                # Nothing inside the fence: fall back to the whole text once.
+                offset, fence = 0, -1
+                continue
+            break
+        parser = _Parser(text, start.start())
+        try:
+            return parser.value()
+        except LLMOutputError as e:
+            error = e
+            if parser.opened > 1:
+                break
+            offset = start.start() + 1
+    raise error
+
+
+def parse_llm_list(text):
+    """
+    parse_llm_json for prompts that ask for an array. A JSON-mode answer
+    wraps it in an object ({"mappings": [...]}), whose first list is
+    returned; a lone object becomes a one-item list.
+    """
+    value = parse_llm_json(text)
+    if isinstance(value, dict):
+        lists = [item for item in value.values() if isinstance(item, list)]
+        return lists[0] if lists else [value]
+    return value
+
+
+def json_mode_instruction(key):
+    """Prompt line asking for the array wrapped in an object, as JSON mode requires."""
+    return f'Wrap the array in a JSON object under the key "{key}", like {{"{key}": [...]}}.'
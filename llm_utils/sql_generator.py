@@ -1,60 +1,70 @@
-import time
 import json
-import requests
 import re
 
-def safe_groq_chat_completion(model, api_key, messages, retries=3, delay=3):
-    url = "https://api.groq.com/openai/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "model": model,
-        "messages": messages,
-        "temperature": 0.2
-    }
-
-    for i in range(retries):
-        try:
-            print("📤 Sending payload to GROQ API...")
-            response = requests.post(url, headers=headers, json=payload)
-            print("📨 GROQ raw response:")
-            print(response.text)
-
-            if response.status_code == 200:
-                return response.json()
-            else:
-                print(f"⚠️ Attempt {i+1}: Error {response.status_code}")
-                if i < retries - 1:
-                    time.sleep(delay)
-                else:
-                    raise RuntimeError(f"GROQ API failed: {response.status_code} - {response.text}")
-        except Exception as ex:
-            print(f"❌ Exception: {ex}")
-            if i < retries - 1:
-                time.sleep(delay)
-            else:
-                raise RuntimeError(f"❌ Failed after {retries} retries: {ex}")
-
-def generate_sql(mappings, groq_model, groq_api_key, table_column_map=None):
+from llm_utils.groq_client import run_llm_steps, run_llm_steps_async
+from utils.join_graph import JoinGraph, build_select_sql, describe_joins
+from utils.sql_validator import validate_sql, format_issues
+
+# Standard R12 audit columns: shared by nearly every table, never a join key.
+WHO_COLUMNS = {"REQUEST_ID", "PROGRAM_ID", "PROGRAM_APPLICATION_ID", "LAST_UPDATE_LOGIN", "CREATED_BY", "LAST_UPDATED_BY"}
+
+def shared_key_columns(tables, table_column_map):
+    """Lines like "A / B: X_ID, Y_ID" for the *_ID columns two mapped tables both have."""
+    tables = list(dict.fromkeys(tables))
+    lines = []
+    for i, table in enumerate(tables):
+        for other in tables[i + 1:]:
+            shared = (table_column_map.get(table, set()) & table_column_map.get(other, set())) - WHO_COLUMNS
+            keys = sorted(c for c in shared if c.endswith("_ID"))
+            if keys:
+                lines.append(f"{table} / {other}: {', '.join(keys)}")
+    return lines
+
+def build_sql_messages(mappings, join_lines=None, shared_keys=None):
+    if join_lines or shared_keys:
+        join_note = "Join the tables only with the conditions below; do not invent other join columns.\n"
+        if join_lines:
+            join_note += "Known join conditions:\n" + "\n".join(join_lines) + "\n"
+        if shared_keys:
+            join_note += "Key columns the tables share (use only where no known condition applies):\n" + "\n".join(shared_keys) + "\n"
+    else:
+        join_note = "If multiple tables are involved, assume foreign keys exist appropriately.\n"
+
     prompt = (
         "You're an Oracle SQL expert. Generate a SELECT SQL statement using the following mappings.\n"
         "Each mapping includes the target table and column to select. Use proper aliases and joins if needed.\n"
-        "If multiple tables are involved, assume foreign keys exist appropriately.\n\n"
+        f"{join_note}\n"
         "Mappings:\n"
         f"{json.dumps(mappings, indent=2)}"
     )
 
-    response = safe_groq_chat_completion(
-        model=groq_model,
-        api_key=groq_api_key,
-        messages=[
-            {"role": "system", "content": "You are a helpful Oracle SQL query generator."},
-            {"role": "user", "content": prompt}
-        ]
-    )
+    return [
+        {"role": "system", "content": "You are a helpful Oracle SQL query generator."},
+        {"role": "user", "content": prompt}
+    ]
 
+def plan_sql(mappings, table_column_map=None, join_graph=None):
+    """
+    Returns (sql, None) when the join graph connects every mapped table, so
+    no LLM call is needed, otherwise (None, messages) for the LLM fallback
+    with the known joins and shared key columns spelled out.
+    """
+    if not mappings:
+        return "", None
+    join_graph = join_graph if join_graph is not None else JoinGraph()
+    sql, unreachable = build_select_sql(mappings, join_graph)
+    if sql:
+        print("🧭 SQL assembled from the join graph (no LLM call)")
+        return sql, None
+
+    print(f"⚠️ No known join path to {', '.join(unreachable)}; asking the LLM")
+    tables = [m["oracle_r12_table"] for m in mappings]
+    _, joins, _ = join_graph.plan(tables)
+    join_lines = describe_joins(join_graph, tables + [table for table, _, _ in joins])
+    shared_keys = shared_key_columns(tables, table_column_map or {})
+    return None, build_sql_messages(mappings, join_lines, shared_keys)
+
+def parse_sql_response(response):
     try:
         content = response["choices"][0]["message"]["content"]
         sql_match = re.search(r"(?i)(select .*?;)", content, re.DOTALL)
@@ -64,3 +74,60 @@ def generate_sql(mappings, groq_model, groq_api_key, table_column_map=None):
             return content.strip()
     except Exception as e:
         raise ValueError(f"❌ Failed to parse SQL from LLM response: {e}\nRaw:\n{response}")
+
+
+def build_fix_messages(messages, sql, issues):
+    """The original conversation plus the rejected query and a targeted fix request."""
+    return messages + [
+        {"role": "assistant", "content": sql},
+        {"role": "user", "content": (
+            "This query fails validation against the R12 metadata:\n"
+            f"{format_issues(issues)}\n"
+            "Fix only these problems, keep everything else unchanged, and return the corrected SELECT statement."
+        )}
+    ]
+
+def _report_issues(sql, table_column_map):
+    issues = validate_sql(sql, table_column_map)
+    if issues:
+        print(f"🩺 SQL validation found {len(issues)} issue(s):\n{format_issues(issues)}")
+    return issues
+
+def _better_sql(sql, issues, fixed, table_column_map):
+    """Keeps the fixed query unless it validates worse than the original."""
+    remaining = _report_issues(fixed, table_column_map)
+    if len(remaining) > len(issues):
+        print("⚠️ Fixed SQL is worse than the original; keeping the original")
+        return sql
+    if not remaining:
+        print("✅ SQL fixed after validation")
+    return fixed
+
+def _sql_steps(mappings, table_column_map=None, join_graph=None):
+    """The generate_sql flow as a request generator for run_llm_steps."""
+    sql, messages = plan_sql(mappings, table_column_map, join_graph)
+    if sql is not None:
+        _report_issues(sql, table_column_map)
+        return sql
+    sql = parse_sql_response((yield {"messages": messages}))
+
+    issues = _report_issues(sql, table_column_map)
+    if not issues:
+        return sql
+    try:
+        fixed = parse_sql_response((yield {"messages": build_fix_messages(messages, sql, issues)}))
+    except Exception as e:
+        print(f"⚠️ SQL fix request failed: {e}")
+        return sql
+    return _better_sql(sql, issues, fixed, table_column_map)
+
+def generate_sql(mappings, groq_model, groq_api_key, table_column_map=None, join_graph=None):
+    """
+    SQL for the mappings: assembled from the join graph when possible, else
+    generated by the LLM. LLM output is validated against table_column_map
+    and gets at most one targeted fix request.
+    """
+    return run_llm_steps(_sql_steps(mappings, table_column_map, join_graph), groq_model, groq_api_key)
+
+async def generate_sql_async(mappings, groq_model, groq_api_key, table_column_map=None, client=None, join_graph=None):
+    return await run_llm_steps_async(_sql_steps(mappings, table_column_map, join_graph), groq_model, groq_api_key, client)
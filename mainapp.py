@@ -1,33 +1,76 @@
 import streamlit as st
 import pandas as pd
 import io
+import hashlib
 import json
 import tempfile
 import os
 from dotenv import load_dotenv, set_key
 from pathlib import Path
-import requests
+import httpx
 
 from extractors.excel_extractor import extract_text_from_excel
-from extractors.pdf_extractor import extract_text_from_pdf
-from extractors.image_extractor import extract_text_from_image
+from extractors.pdf_extractor import extract_header_text_from_pdf
+from extractors.image_extractor import extract_text_from_image, iter_multipage_image_text
 from llm_utils.header_extraction import extract_headers_with_llm
-from llm_utils.label_mapping import ask_llm_for_mappings
-from llm_utils.sql_generator import generate_sql
-from llm_utils.template_generator import generate_sample_xml, generate_data_definition, generate_excel_template
-from clean_metadata_csv import clean_and_load_metadata
+from llm_utils.label_mapping import ask_llm_for_mappings_stream, MappingState
+from llm_utils.candidate_retrieval import get_column_retriever
+from llm_utils.llm_cache import get_response_cache
+from llm_utils.template_generator import generate_data_definition
+from pipeline import generate_outputs
+from utils.join_graph import load_join_graph, JOINS_DIR_NAME
+from utils.metadata_index import load_metadata_catalog, metadata_signature
+from utils.sql_validator import validate_sql, format_issues
+from utils.explain_plan import get_explain_backend, explain_sql, format_plan
+from utils.filters import is_useful_line, clean_text
 
 # Load existing .env file
 dotenv_path = Path('.env')
 load_dotenv(dotenv_path)
 
-def clean_text(text):
-    lines = text.split("\n")
-    useful = [line.strip() for line in lines if any(
-        keyword in line.lower()
-        for keyword in ["date", "number", "buyer", "amount", "price", "quantity", "part", "tax"]
-    ) and len(line.strip()) > 0]
-    return "\n".join(useful)
+
+# Streamlit reruns this script on every widget change; the expensive steps below
+# are memoized so editing a hint does not re-read metadata or re-extract the upload.
+@st.cache_resource(show_spinner="Loading R12 metadata...")
+def load_cached_catalog(metadata_dir, signature):
+    # signature only keys the cache: a changed CSV yields a new entry
+    return load_metadata_catalog(metadata_dir)
+
+
+@st.cache_resource(show_spinner="Loading R12 join metadata...")
+def load_cached_join_graph(metadata_dir, signature):
+    return load_join_graph(metadata_dir)
+
+
+@st.cache_data(show_spinner="Extracting document text...", max_entries=16)
+def extract_cached_document(digest, file_type, _data):
+    # keyed by the upload's sha256; the bytes themselves are not hashed again
+    if file_type == "pdf":
+        ocr_errors = []
+        raw_text = extract_header_text_from_pdf(_data, budget_filter=is_useful_line, ocr_errors=ocr_errors)
+        return {"raw_text": raw_text, "text": clean_text(raw_text), "pages": [], "ocr_errors": ocr_errors}
+    if file_type in ["png", "jpg", "jpeg"]:
+        text = extract_text_from_image(_data)
+        return {"raw_text": text, "text": text, "pages": []}
+    if file_type in ["tif", "tiff"]:
+        pages = [page_text for _, page_text in iter_multipage_image_text(_data)]
+        return {"raw_text": "\n".join(pages), "text": "\n".join(pages), "pages": pages}
+    raise ValueError("Unsupported file format.")
+
+
+@st.cache_data(show_spinner="Extracting labels with the LLM...", max_entries=32)
+def extract_cached_headers(text, groq_model, key_fingerprint, _groq_api_key):
+    # key_fingerprint (sha256 of the key) keys the cache so results are not served under another key
+    headers = extract_headers_with_llm(text, groq_model=groq_model, groq_api_key=_groq_api_key)
+    if not headers:
+        # Raising keeps an empty result (bad key, API error) out of the cache.
+        raise ValueError("No labels extracted from document.")
+    return headers
+
+
+def clear_document_caches():
+    extract_cached_document.clear()
+    extract_cached_headers.clear()
 
 st.title("AutoMapper AI for R12 Bi Reports")
 st.info("This is an application that uses OpenAI's GROQ selected model to read a input report layout, list out the unique columns, find the R12 mapping, SQL query and finally generates the Bi publisher excel Template file")
@@ -46,22 +89,27 @@ if groq_model and groq_api_key:
     set_key(dotenv_path, "GROQ_API_KEY", groq_api_key)
     st.sidebar.success("GROQ model and API key saved to .env")
 
+response_cache = get_response_cache()
+if response_cache is not None:
+    cache_stats = response_cache.stats
+    st.sidebar.caption(
+        f"♻️ LLM cache: {cache_stats['memory_hits'] + cache_stats['disk_hits']} hit(s), "
+        f"{cache_stats['misses']} miss(es), {response_cache.hit_rate():.0%} hit rate"
+    )
+
 # Metadata loading
 st.sidebar.markdown("## R12 Metadata Auto-Loader")
 metadata_dir = Path("metadata")
-metadata_files = list(metadata_dir.glob("*.csv"))
+if st.sidebar.button("🔄 Reload metadata", help="Re-reads /metadata/ even if no CSV changed on disk."):
+    load_cached_catalog.clear()
+    load_cached_join_graph.clear()
+r12_catalog, r12_metadata_df, metadata_files, metadata_errors = load_cached_catalog(str(metadata_dir), metadata_signature(metadata_dir))
+join_graph, join_files, join_errors = load_cached_join_graph(str(metadata_dir), metadata_signature(metadata_dir / JOINS_DIR_NAME))
 
-r12_metadata_df = pd.DataFrame()
-if metadata_files:
-    for file in metadata_files:
-        try:
-            with open(file, "rb") as f:
-                file_data = f.read()
-                temp_df = clean_and_load_metadata(file_data)
-                r12_metadata_df = pd.concat([r12_metadata_df, temp_df], ignore_index=True)
-        except Exception as e:
-            st.sidebar.error(f"❌ Error loading {file.name}: {e}")
+for file_name, error in metadata_errors:
+    st.sidebar.error(f"❌ Error loading {file_name}: {error}")
 
+if metadata_files:
     if not r12_metadata_df.empty:
         st.sidebar.success(f"✅ Loaded {len(metadata_files)} metadata file(s) from /metadata/")
         st.sidebar.write("📋 Columns loaded:", r12_metadata_df.columns.tolist())
@@ -71,14 +119,30 @@ if metadata_files:
 else:
     st.sidebar.warning("⚠️ No metadata CSV files found in /metadata/")
 
+for file_name, error in join_errors:
+    st.sidebar.error(f"❌ Error loading joins/{file_name}: {error}")
+if join_files:
+    st.sidebar.success(f"🔗 {len(join_graph)} table join(s) loaded from /metadata/{JOINS_DIR_NAME}/")
+else:
+    st.sidebar.info(f"ℹ️ No join metadata in /metadata/{JOINS_DIR_NAME}/; multi-table SQL is left to the LLM")
+
+use_retrieval = st.sidebar.checkbox(
+    "Use local candidate retrieval",
+    value=True,
+    help="Embeds the metadata columns once and sends the LLM only the closest candidates per label."
+)
+
 # File upload
-uploaded_file = st.file_uploader("Upload a document (Excel, PDF, or Image)", type=["xlsx", "xls", "pdf", "png", "jpg", "jpeg"])
+uploaded_file = st.file_uploader("Upload a document (Excel, PDF, or Image)", type=["xlsx", "xls", "pdf", "png", "jpg", "jpeg", "tif", "tiff"])
 
 if uploaded_file:
     file_type = uploaded_file.name.split('.')[-1].lower()
     text = ""
     df = None
 
+    if st.button("🔄 Re-extract document", help="Drops the cached text and labels so the upload is processed again."):
+        clear_document_caches()
+
     if file_type in ["xlsx", "xls"]:
         df, selected_sheet, text = extract_text_from_excel(uploaded_file)
         if df is None:
@@ -86,20 +150,29 @@ if uploaded_file:
         else:
             st.selectbox("Select Excel Sheet", [selected_sheet])
 
-    elif file_type == "pdf":
-        raw_text = extract_text_from_pdf(uploaded_file)
-        text = clean_text(raw_text)
-        st.expander("📄 Raw Extracted PDF Text").code(raw_text)
-
-    elif file_type in ["png", "jpg", "jpeg"]:
-        text = extract_text_from_image(uploaded_file)
-        st.text_area("Extracted Text from Image", text)
+    elif file_type in ["pdf", "png", "jpg", "jpeg", "tif", "tiff"]:
+        data = uploaded_file.getvalue()
+        extracted = extract_cached_document(hashlib.sha256(data).hexdigest(), file_type, data)
+        text = extracted["text"]
+
+        if file_type == "pdf":
+            for page_number, error in extracted["ocr_errors"]:
+                st.warning(f"⚠️ Page {page_number + 1} has no text layer and could not be OCR'd, so it was skipped: {error}")
+            st.expander("📄 Raw Extracted PDF Text").code(extracted["raw_text"])
+        elif extracted["pages"]:
+            for page_index, page_text in enumerate(extracted["pages"]):
+                st.expander(f"🖨️ OCR Text - Page {page_index + 1}").code(page_text)
+        else:
+            st.text_area("Extracted Text from Image", text)
 
     else:
         st.error("Unsupported file format.")
 
     if text:
-        headers = extract_headers_with_llm(text, groq_model=groq_model, groq_api_key=groq_api_key)
+        try:
+            headers = extract_cached_headers(text, groq_model, hashlib.sha256(groq_api_key.encode()).hexdigest(), groq_api_key)
+        except ValueError:
+            headers = []
         if not headers:
             headers = [
                 "NA", "NA"
@@ -127,25 +200,40 @@ if uploaded_file:
             user_column_map[label] = cols[3].text_input("Hint R12 Column", key=f"column_{idx}", label_visibility="collapsed")
             user_comment_map[label] = cols[4].text_input("Comments", key=f"comment_{idx}", label_visibility="collapsed")
 
-        if "trigger_mapping" not in st.session_state:
-            st.session_state["trigger_mapping"] = False
+        if "mapping_state" not in st.session_state:
+            # Remembers per-label results so re-mapping only sends labels whose hints changed
+            st.session_state["mapping_state"] = MappingState()
 
+        # Mapping and SQL generation only run on the click itself; later reruns (hint edits,
+        # the EXPLAIN PLAN checkbox) redraw the stored result instead of calling the LLM again.
         if st.button("Map Labels to Oracle R12", key="map_button"):
-            st.session_state["trigger_mapping"] = True
-
-        if st.session_state["trigger_mapping"]:
             with st.spinner("Querying LLM for mappings..."):
+                # Rows appear as the streamed response completes each mapping
+                live_table = st.empty()
+                live_rows = {}
                 try:
-                    mappings, discarded, table_column_map = ask_llm_for_mappings(
+                    for event, payload in ask_llm_for_mappings_stream(
                             headers,
                             user_table_map,
                             user_column_map,
                             user_comment_map,
-                            metadata_df=r12_metadata_df,
+                            catalog=r12_catalog,
                             groq_model=groq_model,
-                            groq_api_key=groq_api_key
-                        )
-                except requests.exceptions.HTTPError as http_err:
+                            groq_api_key=groq_api_key,
+                            retriever=get_column_retriever(r12_catalog) if use_retrieval else None,
+                            state=st.session_state["mapping_state"]
+                        ):
+                        if event == "done":
+                            mappings, discarded, table_column_map = payload
+                            break
+                        live_rows[payload.get("extracted_label", "")] = {
+                            "extracted_label": payload.get("extracted_label", ""),
+                            "oracle_r12_table": payload.get("oracle_r12_table", ""),
+                            "oracle_r12_column": payload.get("oracle_r12_column", ""),
+                            "status": event
+                        }
+                        live_table.dataframe(pd.DataFrame(list(live_rows.values())), use_container_width=True)
+                except httpx.HTTPStatusError as http_err:
                     if http_err.response.status_code == 429:
                         retry_after = http_err.response.headers.get("Retry-After", "a few")
                         st.error(f"🚨 You have exceeded your token limit. Try again after {retry_after} seconds.")
@@ -155,48 +243,81 @@ if uploaded_file:
                 except Exception as e:
                     st.error(f"🚨 Unexpected error during LLM mapping: {e}")
                     st.stop()
+                live_table.empty()
 
-                st.session_state["mappings"] = mappings
-
-                st.subheader("🔗 Mapped JSON")
-                st.code(json.dumps(mappings, indent=2), language="json")
-                st.subheader("🔗 Mapped Oracle R12 Table/Column Names")
+                for idx, entry in enumerate(mappings):
+                    entry["Sr no"] = idx + 1
 
-                if mappings:
-                    for idx, entry in enumerate(mappings):
-                        entry["Sr no"] = idx + 1
-
-                    df_display = pd.DataFrame(mappings)[["Sr no", "extracted_label", "oracle_r12_table", "oracle_r12_column"]]
-                    st.dataframe(df_display, use_container_width=True)
-
-                    if discarded:
-                        st.warning(f"⚠️ {len(discarded)} mapping(s) from LLM were discarded (not found in metadata).")
-                        st.expander("See Discarded Mappings").json(discarded)
+                # SQL comes from the LLM while the XML and Excel template are built alongside it
+                sql, xml_output, excel_file = generate_outputs(mappings, groq_model=groq_model, groq_api_key=groq_api_key, table_column_map=table_column_map, join_graph=join_graph)
+                st.session_state["mappings"] = mappings
+                st.session_state["mapping_result"] = {
+                    "headers": headers,
+                    "mappings": mappings,
+                    "discarded": discarded,
+                    "sql": sql,
+                    "sql_issues": validate_sql(sql, table_column_map) if sql else [],
+                    "xml_output": xml_output,
+                    "excel_file": excel_file,
+                }
+
+        mapping_result = st.session_state.get("mapping_result")
+        # A result mapped from another document's labels is not shown
+        if mapping_result and mapping_result["headers"] == headers:
+            mappings = mapping_result["mappings"]
+            discarded = mapping_result["discarded"]
+            sql = mapping_result["sql"]
+            sql_issues = mapping_result["sql_issues"]
+            xml_output = mapping_result["xml_output"]
+            excel_file = mapping_result["excel_file"]
+
+            st.subheader("🔗 Mapped JSON")
+            st.code(json.dumps(mappings, indent=2), language="json")
+            st.subheader("🔗 Mapped Oracle R12 Table/Column Names")
+
+            if mappings:
+                df_display = pd.DataFrame(mappings)[["Sr no", "extracted_label", "oracle_r12_table", "oracle_r12_column"]]
+                st.dataframe(df_display, use_container_width=True)
+
+                if discarded:
+                    st.warning(f"⚠️ {len(discarded)} mapping(s) from LLM were discarded (not found in metadata).")
+                    st.expander("See Discarded Mappings").json(discarded)
+            else:
+                st.warning("⚠️ No mapping data available.")
+
+            st.subheader("📾 Generated SQL Query")
+            st.code(sql, language="sql")
+            if sql_issues:
+                st.warning(f"⚠️ The SQL still has {len(sql_issues)} validation issue(s) against the R12 metadata.")
+                st.expander("See SQL Validation Issues").markdown(format_issues(sql_issues))
+
+            explain_backend = get_explain_backend()
+            if explain_backend is not None and sql and st.checkbox("🐢 Preview EXPLAIN PLAN cost", key="explain_plan"):
+                explain_report = explain_sql(sql, explain_backend)
+                if explain_report.get("error"):
+                    st.error(f"🚨 EXPLAIN PLAN failed: {explain_report['error']}")
                 else:
-                    st.warning("⚠️ No mapping data available.")
-
-                sql = generate_sql(mappings, groq_model=groq_model, groq_api_key=groq_api_key, table_column_map=table_column_map)
-                st.subheader("📾 Generated SQL Query")
-                st.code(sql, language="sql")
-
-                # Generate and display XML
-                xml_output = generate_sample_xml(mappings)
-                st.subheader("📦 Sample XML")
-                st.code(xml_output, language="xml")
-
-                # Download button for XML
-                st.download_button(
-                    label="📥 Download XML",
-                    data=xml_output,
-                    file_name="sample.xml",
-                    mime="application/xml"
-                )
-
-                # Generate and download Excel Template
-                excel_file = generate_excel_template(mappings)
-                st.download_button(
-                    label="📥 Download Excel Template",
-                    data=excel_file,
-                    file_name="template.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
+                    st.caption(f"Estimated cost: {explain_report['cost']}, rows: {explain_report['cardinality']}")
+                    for warning in explain_report["warnings"]:
+                        st.warning(f"⚠️ {warning}")
+                    st.expander("See Execution Plan").code(format_plan(explain_report["plan"]))
+
+            # Display XML
+            st.subheader("📦 Sample XML")
+            st.code(xml_output, language="xml")
+
+            # Download button for XML
+            st.download_button(
+                label="📥 Download XML",
+                data=xml_output,
+                file_name="sample.xml",
+                mime="application/xml"
+            )
+
+            # Download Excel Template
+            st.download_button(
+                label="📥 Download Excel Template",
+                data=excel_file,
+                file_name="template.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            )
@@ -0,0 +1,126 @@
+import asyncio
+import os
+import time
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+
+from extractors.document_extractor import extract_document_text
+from llm_utils.groq_client import create_async_http_client
+from llm_utils.header_extraction import extract_headers_with_llm_async
+from llm_utils.label_mapping import ask_llm_for_mappings_async
+from llm_utils.sql_generator import generate_sql_async
+from llm_utils.template_generator import generate_sample_xml, generate_excel_template
+from utils.explain_plan import explain_sql
+from utils.sql_validator import validate_sql
+
+# Documents extracted at once. PDF and TIFF OCR already fan out to their own
+# process pools, so a few threads are enough to keep the CPU busy.
+PIPELINE_EXTRACT_WORKERS = int(os.getenv("PIPELINE_EXTRACT_WORKERS", "2"))
+# Documents allowed in the LLM stages (headers, mapping, SQL) at once.
+PIPELINE_LLM_CONCURRENCY = int(os.getenv("PIPELINE_LLM_CONCURRENCY", "4"))
+
+
+async def generate_outputs_async(mappings, groq_model, groq_api_key, table_column_map=None, client=None, join_graph=None):
+    """
+    Runs generate_sql on the async client while the sample XML and Excel
+    template are built in threads. Returns (sql, xml, excel_bytes_io).
+    """
+    return await asyncio.gather(
+        generate_sql_async(mappings, groq_model, groq_api_key, table_column_map, client=client, join_graph=join_graph),
+        asyncio.to_thread(generate_sample_xml, mappings),
+        asyncio.to_thread(generate_excel_template, mappings),
+    )
+
+
+def generate_outputs(mappings, groq_model, groq_api_key, table_column_map=None, join_graph=None):
+    """Blocking wrapper around generate_outputs_async for Streamlit callbacks."""
+    async def run():
+        async with create_async_http_client() as client:
+            return await generate_outputs_async(mappings, groq_model, groq_api_key, table_column_map, client, join_graph)
+    return asyncio.run(run())
+
+
+async def map_document_async(path, catalog, groq_model, groq_api_key, client, executor=None, extract_semaphore=None, llm_semaphore=None, retriever=None, join_graph=None, explain_backend=None):
+    """
+    Extraction -> headers -> mapping -> SQL/XML/Excel (-> EXPLAIN PLAN when
+    an explain_backend is given) for one document. Extraction runs in
+    `executor` so the event loop keeps serving other documents' LLM calls
+    meanwhile. Returns a dict of the artifacts.
+    """
+    loop = asyncio.get_running_loop()
+    started = time.time()
+
+    async with extract_semaphore or nullcontext():
+        text = await loop.run_in_executor(executor, extract_document_text, path)
+    if not text.strip():
+        raise ValueError("No text extracted from document.")
+
+    async with llm_semaphore or nullcontext():
+        headers = await extract_headers_with_llm_async(text, groq_model, groq_api_key, client=client)
+        if not headers:
+            raise ValueError("No labels extracted from document.")
+
+        mappings, discarded, table_column_map = await ask_llm_for_mappings_async(
+            headers, {}, {}, {},
+            catalog=catalog,
+            groq_model=groq_model,
+            groq_api_key=groq_api_key,
+            client=client,
+            retriever=retriever
+        )
+        sql, xml, excel = await generate_outputs_async(mappings, groq_model, groq_api_key, table_column_map, client, join_graph)
+
+    # The database round trip is blocking; keep it off the event loop.
+    explain = await asyncio.to_thread(explain_sql, sql, explain_backend) if explain_backend is not None and sql else None
+
+    return {
+        "headers": headers,
+        "mappings": mappings,
+        "discarded": discarded,
+        "sql": sql,
+        "sql_issues": validate_sql(sql, table_column_map) if sql else [],
+        "xml": xml,
+        "excel": excel,
+        "explain": explain,
+        "seconds": round(time.time() - started, 2),
+    }
+
+
+async def run_pipeline(paths, catalog, groq_model, groq_api_key, retriever=None, join_graph=None, explain_backend=None, extract_workers=PIPELINE_EXTRACT_WORKERS, llm_concurrency=PIPELINE_LLM_CONCURRENCY, on_result=None):
+    """
+    Maps many documents with their stages overlapped: while some documents
+    are being extracted on the executor, others wait on the network.
+
+    on_result(path, result, error) is called as each document finishes
+    (exactly one of result/error is set). Returns [(path, result, error)] in
+    input order.
+    """
+    extract_semaphore = asyncio.Semaphore(max(1, extract_workers))
+    llm_semaphore = asyncio.Semaphore(max(1, llm_concurrency))
+
+    with ThreadPoolExecutor(max_workers=max(1, extract_workers)) as executor:
+        async with create_async_http_client() as client:
+            async def run_one(path):
+                try:
+                    result = await map_document_async(
+                        path, catalog, groq_model, groq_api_key, client,
+                        executor=executor,
+                        extract_semaphore=extract_semaphore,
+                        llm_semaphore=llm_semaphore,
+                        retriever=retriever,
+                        join_graph=join_graph,
+                        explain_backend=explain_backend
+                    )
+                    outcome = (path, result, None)
+                except Exception as e:
+                    outcome = (path, None, e)
+                if on_result is not None:
+                    on_result(*outcome)
+                return outcome
+
+            return await asyncio.gather(*(run_one(path) for path in paths))
+
+
+def map_documents(paths, catalog, groq_model, groq_api_key, **kwargs):
+    """Blocking entry point for run_pipeline (CLI, scripts)."""
+    return asyncio.run(run_pipeline(paths, catalog, groq_model, groq_api_key, **kwargs))
@@ -0,0 +1,201 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+from extractors.document_extractor import SUPPORTED_EXTENSIONS
+from llm_utils.candidate_retrieval import get_column_retriever
+from pipeline import map_documents
+from utils.explain_plan import get_explain_backend
+from utils.join_graph import load_join_graph
+from utils.metadata_index import load_metadata_catalog, file_digest
+
+MANIFEST_FILE = "manifest.json"
+SUMMARY_FILE = "summary.jsonl"
+
+
+def document_output_dir(output_dir, path):
+    """Per-file output folder, keyed by the full file name so report.pdf and report.xlsx do not collide."""
+    return output_dir / path.name
+
+
+def _run_fingerprint(path, catalog, groq_model):
+    return {
+        "source": path.name,
+        "source_sha256": file_digest(path),
+        "metadata_version": catalog.version,
+        "groq_model": groq_model,
+    }
+
+
+def _is_up_to_date(output_dir, fingerprint):
+    manifest_path = output_dir / MANIFEST_FILE
+    if not manifest_path.exists():
+        return False
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return manifest.get("fingerprint") == fingerprint and manifest.get("status") == "ok"
+
+
+def _write_json(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+
+
+def write_artifacts(output_dir, result):
+    """Writes the artifacts of one pipeline result and returns its summary record."""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    _write_json(output_dir / "headers.json", result["headers"])
+    _write_json(output_dir / "mappings.json", result["mappings"])
+    _write_json(output_dir / "discarded.json", result["discarded"])
+    _write_json(output_dir / "sql_issues.json", result["sql_issues"])
+    if result.get("explain") is not None:
+        _write_json(output_dir / "explain.json", result["explain"])
+    (output_dir / "query.sql").write_text(result["sql"], encoding="utf-8")
+    (output_dir / "sample.xml").write_text(result["xml"], encoding="utf-8")
+    (output_dir / "template.xlsx").write_bytes(result["excel"].getvalue())
+
+    return {
+        "labels": len(result["headers"]),
+        "mapped": len(result["mappings"]),
+        "discarded": len(result["discarded"]),
+        "sql_issues": len(result["sql_issues"]),
+        "plan_cost": (result.get("explain") or {}).get("cost"),
+        "plan_warnings": len((result.get("explain") or {}).get("warnings", [])),
+        "seconds": result["seconds"],
+    }
+
+
+def run_batch(input_dir, output_dir, metadata_dir, groq_model, groq_api_key, workers=4, force=False, use_retrieval=False, explain_backend=None):
+    """
+    Maps every supported layout in input_dir through the async pipeline with
+    at most `workers` files in each stage (extraction, LLM). Files whose
+    artifacts were produced from the same source bytes, metadata version and
+    model are skipped unless force is set.
+    """
+    input_dir = Path(input_dir)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    files = sorted(p for p in input_dir.iterdir() if p.is_file() and p.suffix.lower() in SUPPORTED_EXTENSIONS)
+    catalog, _, metadata_files, metadata_errors = load_metadata_catalog(metadata_dir)
+    for file_name, error in metadata_errors:
+        print(f"❌ Error loading {file_name}: {error}")
+    join_graph, _, join_errors = load_join_graph(metadata_dir)
+    for file_name, error in join_errors:
+        print(f"❌ Error loading joins/{file_name}: {error}")
+    print(f"📋 {len(catalog)} metadata column(s) from {len(metadata_files)} file(s), {len(join_graph)} join(s); {len(files)} document(s) to map")
+    retriever = get_column_retriever(catalog) if use_retrieval else None
+
+    summary_lock = threading.Lock()
+    summary_path = output_dir / SUMMARY_FILE
+    counts = {"done": 0, "ok": 0, "skipped": 0, "failed": 0}
+    started = time.time()
+
+    def record(entry):
+        with summary_lock:
+            counts["done"] += 1
+            counts[entry["status"]] += 1
+            with open(summary_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+            elapsed = time.time() - started
+            rate = counts["done"] / elapsed if elapsed else 0.0
+            if entry["status"] == "skipped":
+                detail = "up to date"
+            else:
+                detail = entry.get("error") or f"{entry.get('mapped', 0)}/{entry.get('labels', 0)} mapped"
+            print(f"[{counts['done']}/{len(files)}] {entry['file']}: {entry['status']} ({detail}) - {rate:.2f} files/s")
+
+    pending = []
+    fingerprints = {}
+    for path in files:
+        fingerprint = _run_fingerprint(path, catalog, groq_model)
+        if not force and _is_up_to_date(document_output_dir(output_dir, path), fingerprint):
+            record({"file": path.name, "status": "skipped"})
+        else:
+            fingerprints[path] = fingerprint
+            pending.append(path)
+
+    def on_result(path, result, error):
+        file_output_dir = document_output_dir(output_dir, path)
+        entry = {"file": path.name, "output_dir": str(file_output_dir)}
+        try:
+            if error is not None:
+                raise error
+            entry.update(write_artifacts(file_output_dir, result))
+            entry["status"] = "ok"
+        except Exception as e:
+            entry["status"] = "failed"
+            entry["error"] = str(e)
+        if file_output_dir.exists():
+            _write_json(file_output_dir / MANIFEST_FILE, {"fingerprint": fingerprints[path], "status": entry["status"]})
+        record(entry)
+
+    # Extraction of some files overlaps the LLM calls of others.
+    map_documents(
+        pending, catalog, groq_model, groq_api_key,
+        retriever=retriever,
+        join_graph=join_graph,
+        explain_backend=explain_backend,
+        extract_workers=workers,
+        llm_concurrency=workers,
+        on_result=on_result
+    )
+
+    elapsed = time.time() - started
+    print(
+        f"✅ {counts['ok']} mapped, {counts['skipped']} up to date, {counts['failed']} failed "
+        f"in {elapsed:.1f}s; summary in {summary_path}"
+    )
+    return counts
+
+
+def main(argv=None):
+    load_dotenv(Path(".env"))
+
+    parser = argparse.ArgumentParser(prog="r12mapper", description="Oracle R12 Label Mapper")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    batch = subparsers.add_parser("batch", help="Map a directory of report layouts headlessly")
+    batch.add_argument("input_dir", help="Folder of xls/xlsx/pdf/png/jpg/tif files")
+    batch.add_argument("--metadata-dir", default="metadata", help="Folder of TABLE_NAME|COLUMN_LIST CSVs")
+    batch.add_argument("--output-dir", default="output", help="Per-file artifacts and summary.jsonl go here")
+    batch.add_argument("--workers", type=int, default=4, help="Files per pipeline stage (extraction, LLM) at once")
+    batch.add_argument("--model", default=os.getenv("GROQ_MODEL"), help="GROQ model (default: GROQ_MODEL)")
+    batch.add_argument("--api-key", default=os.getenv("GROQ_API_KEY"), help="GROQ API key (default: GROQ_API_KEY)")
+    batch.add_argument("--retrieval", action="store_true", help="Use local embedding candidate retrieval")
+    batch.add_argument("--explain", action="store_true", help="EXPLAIN PLAN each query (ORACLE_DSN or EXPLAIN_RECORDING)")
+    batch.add_argument("--force", action="store_true", help="Re-run files whose outputs are up to date")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "batch":
+        if not args.model or not args.api_key:
+            parser.error("a GROQ model and API key are required (--model/--api-key or GROQ_MODEL/GROQ_API_KEY)")
+        explain_backend = get_explain_backend() if args.explain else None
+        if args.explain and explain_backend is None:
+            parser.error("--explain needs ORACLE_DSN (with oracledb installed) or an EXPLAIN_RECORDING file")
+        counts = run_batch(
+            args.input_dir,
+            args.output_dir,
+            args.metadata_dir,
+            groq_model=args.model,
+            groq_api_key=args.api_key,
+            workers=args.workers,
+            force=args.force,
+            use_retrieval=args.retrieval,
+            explain_backend=explain_backend
+        )
+        return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,11 @@
+import pytest
+
+from llm_utils import llm_cache
+
+
+@pytest.fixture(autouse=True)
+def llm_response_cache(tmp_path, monkeypatch):
+    """Each test gets its own response cache under tmp_path instead of the project's .cache."""
+    cache = llm_cache.LLMResponseCache(path=tmp_path / "llm_responses.sqlite")
+    monkeypatch.setattr(llm_cache, "_response_cache", cache)
+    return cache
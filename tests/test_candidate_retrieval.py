@@ -0,0 +1,66 @@
+import pandas as pd
+
+from llm_utils.candidate_retrieval import apply_candidate_retrieval
+from utils.metadata_catalog import MetadataCatalog
+
+CATALOG = MetadataCatalog.from_dataframe(pd.DataFrame({
+    "table_name": ["AP_INVOICES_ALL", "AP_INVOICE_LINES_ALL", "PO_VENDORS"],
+    "column_list": ["INVOICE_NUM,CREATION_DATE", "LINE_NUMBER,CREATION_DATE", "VENDOR_NAME,CREATION_DATE"],
+}))
+
+
+class FakeRetriever:
+    catalog = CATALOG
+
+    def __init__(self, results):
+        self.results = results
+
+    def search(self, entries, top_k):
+        return [self.results[entry["extracted_label"]] for entry in entries]
+
+
+def _entry(label, hint_table=""):
+    return {"extracted_label": label, "hint_table": hint_table, "hint_column": "", "comment": ""}
+
+
+def test_shared_column_with_close_scores_goes_to_the_llm():
+    retriever = FakeRetriever({"Creation Date": [
+        ("AP_INVOICE_LINES_ALL", "CREATION_DATE", 0.93),
+        ("AP_INVOICES_ALL", "CREATION_DATE", 0.92),
+        ("PO_VENDORS", "CREATION_DATE", 0.91),
+    ]})
+    resolved, remaining = apply_candidate_retrieval([_entry("Creation Date")], retriever)
+
+    assert resolved == []
+    assert remaining[0]["candidates"][0] == "AP_INVOICE_LINES_ALL.CREATION_DATE"
+
+
+def test_shared_column_resolves_with_matching_hint_table():
+    retriever = FakeRetriever({"Creation Date": [
+        ("AP_INVOICES_ALL", "CREATION_DATE", 0.93),
+        ("AP_INVOICE_LINES_ALL", "CREATION_DATE", 0.92),
+    ]})
+    resolved, remaining = apply_candidate_retrieval([_entry("Creation Date", "ap.ap_invoices_all")], retriever)
+
+    assert [item["oracle_r12_table"] for item in resolved] == ["AP_INVOICES_ALL"]
+    assert remaining == []
+
+
+def test_unique_column_resolves_locally():
+    retriever = FakeRetriever({"Supplier Name": [
+        ("PO_VENDORS", "VENDOR_NAME", 0.9),
+        ("AP_INVOICES_ALL", "INVOICE_NUM", 0.89),
+    ]})
+    resolved, _ = apply_candidate_retrieval([_entry("Supplier Name")], retriever)
+
+    assert [item["oracle_r12_column"] for item in resolved] == ["VENDOR_NAME"]
+
+
+def test_clear_lead_resolves_shared_column():
+    retriever = FakeRetriever({"Invoice Creation Date": [
+        ("AP_INVOICES_ALL", "CREATION_DATE", 0.95),
+        ("AP_INVOICE_LINES_ALL", "CREATION_DATE", 0.86),
+    ]})
+    resolved, _ = apply_candidate_retrieval([_entry("Invoice Creation Date")], retriever)
+
+    assert [item["oracle_r12_table"] for item in resolved] == ["AP_INVOICES_ALL"]
@@ -0,0 +1,77 @@
+import json
+
+import pandas as pd
+
+from llm_utils.discard_retry import accept_retry_choices, build_retry_entries, build_retry_messages, retry_candidates
+from utils.metadata_catalog import MetadataCatalog
+
+CATALOG = MetadataCatalog.from_dataframe(pd.DataFrame({
+    "table_name": ["AP_INVOICES_ALL", "AP_INVOICES", "AP_INVOICE_LINES_ALL", "PO_VENDORS", "AP_SUPPLIERS"],
+    "column_list": [
+        "INVOICE_ID,INVOICE_NUM,INVOICE_AMOUNT,VENDOR_ID",
+        "INVOICE_ID,INVOICE_NUM",
+        "INVOICE_ID,LINE_NUMBER,AMOUNT",
+        "VENDOR_ID,VENDOR_NAME",
+        "VENDOR_ID,VENDOR_NAME,SEGMENT1",
+    ],
+}))
+
+
+def _discarded(label, table, column, hint_table="", hint_column=""):
+    return {"extracted_label": label, "oracle_r12_table": table, "oracle_r12_column": column, "hint_table": hint_table, "hint_column": hint_column, "comment": ""}
+
+
+def test_candidates_start_with_the_suggested_column_in_any_table():
+    candidates = retry_candidates(_discarded("Supplier", "AP_VENDORS", "VENDOR_NAME"), CATALOG)
+    assert candidates[:2] == ["AP_SUPPLIERS.VENDOR_NAME", "PO_VENDORS.VENDOR_NAME"]
+
+
+def test_candidates_include_similar_columns_in_the_suggested_table_family():
+    candidates = retry_candidates(_discarded("Invoice Number", "ap.ap_invoices_all", "INVOICE_NUMBER"), CATALOG)
+
+    assert "AP_INVOICES_ALL.INVOICE_NUM" in candidates
+    assert "AP_INVOICES.INVOICE_NUM" in candidates
+    assert all(candidate.split(".")[0] in CATALOG.table_column_map for candidate in candidates)
+
+
+def test_candidates_fall_back_to_label_words_and_respect_the_limit():
+    candidates = retry_candidates(_discarded("Vendor Name", "", ""), CATALOG)
+    assert set(candidates) == {"AP_SUPPLIERS.VENDOR_NAME", "PO_VENDORS.VENDOR_NAME"}
+
+    limited = retry_candidates(_discarded("Invoice", "AP_INVOICES_ALL", "INVOICE"), CATALOG, max_candidates=2)
+    assert len(limited) == 2
+
+
+def test_entries_skip_items_without_candidates():
+    items = [_discarded("Supplier", "X", "VENDOR_NAME"), _discarded("Weather", "X", "Y")]
+    entries = build_retry_entries(items, CATALOG)
+
+    assert [entry["extracted_label"] for entry in entries] == ["Supplier"]
+    assert entries[0]["rejected"] == "X.VENDOR_NAME"
+    assert json.loads(build_retry_messages(entries)[1]["content"]) == entries
+    assert "mappings" in build_retry_messages(entries, json_mode=True)[0]["content"]
+
+
+def test_only_choices_from_the_labels_own_candidates_are_accepted():
+    items = [_discarded("Supplier", "X", "VENDOR_NAME"), _discarded("Invoice No", "AP_INVOICES_ALL", "INVOICE_NUMBER")]
+    entries = build_retry_entries(items, CATALOG)
+    choices = [
+        {"extracted_label": "Supplier", "oracle_r12_table": "po_vendors", "oracle_r12_column": "vendor_name"},
+        {"extracted_label": "Supplier", "oracle_r12_table": "AP_SUPPLIERS", "oracle_r12_column": "VENDOR_NAME"},
+        # Exists in the metadata but is not in this label's candidate list.
+        {"extracted_label": "Invoice No", "oracle_r12_table": "PO_VENDORS", "oracle_r12_column": "VENDOR_ID"},
+        {"extracted_label": "Unknown", "oracle_r12_table": "PO_VENDORS", "oracle_r12_column": "VENDOR_NAME"},
+    ]
+
+    recovered, still_discarded = accept_retry_choices(choices, entries, items)
+
+    assert recovered == [{"extracted_label": "Supplier", "oracle_r12_table": "PO_VENDORS", "oracle_r12_column": "VENDOR_NAME"}]
+    assert still_discarded == [items[1]]
+
+
+def test_empty_choice_keeps_the_item_discarded():
+    items = [_discarded("Supplier", "X", "VENDOR_NAME")]
+    entries = build_retry_entries(items, CATALOG)
+    choices = [{"extracted_label": "Supplier", "oracle_r12_table": "", "oracle_r12_column": ""}]
+
+    assert accept_retry_choices(choices, entries, items) == ([], items)
@@ -0,0 +1,87 @@
+import io
+from collections import OrderedDict
+
+import openpyxl
+import pandas as pd
+import pytest
+
+from extractors import excel_extractor
+from extractors.excel_extractor import XLS_MAGIC, ExcelWorkbook, _select_engines, extract_header_text_from_excel, get_workbook, release_full_sheets, sniff_excel_format
+
+
+@pytest.fixture(autouse=True)
+def full_sheet_cache(monkeypatch):
+    monkeypatch.setattr(excel_extractor, "_full_sheet_cache", OrderedDict())
+
+
+def _xlsx(rows):
+    book = openpyxl.Workbook()
+    sheet = book.active
+    sheet.title = "Report"
+    for row in rows:
+        sheet.append(row)
+    buffer = io.BytesIO()
+    book.save(buffer)
+    return buffer.getvalue()
+
+
+def test_full_sheet_is_parsed_once_per_sheet(monkeypatch):
+    workbook = get_workbook(_xlsx([["Invoice Number", "Supplier"], [1, "Acme"]]))
+    calls = []
+    read_excel = pd.read_excel
+
+    def counting_read_excel(*args, **kwargs):
+        calls.append(kwargs.get("sheet_name"))
+        return read_excel(*args, **kwargs)
+
+    monkeypatch.setattr(pd, "read_excel", counting_read_excel)
+    first = workbook.full_sheet("Report")
+    second = workbook.full_sheet("Report")
+
+    assert calls == ["Report"]
+    assert second is first
+    assert first.iloc[1].tolist() == ["1", "Acme"]
+
+
+def test_only_the_latest_full_sheet_is_kept_across_workbooks():
+    first = get_workbook(_xlsx([["First"]]))
+    second = get_workbook(_xlsx([["Second"]]))
+
+    first.full_sheet("Report")
+    second.full_sheet("Report")
+
+    assert list(excel_extractor._full_sheet_cache) == [(second.digest, "Report")]
+    release_full_sheets()
+    assert not excel_extractor._full_sheet_cache
+
+
+def test_sniff_excel_format_by_magic_bytes():
+    assert sniff_excel_format(_xlsx([["a"]])) == "xlsx"
+    assert sniff_excel_format(XLS_MAGIC + b"rest of an OLE2 file") == "xls"
+    assert sniff_excel_format(b"TABLE_NAME|COLUMN_LIST\n") is None
+    assert sniff_excel_format(b"PK") is None
+    assert sniff_excel_format(b"") is None
+
+
+def test_non_excel_content_is_rejected_whatever_the_extension():
+    with pytest.raises(ValueError, match="Unrecognized Excel file"):
+        ExcelWorkbook(b"%PDF-1.7 renamed to .xlsx")
+
+
+@pytest.mark.parametrize("calamine, file_format, expected", [
+    (True, "xlsx", ("openpyxl", "calamine")),
+    (True, "xls", ("calamine", "calamine")),
+    (False, "xlsx", ("openpyxl", "openpyxl")),
+    (False, "xls", ("xlrd", "xlrd")),
+])
+def test_select_engines(monkeypatch, calamine, file_format, expected):
+    monkeypatch.setattr(excel_extractor, "CalamineWorkbook", object() if calamine else None)
+    assert _select_engines(file_format) == expected
+
+
+def test_header_text_comes_from_the_top_left_window():
+    rows = [["Invoice Number", "Supplier", None], ["Invoice Number", "Amount", "Page 1 of 2"]]
+    sheet_name, text = extract_header_text_from_excel(_xlsx(rows))
+
+    assert sheet_name == "Report"
+    assert text.splitlines()[:3] == ["Invoice Number", "Supplier", "Amount"]
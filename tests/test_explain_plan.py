@@ -0,0 +1,42 @@
+from utils.explain_plan import RecordedExplainBackend, analyze_plan, explain_sql, sql_fingerprint, statement_text
+
+PLAN = [
+    {"id": 0, "parent_id": None, "operation": "SELECT STATEMENT", "options": None, "object_name": None, "cost": 250000, "cardinality": 900000},
+    {"id": 1, "parent_id": 0, "operation": "HASH JOIN", "options": None, "object_name": None, "cost": 250000, "cardinality": 900000},
+    {"id": 2, "parent_id": 1, "operation": "TABLE ACCESS", "options": "BY INDEX ROWID", "object_name": "AP_INVOICES_ALL", "cost": 40, "cardinality": 10},
+    {"id": 3, "parent_id": 2, "operation": "INDEX", "options": "UNIQUE SCAN", "object_name": "AP_INVOICES_U1", "cost": 2, "cardinality": 1},
+    {"id": 4, "parent_id": 1, "operation": "TABLE ACCESS", "options": "STORAGE FULL", "object_name": "AP_INVOICE_LINES_ALL", "cost": 249000, "cardinality": 900000, "filter_predicates": "LINE_TYPE_LOOKUP_CODE='ITEM'"},
+    {"id": 5, "parent_id": 1, "operation": "TABLE ACCESS", "options": "FULL", "object_name": "PO_VENDORS", "cost": 900, "cardinality": 5000, "filter_predicates": "VENDOR_TYPE_LOOKUP_CODE='VENDOR'"},
+]
+
+
+def test_analyze_plan_flags_cost_and_full_scans():
+    report = analyze_plan(PLAN, large_tables={"AP_INVOICE_LINES_ALL"}, cost_threshold=100000)
+
+    assert report["cost"] == 250000
+    assert [scan["table"] for scan in report["full_scans"]] == ["AP_INVOICE_LINES_ALL", "PO_VENDORS"]
+    assert [scan["table"] for scan in report["large_table_full_scans"]] == ["AP_INVOICE_LINES_ALL"]
+    assert [scan["table"] for scan in report["unindexed_filters"]] == ["AP_INVOICE_LINES_ALL", "PO_VENDORS"]
+    assert len(report["warnings"]) == 3
+
+
+def test_statement_text_keeps_line_comments_and_literals():
+    sql = "SELECT a -- note\nFROM t\nWHERE b = 'x  y';  -- done"
+
+    assert statement_text(sql) == "SELECT a -- note\nFROM t\nWHERE b = 'x  y'"
+
+
+def test_fingerprint_ignores_comments_whitespace_and_semicolon():
+    assert sql_fingerprint("select a -- note\nfrom t;") == sql_fingerprint("SELECT a FROM t")
+    assert sql_fingerprint("SELECT a FROM t WHERE b = 'x  y'") != sql_fingerprint("SELECT a FROM t WHERE b = 'x y'")
+
+
+def test_explain_sql_with_recorded_plans():
+    backend = RecordedExplainBackend()
+    backend.record("SELECT a FROM t", PLAN)
+
+    report = explain_sql("select a -- note\nfrom t;", backend)
+    assert report["cost"] == 250000
+
+    missing = explain_sql("SELECT b FROM t", backend)
+    assert "error" in missing
@@ -0,0 +1,79 @@
+import pandas as pd
+
+from llm_utils.fast_matcher import FastMatcher, get_fast_matcher, normalize_tokens
+from utils.metadata_catalog import MetadataCatalog
+
+CATALOG = MetadataCatalog.from_dataframe(pd.DataFrame({
+    "table_name": ["AP_INVOICES_ALL", "AP_INVOICE_LINES_ALL", "PO_VENDORS", "FND_LOOKUP_VALUES", "FND_LOOKUP_VALUES_TL"],
+    "column_list": [
+        "INVOICE_ID,INVOICE_NUM,INVOICE_AMOUNT,CREATION_DATE",
+        "INVOICE_ID,LINE_NUMBER,AMOUNT,CREATION_DATE",
+        "VENDOR_ID,VENDOR_NAME,CREATION_DATE",
+        "LOOKUP_CODE,MEANING",
+        "LOOKUP_CODE,MEANING",
+    ],
+}))
+
+
+def _entry(label, hint_table="", hint_column="", comment=""):
+    return {"extracted_label": label, "hint_table": hint_table, "hint_column": hint_column, "comment": comment}
+
+
+def _resolved(entries):
+    resolved, remaining = FastMatcher(CATALOG).match(entries)
+    return {item["extracted_label"]: f"{item['oracle_r12_table']}.{item['oracle_r12_column']}" for item in resolved}, remaining
+
+
+def test_normalize_tokens_expands_abbreviations():
+    assert normalize_tokens("Invoice No.") == normalize_tokens("INVOICE_NUM") == ("INVOICE", "NUMBER")
+    assert normalize_tokens("Supplier Name") == ("VENDOR", "NAME")
+    assert normalize_tokens("The UOM") == normalize_tokens("Unit of Measure") == ("UNIT", "MEASURE")
+
+
+def test_unique_labels_resolve_and_the_rest_stay_in_order():
+    entries = [_entry("Invoice No"), _entry("Something Else"), _entry("Supplier Name"), _entry("Invoice Amt")]
+    resolved, remaining = _resolved(entries)
+
+    assert resolved == {
+        "Invoice No": "AP_INVOICES_ALL.INVOICE_NUM",
+        "Supplier Name": "PO_VENDORS.VENDOR_NAME",
+        "Invoice Amt": "AP_INVOICES_ALL.INVOICE_AMOUNT",
+    }
+    assert remaining == [entries[1]]
+
+
+def test_entries_with_a_comment_go_to_the_llm():
+    resolved, remaining = _resolved([_entry("Invoice No", comment="first 10 characters")])
+
+    assert resolved == {}
+    assert len(remaining) == 1
+
+
+def test_hint_column_and_hint_table_variants():
+    resolved, _ = _resolved([
+        _entry("Lookup", hint_column="meaning", hint_table="FND_LOOKUP_VALUES"),
+        _entry("Created", hint_table="po_vendors", hint_column="CREATION_DATE"),
+        _entry("Wrong Table", hint_table="GL_CODE_COMBINATIONS", hint_column="MEANING"),
+    ])
+
+    # The hint as typed wins over its _TL variant; a hint that matches no candidate is not overridden.
+    assert resolved == {"Lookup": "FND_LOOKUP_VALUES.MEANING", "Created": "PO_VENDORS.CREATION_DATE"}
+
+
+def test_shared_columns_follow_tables_chosen_for_other_labels():
+    resolved, remaining = _resolved([_entry("Creation Date"), _entry("Line Number")])
+
+    assert resolved == {"Line Number": "AP_INVOICE_LINES_ALL.LINE_NUMBER", "Creation Date": "AP_INVOICE_LINES_ALL.CREATION_DATE"}
+    assert remaining == []
+
+
+def test_shared_columns_without_context_stay_unresolved():
+    resolved, remaining = _resolved([_entry("Creation Date")])
+
+    assert resolved == {}
+    assert len(remaining) == 1
+
+
+def test_matcher_is_shared_per_catalog_version():
+    assert get_fast_matcher(CATALOG) is get_fast_matcher(CATALOG)
+    assert get_fast_matcher(None) is None
@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import httpx
+import pytest
+
+from llm_utils import groq_client
+from llm_utils.groq_client import _retry_after_seconds, _status_retry_wait, safe_groq_chat_completion
+
+OK = {"choices": [{"message": {"content": "[]"}}]}
+
+
+def _response(status, retry_after=None):
+    headers = {"Retry-After": retry_after} if retry_after is not None else {}
+    return httpx.Response(status, headers=headers, request=httpx.Request("POST", groq_client.GROQ_CHAT_URL))
+
+
+def test_retry_after_seconds_and_http_date():
+    assert _retry_after_seconds(_response(429)) is None
+    assert _retry_after_seconds(_response(429, "7")) == 7.0
+    assert _retry_after_seconds(_response(429, "-3")) == 0.0
+    assert _retry_after_seconds(_response(429, "soon")) is None
+
+    later = datetime.now(timezone.utc) + timedelta(seconds=30)
+    assert 25 < _retry_after_seconds(_response(429, format_datetime(later, usegmt=True))) <= 30
+    earlier = datetime.now(timezone.utc) - timedelta(seconds=30)
+    assert _retry_after_seconds(_response(429, format_datetime(earlier, usegmt=True))) == 0.0
+
+
+def test_status_retry_wait_honours_retry_after():
+    assert _status_retry_wait(_response(429, "2"), attempt=0, retries=3, delay=1.0, max_delay=30.0) == 2.0
+
+
+def test_status_retry_wait_backs_off_without_retry_after(monkeypatch):
+    monkeypatch.setattr(groq_client.random, "uniform", lambda low, high: high)
+    assert _status_retry_wait(_response(503), attempt=2, retries=5, delay=1.0, max_delay=30.0) == 4.0
+    assert _status_retry_wait(_response(503), attempt=4, retries=6, delay=1.0, max_delay=10.0) == 10.0
+
+
+@pytest.mark.parametrize("response, attempt", [
+    (_response(401), 0),           # not retryable
+    (_response(429, "7"), 2),      # last attempt
+    (_response(429, "120"), 0),    # Retry-After longer than max_delay
+])
+def test_status_retry_wait_raises(response, attempt):
+    with pytest.raises(httpx.HTTPStatusError):
+        _status_retry_wait(response, attempt=attempt, retries=3, delay=1.0, max_delay=30.0)
+
+
+def _client(monkeypatch, responses):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        result = responses.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    monkeypatch.setattr(groq_client, "_client", httpx.Client(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(groq_client.time, "sleep", lambda seconds: None)
+    return requests
+
+
+def test_retryable_failures_are_retried_then_cached(monkeypatch):
+    requests = _client(monkeypatch, [
+        httpx.Response(503),
+        httpx.ConnectError("down"),
+        httpx.Response(200, json=OK),
+    ])
+    messages = [{"role": "user", "content": "retry me"}]
+
+    assert safe_groq_chat_completion("m", "k", messages, retries=3) == OK
+    assert len(requests) == 3
+    assert requests[-1].headers["Authorization"] == "Bearer k"
+    # The cached response answers the same request without another call.
+    assert safe_groq_chat_completion("m", "k", messages) == OK
+    assert len(requests) == 3
+
+
+def test_errors_after_the_last_attempt(monkeypatch):
+    _client(monkeypatch, [httpx.ConnectError("down")] * 2)
+    with pytest.raises(RuntimeError):
+        safe_groq_chat_completion("m", "k", [{"role": "user", "content": "a"}], retries=2)
+
+    requests = _client(monkeypatch, [httpx.Response(401)])
+    with pytest.raises(httpx.HTTPStatusError):
+        safe_groq_chat_completion("m", "k", [{"role": "user", "content": "b"}], retries=3)
+    assert len(requests) == 1
@@ -0,0 +1,18 @@
+import numpy as np
+
+from extractors.image_extractor import normalize_resolution, OCR_MAX_DIMENSION
+
+
+def test_phone_photo_with_camera_dpi_is_capped():
+    gray = np.zeros((3024, 4032), np.uint8)
+    assert max(normalize_resolution(gray, dpi=72).shape) == OCR_MAX_DIMENSION
+
+
+def test_low_dpi_scan_is_upscaled_but_capped():
+    gray = np.zeros((1100, 850), np.uint8)
+    assert max(normalize_resolution(gray, dpi=100).shape) <= OCR_MAX_DIMENSION
+
+
+def test_small_image_without_dpi_is_upscaled():
+    gray = np.zeros((500, 400), np.uint8)
+    assert normalize_resolution(gray).shape == (1000, 800)
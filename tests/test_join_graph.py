@@ -0,0 +1,39 @@
+import pandas as pd
+
+from utils.join_graph import JoinGraph, build_select_sql, RESERVED_WORDS
+from utils.sql_validator import validate_sql
+
+
+def _graph(rows):
+    return JoinGraph.from_dataframe(pd.DataFrame(rows, columns=["LEFT_TABLE", "LEFT_COLUMNS", "RIGHT_TABLE", "RIGHT_COLUMNS"]))
+
+
+def test_join_to_ap_suppliers_does_not_alias_as():
+    graph = _graph([["AP_INVOICES_ALL", "VENDOR_ID", "AP_SUPPLIERS", "VENDOR_ID"]])
+    mappings = [
+        {"extracted_label": "Invoice Number", "oracle_r12_table": "AP_INVOICES_ALL", "oracle_r12_column": "INVOICE_NUM"},
+        {"extracted_label": "Supplier", "oracle_r12_table": "AP_SUPPLIERS", "oracle_r12_column": "VENDOR_NAME"},
+    ]
+    sql, unreachable = build_select_sql(mappings, graph)
+
+    assert unreachable == []
+    assert "JOIN AP_SUPPLIERS as2 ON as2.VENDOR_ID = aia.VENDOR_ID" in sql
+    table_column_map = {
+        "AP_INVOICES_ALL": ["INVOICE_ID", "INVOICE_NUM", "VENDOR_ID"],
+        "AP_SUPPLIERS": ["VENDOR_ID", "VENDOR_NAME"],
+    }
+    assert validate_sql(sql, table_column_map) == []
+
+
+def test_aliases_skip_reserved_words():
+    graph = _graph([["B_Y", "ID", "O_F", "ID"]])
+    mappings = [
+        {"extracted_label": "A", "oracle_r12_table": "B_Y", "oracle_r12_column": "ID"},
+        {"extracted_label": "B", "oracle_r12_table": "O_F", "oracle_r12_column": "ID"},
+    ]
+    sql, _ = build_select_sql(mappings, graph)
+
+    assert "FROM B_Y by2" in sql
+    assert "JOIN O_F of2 ON of2.ID = by2.ID" in sql
+    assert validate_sql(sql, {"B_Y": ["ID"], "O_F": ["ID"]}) == []
+    assert {"AS", "BY", "OF", "TABLE"} <= RESERVED_WORDS
@@ -0,0 +1,75 @@
+import pytest
+
+from llm_utils.json_stream import JsonArrayStreamParser
+
+
+def _feed(text, size):
+    parser = JsonArrayStreamParser()
+    objects = []
+    for start in range(0, len(text), size):
+        objects.extend(parser.feed(text[start:start + size]))
+    return parser, objects
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 1000])
+def test_objects_split_across_feeds(size):
+    text = 'Here you go:\n```json\n[{"a": 1, "b": {"c": [2, 3]}},\n {"a": 2}]\n```'
+    parser, objects = _feed(text, size)
+
+    assert objects == [{"a": 1, "b": {"c": [2, 3]}}, {"a": 2}]
+    assert parser.finished
+    assert parser.errors == []
+
+
+@pytest.mark.parametrize("size", [1, 2, 5, 1000])
+def test_braces_in_strings_and_comments_do_not_count(size):
+    text = (
+        '[{"label": "Total }{ \\"x\\" {", \'note\': \'it\\\'s }\'},\n'
+        ' {"a": 1, // closing } here\n "b": 2, # and { here\n "url": "http://x"}]'
+    )
+    parser, objects = _feed(text, size)
+
+    assert objects == [{"label": 'Total }{ "x" {', "note": "it's }"}, {"a": 1, "b": 2, "url": "http://x"}]
+    assert parser.errors == []
+
+
+def test_line_comment_split_between_feeds():
+    # The second '/' only starts a comment because the first one is kept in _current.
+    parser = JsonArrayStreamParser()
+    pieces = ['[{"a": 1, /', '/ }\n', '"b": 2}]']
+
+    objects = [obj for piece in pieces for obj in parser.feed(piece)]
+
+    assert objects == [{"a": 1, "b": 2}]
+
+
+def test_each_object_is_returned_by_the_feed_that_closes_it():
+    parser = JsonArrayStreamParser()
+
+    assert parser.feed('[{"a": 1') == []
+    assert parser.feed('}, {"a"') == [{"a": 1}]
+    assert parser.feed(': 2}') == [{"a": 2}]
+    assert not parser.finished
+    assert parser.feed(']') == []
+    assert parser.finished
+
+
+def test_text_after_the_closing_bracket_is_ignored():
+    parser, objects = _feed('[{"a": 1}] and also {"b": 2}', 4)
+
+    assert objects == [{"a": 1}]
+    assert parser.finished
+
+
+def test_unparsable_objects_are_collected_in_errors():
+    parser, objects = _feed('[{"a": 1}, {"b": oops}, {"c": 3}]', 3)
+
+    assert objects == [{"a": 1}, {"c": 3}]
+    assert [raw for raw, _ in parser.errors] == ['{"b": oops}']
+
+
+def test_nothing_before_the_opening_bracket_is_read():
+    parser, objects = _feed('{"stray": 1} no array yet', 5)
+
+    assert objects == []
+    assert not parser.started
@@ -0,0 +1,157 @@
+import asyncio
+import json
+
+import httpx
+import pandas as pd
+import pytest
+
+import llm_utils.groq_client as groq_client
+from llm_utils.label_mapping import MappingState, ask_llm_for_mappings, ask_llm_for_mappings_async, ask_llm_for_mappings_stream, attach_requested_labels, map_entries_in_chunks, map_entries_streaming
+from llm_utils.sql_generator import generate_sql, generate_sql_async
+from utils.metadata_catalog import MetadataCatalog
+
+CATALOG = MetadataCatalog.from_dataframe(pd.DataFrame({
+    "table_name": ["AP_INVOICES_ALL", "PO_VENDORS", "FOO_T"],
+    "column_list": ["INVOICE_ID,INVOICE_NUM,VENDOR_ID", "VENDOR_ID,VENDOR_NAME", "BAR"],
+}))
+ANSWERS = {"Inv No": ("AP_INVOICES_ALL", "INVOICE_NUM"), "Supplier": ("PO_VENDORS", "SUPPLIER_NAME"), "Bogus": ("X", "Y")}
+HEADERS = list(ANSWERS)
+
+
+def _answer(messages):
+    system, user = messages[0]["content"], messages[-1]["content"]
+    if "closed list" in system:
+        content = json.dumps([{"extracted_label": "Supplier", "oracle_r12_table": "PO_VENDORS", "oracle_r12_column": "VENDOR_NAME"}])
+    elif "SQL" in system:
+        content = "SELECT i.INVOICE_NUM FROM AP_INVOICES_ALL i;" if "fails validation" in user else "SELECT i.INVOICE_NUM, i.NOPE FROM AP_INVOICES_ALL i;"
+    else:
+        content = json.dumps([
+            {"extracted_label": e["extracted_label"], "oracle_r12_table": ANSWERS[e["extracted_label"]][0], "oracle_r12_column": ANSWERS[e["extracted_label"]][1]}
+            for e in json.loads(user)
+        ])
+    return {"choices": [{"message": {"content": content}}]}
+
+
+def _fake_llm(monkeypatch):
+    calls = []
+
+    def completion(model, api_key, messages, **kwargs):
+        calls.append(messages)
+        return _answer(messages)
+
+    async def async_completion(model, api_key, messages, client=None, **kwargs):
+        return completion(model, api_key, messages)
+
+    def stream(model, api_key, messages, **kwargs):
+        calls.append(messages)
+        yield _answer(messages)["choices"][0]["message"]["content"]
+
+    monkeypatch.setattr(groq_client, "safe_groq_chat_completion", completion)
+    monkeypatch.setattr(groq_client, "async_safe_groq_chat_completion", async_completion)
+    monkeypatch.setattr("llm_utils.label_mapping.stream_groq_chat_completion", stream)
+    return calls
+
+
+def test_sync_async_and_stream_mapping_agree(monkeypatch):
+    _fake_llm(monkeypatch)
+    kwargs = dict(catalog=CATALOG, groq_model="m", groq_api_key="k", use_fast_path=False)
+
+    sync_result = ask_llm_for_mappings(HEADERS, {}, {}, {}, **kwargs)
+    async_result = asyncio.run(ask_llm_for_mappings_async(HEADERS, {}, {}, {}, **kwargs))
+    events = list(ask_llm_for_mappings_stream(HEADERS, {}, {}, {}, **kwargs))
+
+    validated, discarded, _ = sync_result
+    assert [(m["extracted_label"], m["oracle_r12_column"]) for m in validated] == [("Inv No", "INVOICE_NUM"), ("Supplier", "VENDOR_NAME")]
+    assert [m["extracted_label"] for m in discarded] == ["Bogus"]
+    assert async_result == sync_result
+    assert events[-1] == ("done", sync_result)
+    assert ("recovered", validated[1]) in events
+
+
+def test_sql_fix_round_is_shared_by_sync_and_async(monkeypatch):
+    calls = _fake_llm(monkeypatch)
+    mappings = [
+        {"extracted_label": "Inv No", "oracle_r12_table": "AP_INVOICES_ALL", "oracle_r12_column": "INVOICE_NUM"},
+        {"extracted_label": "Bar", "oracle_r12_table": "FOO_T", "oracle_r12_column": "BAR"},
+    ]
+
+    sql = generate_sql(mappings, "m", "k", CATALOG.table_column_map)
+    async_sql = asyncio.run(generate_sql_async(mappings, "m", "k", CATALOG.table_column_map))
+
+    assert sql == async_sql == "SELECT i.INVOICE_NUM FROM AP_INVOICES_ALL i;"
+    assert len(calls) == 4
+
+
+def _item(label, table="AP_INVOICES_ALL", column="INVOICE_NUM"):
+    return {"extracted_label": label, "oracle_r12_table": table, "oracle_r12_column": column}
+
+
+def test_altered_labels_are_attached_to_the_requested_header():
+    entries = [{"extracted_label": "Invoice No:"}, {"extracted_label": "Supplier"}, {"extracted_label": "Amt"}]
+    items = [_item("Supplier"), _item("Invoice Number"), _item("Amount due")]
+
+    labels = [item["extracted_label"] for item in attach_requested_labels(items, entries)]
+
+    # Exact, normalized (No -> NUMBER) and, with one item per entry, positional.
+    assert labels == ["Supplier", "Invoice No:", "Amt"]
+
+
+def test_unmatched_labels_are_left_alone_without_one_item_per_entry():
+    entries = [{"extracted_label": "Invoice No:"}, {"extracted_label": "Supplier"}]
+
+    assert attach_requested_labels([_item("Something else")], entries) == [_item("Something else")]
+
+
+def test_state_keeps_and_stores_mappings_with_altered_labels(monkeypatch):
+    calls = []
+
+    def completion(model, api_key, messages, **kwargs):
+        calls.append(messages)
+        return {"choices": [{"message": {"content": json.dumps([_item("Invoice No")])}}]}
+
+    monkeypatch.setattr(groq_client, "safe_groq_chat_completion", completion)
+    state = MappingState()
+    kwargs = dict(catalog=CATALOG, groq_model="m", groq_api_key="k", use_fast_path=False, state=state)
+
+    validated, discarded, _ = ask_llm_for_mappings(["Invoice No:"], {}, {}, {}, **kwargs)
+    assert validated == [_item("Invoice No:")]
+    assert discarded == []
+
+    assert ask_llm_for_mappings(["Invoice No:"], {}, {}, {}, **kwargs)[0] == validated
+    assert len(calls) == 1
+
+
+def test_merge_returns_unmatched_items_without_storing_them():
+    state = MappingState()
+    keys = state.keys_for(["Invoice No:"], {}, {}, {}, "v1")
+
+    validated, discarded = state.merge(["Invoice No:"], keys, [_item("Invoice No")], [])
+
+    assert validated == [_item("Invoice No")]
+    assert discarded == []
+    assert len(state) == 0
+
+
+def _rate_limited():
+    request = httpx.Request("POST", groq_client.GROQ_CHAT_URL)
+    return httpx.HTTPStatusError("429", request=request, response=httpx.Response(429, request=request, headers={"Retry-After": "7"}))
+
+
+def test_http_error_on_one_chunk_is_raised_not_discarded(monkeypatch):
+    def completion(model, api_key, messages, **kwargs):
+        labels = [entry["extracted_label"] for entry in json.loads(messages[-1]["content"])]
+        if "Supplier" in labels:
+            raise _rate_limited()
+        return _answer(messages)
+
+    def stream(model, api_key, messages, **kwargs):
+        yield completion(model, api_key, messages)["choices"][0]["message"]["content"]
+
+    monkeypatch.setattr(groq_client, "safe_groq_chat_completion", completion)
+    monkeypatch.setattr("llm_utils.label_mapping.stream_groq_chat_completion", stream)
+    entries = [{"extracted_label": label, "hint_table": "", "hint_column": "", "comment": ""} for label in HEADERS]
+
+    with pytest.raises(httpx.HTTPStatusError):
+        map_entries_in_chunks(entries, "m", "k", chunk_token_budget=30)
+    with pytest.raises(httpx.HTTPStatusError):
+        list(map_entries_streaming(entries, "m", "k", chunk_token_budget=30))
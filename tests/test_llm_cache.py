@@ -0,0 +1,97 @@
+from llm_utils import llm_cache
+from llm_utils.llm_cache import LLMResponseCache, get_response_cache, make_cache_key
+
+RESPONSE = {"choices": [{"message": {"content": "[]"}}]}
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def _clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_cache.time, "time", clock)
+    return clock
+
+
+def test_cache_key_is_stable_and_content_addressed():
+    messages = [{"role": "user", "content": "é"}]
+    assert make_cache_key("m", messages, 0.2) == make_cache_key("m", [dict(messages[0])], 0.2)
+    assert make_cache_key("m", messages, 0.2) != make_cache_key("m", messages, 0.3)
+    assert make_cache_key("m", messages, 0.2) != make_cache_key("other", messages, 0.2)
+
+
+def test_entries_expire_after_ttl(tmp_path, monkeypatch):
+    clock = _clock(monkeypatch)
+    cache = LLMResponseCache(path=tmp_path / "c.sqlite", ttl=60)
+    cache.set("k", RESPONSE)
+
+    clock.now += 60
+    assert cache.get("k") == RESPONSE
+    clock.now += 1
+    assert cache.get("k") is None
+
+    # Expired rows are deleted, not just skipped.
+    reopened = LLMResponseCache(path=tmp_path / "c.sqlite", ttl=None)
+    assert reopened.get("k") is None
+
+
+def test_memory_tier_is_lru(monkeypatch):
+    _clock(monkeypatch)
+    cache = LLMResponseCache(path=None, max_memory_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats["evictions"] == 1
+
+
+def test_disk_tier_evicts_least_recently_accessed(tmp_path, monkeypatch):
+    clock = _clock(monkeypatch)
+    path = tmp_path / "c.sqlite"
+    cache = LLMResponseCache(path=path, max_memory_entries=1, max_disk_entries=2)
+    cache.set("a", 1)
+    clock.now += 1
+    cache.set("b", 2)
+    clock.now += 1
+    # Read "a" back from disk ("b" holds the only memory slot), which refreshes its last access.
+    assert cache.get("a") == 1
+    assert cache.stats["disk_hits"] == 1
+    clock.now += 1
+    cache.set("c", 3)
+
+    on_disk = LLMResponseCache(path=path, max_memory_entries=0)
+    assert on_disk.get("b") is None
+    assert on_disk.get("a") == 1
+    assert on_disk.get("c") == 3
+
+
+def test_disk_entries_survive_a_restart(tmp_path):
+    LLMResponseCache(path=tmp_path / "c.sqlite").set("k", RESPONSE)
+    assert LLMResponseCache(path=tmp_path / "c.sqlite").get("k") == RESPONSE
+
+
+def test_invalidate_clear_and_hit_rate(tmp_path):
+    cache = LLMResponseCache(path=tmp_path / "c.sqlite")
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.invalidate("a")
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    assert cache.hit_rate() == 0.5
+
+    cache.clear()
+    assert LLMResponseCache(path=tmp_path / "c.sqlite").get("b") is None
+
+
+def test_shared_cache_can_be_disabled(monkeypatch):
+    monkeypatch.setattr(llm_cache, "LLM_CACHE_ENABLED", False)
+    assert get_response_cache() is None
@@ -0,0 +1,62 @@
+import pytest
+
+from llm_utils.llm_json import MAX_START_ATTEMPTS, LLMOutputError, json_mode_instruction, parse_llm_json, parse_llm_list
+
+
+def test_plain_json_and_llm_syntax():
+    assert parse_llm_json('[{"a": 1}]') == [{"a": 1}]
+    text = "Sure! [{'a': True, b: None, \"c\": (1, 2.5e1,), /* note */ 'd': -3,}, # done\n]"
+    assert parse_llm_json(text) == [{"a": True, "b": None, "c": [1, 25.0], "d": -3}]
+
+
+def test_value_inside_fence_wins_over_brackets_before_it():
+    text = 'Mapping [draft] below:\n```json\n[{"a": 1}]\n```'
+    assert parse_llm_json(text) == [{"a": 1}]
+
+
+def test_empty_fence_falls_back_to_the_whole_text():
+    assert parse_llm_json('Result: [1, 2]\n```\nno value here\n```') == [1, 2]
+
+
+def test_bracketed_prose_moves_on_to_the_next_start():
+    prose = "see [note] " * (MAX_START_ATTEMPTS - 1)
+    assert parse_llm_json(prose + "[1]") == [1]
+
+
+def test_start_attempts_are_bounded():
+    prose = "see [note] " * MAX_START_ATTEMPTS
+    with pytest.raises(LLMOutputError):
+        parse_llm_json(prose + "[1]")
+
+
+def test_broken_array_does_not_degrade_to_an_inner_object():
+    with pytest.raises(LLMOutputError) as error:
+        parse_llm_json('Here: [{"a": 1}, {"b": }]')
+    assert error.value.position is not None
+
+
+def test_unicode_escapes_and_surrogate_pairs():
+    # Single quotes bypass the json.loads fast path.
+    assert parse_llm_json("x ['\\u00e9t\\u00e9', '\\ud83d\\ude00']") == ["été", "\U0001F600"]
+
+
+def test_unterminated_string_is_reported():
+    with pytest.raises(LLMOutputError, match="Unterminated string"):
+        parse_llm_json('x ["abc')
+
+
+def test_no_value_at_all():
+    with pytest.raises(LLMOutputError, match="No JSON array or object found"):
+        parse_llm_json("nothing here")
+    with pytest.raises(LLMOutputError):
+        parse_llm_json(None)
+
+
+def test_parse_llm_list_unwraps_json_mode_objects():
+    assert parse_llm_list('{"mappings": [{"a": 1}]}') == [{"a": 1}]
+    assert parse_llm_list('{"a": 1}') == [{"a": 1}]
+    assert parse_llm_list('[1, 2]') == [1, 2]
+
+
+def test_json_mode_instruction_names_the_key():
+    assert '{"headers": [...]}' in json_mode_instruction("headers")
@@ -0,0 +1,60 @@
+import pandas as pd
+
+from utils.metadata_catalog import MetadataCatalog, table_root
+
+CATALOG = MetadataCatalog.from_dataframe(pd.DataFrame({
+    "TABLE_NAME ": ["AP_INVOICES_ALL", "fnd_lookup_values_tl", "FND_LOOKUP_VALUES", "PO_HEADERS_ALL", "PO_LINES_ALL", "GL_PERIODS"],
+    "Column_List": ["invoice_id, invoice_num,ORG_ID", "MEANING", "LOOKUP_CODE,MEANING", "PO_HEADER_ID,ORG_ID", "PO_LINE_ID,ORG_ID", "PERIOD_NAME"],
+}))
+
+
+def test_from_dataframe_normalizes_names():
+    assert CATALOG.has("AP_INVOICES_ALL", "INVOICE_NUM")
+    assert CATALOG.columns_for("FND_LOOKUP_VALUES_TL") == {"MEANING"}
+    assert CATALOG.tables_for("ORG_ID") == {"AP_INVOICES_ALL", "PO_HEADERS_ALL", "PO_LINES_ALL"}
+
+
+def test_from_pipe_separated_csv_text():
+    catalog = MetadataCatalog.from_dataframe("table_name|column_list\nAP_INVOICES_ALL|INVOICE_ID,INVOICE_NUM\n")
+    assert catalog.table_column_map == {"AP_INVOICES_ALL": {"INVOICE_ID", "INVOICE_NUM"}}
+
+
+def test_version_follows_the_content():
+    same = MetadataCatalog.from_pairs(CATALOG.pairs.copy())
+    changed = MetadataCatalog.from_pairs(CATALOG.pairs.iloc[1:])
+    assert same.version == CATALOG.version != changed.version
+    assert MetadataCatalog.empty().version == "empty"
+
+
+def test_table_root_and_roots_index():
+    assert table_root("ap.ap_invoices_all") == "AP_INVOICES"
+    assert table_root("FND_LOOKUP_VALUES_TL") == "FND_LOOKUP_VALUES"
+    assert table_root("_B") == "_B"
+    assert CATALOG.table_roots["FND_LOOKUP_VALUES"] == {"FND_LOOKUP_VALUES", "FND_LOOKUP_VALUES_TL"}
+    assert CATALOG.table_roots["AP_INVOICES"] == {"AP_INVOICES_ALL"}
+
+
+def test_resolve_exact_with_schema_prefix_and_case():
+    assert CATALOG.resolve("ap.ap_invoices_all", " invoice_num ") == ("AP_INVOICES_ALL", "INVOICE_NUM", "exact")
+
+
+def test_resolve_variant_prefers_the_base_table():
+    assert CATALOG.resolve("AP_INVOICES", "INVOICE_NUM") == ("AP_INVOICES_ALL", "INVOICE_NUM", "variant")
+    assert CATALOG.resolve("FND_LOOKUP_VALUES_VL", "MEANING") == ("FND_LOOKUP_VALUES", "MEANING", "variant")
+
+
+def test_resolve_column_in_a_single_table():
+    assert CATALOG.resolve("GL_PERIOD_STATUSES", "PERIOD_NAME") == ("GL_PERIODS", "PERIOD_NAME", "column")
+
+
+def test_resolve_shared_column_by_closest_table_name():
+    assert CATALOG.resolve("PO_LINES", "ORG_ID") == ("PO_LINES_ALL", "ORG_ID", "variant")
+    assert CATALOG.resolve("PO_LINES_INTERFACE", "ORG_ID") == ("PO_LINES_ALL", "ORG_ID", "column")
+
+
+def test_resolve_gives_up_when_nothing_plausible():
+    assert CATALOG.resolve("AP_INVOICES_ALL", "NOT_A_COLUMN") is None
+    assert CATALOG.resolve("AP_INVOICES_ALL", "") is None
+    # PO_HEADERS_ALL and PO_LINES_ALL both share one token with PO_DISTRIBUTIONS: a tie.
+    assert CATALOG.resolve("PO_DISTRIBUTIONS", "ORG_ID") is None
+    assert CATALOG.resolve("", "ORG_ID") is None
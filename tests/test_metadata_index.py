@@ -0,0 +1,109 @@
+import json
+import os
+
+import pytest
+
+from utils import metadata_index
+from utils.metadata_index import MANIFEST_FILE, load_metadata_catalog, load_metadata_index, metadata_signature
+
+
+@pytest.fixture
+def metadata_dir(tmp_path):
+    directory = tmp_path / "metadata"
+    directory.mkdir()
+    (directory / "ap.csv").write_text("TABLE_NAME|COLUMN_LIST\nAP_INVOICES_ALL|INVOICE_ID, INVOICE_NUM\n", encoding="utf-8")
+    (directory / "po.csv").write_text("TABLE_NAME|COLUMN_LIST\nPO_VENDORS|VENDOR_ID,VENDOR_NAME\n", encoding="utf-8")
+    return directory
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    calls = []
+    build = metadata_index.build_metadata_index
+
+    def counting_build(*args, **kwargs):
+        calls.append(args)
+        return build(*args, **kwargs)
+
+    monkeypatch.setattr(metadata_index, "build_metadata_index", counting_build)
+    return calls
+
+
+def _touch(path, seconds=10):
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + seconds * 1_000_000_000))
+
+
+def _manifest(metadata_dir):
+    return json.loads((metadata_dir / ".index" / MANIFEST_FILE).read_text(encoding="utf-8"))
+
+
+def test_index_is_built_once_and_reused(metadata_dir, builds):
+    first, files, errors = load_metadata_index(metadata_dir)
+    second, _, _ = load_metadata_index(metadata_dir)
+
+    assert len(builds) == 1
+    assert [f.name for f in files] == ["ap.csv", "po.csv"]
+    assert errors == []
+    assert second.equals(first)
+    assert sorted(second["table_name"]) == ["AP_INVOICES_ALL", "PO_VENDORS"]
+
+
+def test_touched_but_identical_file_only_refreshes_the_manifest(metadata_dir, builds):
+    load_metadata_index(metadata_dir)
+    _touch(metadata_dir / "ap.csv")
+    load_metadata_index(metadata_dir)
+
+    assert len(builds) == 1
+    entry = next(s for s in _manifest(metadata_dir)["sources"] if s["name"] == "ap.csv")
+    assert entry["mtime_ns"] == (metadata_dir / "ap.csv").stat().st_mtime_ns
+
+
+def test_touched_file_keeps_its_recorded_error(metadata_dir, builds):
+    (metadata_dir / "bad.csv").write_bytes(b"\xff\xfe not utf-8")
+    _, _, errors = load_metadata_index(metadata_dir)
+    assert [name for name, _ in errors] == ["bad.csv"]
+
+    _touch(metadata_dir / "bad.csv")
+    _, _, errors_after_touch = load_metadata_index(metadata_dir)
+
+    assert len(builds) == 1
+    assert errors_after_touch == errors
+    assert next(s for s in _manifest(metadata_dir)["sources"] if s["name"] == "bad.csv")["error"]
+
+
+@pytest.mark.parametrize("change", ["edit", "add", "remove", "format", "drop_index"])
+def test_changes_trigger_a_rebuild(metadata_dir, builds, change):
+    load_metadata_index(metadata_dir)
+    if change == "edit":
+        (metadata_dir / "po.csv").write_text("TABLE_NAME|COLUMN_LIST\nPO_VENDORS|VENDOR_ID\n", encoding="utf-8")
+    elif change == "add":
+        (metadata_dir / "gl.csv").write_text("TABLE_NAME|COLUMN_LIST\nGL_PERIODS|PERIOD_NAME\n", encoding="utf-8")
+    elif change == "remove":
+        (metadata_dir / "po.csv").unlink()
+    elif change == "format":
+        manifest = _manifest(metadata_dir)
+        manifest["format_version"] = 0
+        (metadata_dir / ".index" / MANIFEST_FILE).write_text(json.dumps(manifest), encoding="utf-8")
+    else:
+        (metadata_dir / ".index" / metadata_index.INDEX_FILE).unlink()
+
+    load_metadata_index(metadata_dir)
+
+    assert len(builds) == 2
+
+
+def test_catalog_is_loaded_from_the_stored_pairs(metadata_dir):
+    catalog, metadata_df, files, errors = load_metadata_catalog(metadata_dir)
+
+    assert catalog.table_column_map == {"AP_INVOICES_ALL": {"INVOICE_ID", "INVOICE_NUM"}, "PO_VENDORS": {"VENDOR_ID", "VENDOR_NAME"}}
+    assert len(files) == 2
+
+
+def test_empty_directory_and_signature(tmp_path, metadata_dir):
+    metadata_df, files, errors = load_metadata_index(tmp_path / "missing")
+    assert metadata_df.empty and files == [] and errors == []
+
+    signature = metadata_signature(metadata_dir)
+    _touch(metadata_dir / "ap.csv")
+    assert metadata_signature(metadata_dir) != signature
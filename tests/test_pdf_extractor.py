@@ -0,0 +1,26 @@
+import io
+
+from PIL import Image
+from pdf2image.exceptions import PDFInfoNotInstalledError
+
+from extractors import pdf_extractor
+
+
+def _image_only_pdf():
+    buffer = io.BytesIO()
+    Image.new("RGB", (200, 100), "white").save(buffer, format="PDF")
+    return buffer.getvalue()
+
+
+def test_failed_ocr_skips_the_page(monkeypatch):
+    def missing_poppler(*args, **kwargs):
+        raise PDFInfoNotInstalledError("Unable to get page count. Is poppler installed and in PATH?")
+
+    monkeypatch.setattr(pdf_extractor, "convert_from_bytes", missing_poppler)
+    errors = []
+
+    text = pdf_extractor.extract_header_text_from_pdf(_image_only_pdf(), ocr_errors=errors)
+
+    assert text == ""
+    assert [number for number, _ in errors] == [0]
+    assert "poppler" in errors[0][1]
@@ -0,0 +1,38 @@
+import io
+
+import r12mapper
+
+
+def _fake_map_documents(paths, *args, on_result=None, **kwargs):
+    for path in paths:
+        on_result(path, {
+            "headers": [path.name],
+            "mappings": [],
+            "discarded": [],
+            "sql_issues": [],
+            "sql": "",
+            "xml": "<root/>",
+            "excel": io.BytesIO(b"xlsx"),
+            "explain": None,
+            "seconds": 0.0,
+        }, None)
+
+
+def test_same_stem_files_get_separate_outputs_and_resume(tmp_path, monkeypatch):
+    input_dir = tmp_path / "in"
+    input_dir.mkdir()
+    (input_dir / "report.pdf").write_bytes(b"pdf")
+    (input_dir / "report.xlsx").write_bytes(b"xlsx")
+    metadata_dir = tmp_path / "metadata"
+    metadata_dir.mkdir()
+    (metadata_dir / "a.csv").write_text("TABLE_NAME|COLUMN_LIST\nAP_INVOICES_ALL|INVOICE_ID,INVOICE_NUM\n", encoding="utf-8")
+    output_dir = tmp_path / "out"
+    monkeypatch.setattr(r12mapper, "map_documents", _fake_map_documents)
+
+    counts = r12mapper.run_batch(input_dir, output_dir, metadata_dir, "model", "key")
+    assert counts["ok"] == 2
+    assert (output_dir / "report.pdf" / "headers.json").read_text(encoding="utf-8") == '[\n  "report.pdf"\n]'
+    assert (output_dir / "report.xlsx" / "headers.json").read_text(encoding="utf-8") == '[\n  "report.xlsx"\n]'
+
+    counts = r12mapper.run_batch(input_dir, output_dir, metadata_dir, "model", "key")
+    assert counts["skipped"] == 2
@@ -0,0 +1,86 @@
+import pytest
+
+from utils.sql_validator import format_issues, tokenize, validate_sql
+
+TABLE_COLUMN_MAP = {
+    "AP_INVOICES_ALL": {"INVOICE_ID", "INVOICE_NUM", "VENDOR_ID", "ORG_ID", "INVOICE_DATE", "INVOICE_AMOUNT"},
+    "AP_INVOICE_LINES_ALL": {"INVOICE_ID", "LINE_NUMBER", "AMOUNT", "ORG_ID"},
+    "PO_VENDORS": {"VENDOR_ID", "VENDOR_NAME"},
+}
+
+
+def _kinds(sql):
+    return [issue["kind"] for issue in validate_sql(sql, TABLE_COLUMN_MAP)]
+
+
+def test_ambiguous_column():
+    sql = "SELECT ORG_ID FROM AP_INVOICES_ALL i JOIN AP_INVOICE_LINES_ALL l ON l.INVOICE_ID = i.INVOICE_ID"
+    assert _kinds(sql) == ["ambiguous_column"]
+
+
+def test_unknown_qualified_column():
+    issues = validate_sql("SELECT i.INVOICE_NO FROM AP_INVOICES_ALL i", TABLE_COLUMN_MAP)
+    assert [issue["kind"] for issue in issues] == ["unknown_column"]
+    assert "INVOICE_NO" in issues[0]["message"]
+
+
+def test_unknown_unqualified_column():
+    assert _kinds("SELECT SUPPLIER_NAME FROM PO_VENDORS") == ["unknown_column"]
+
+
+def test_unknown_table():
+    assert "unknown_table" in _kinds("SELECT x.A FROM NOT_A_TABLE x")
+
+
+def test_unknown_alias():
+    assert _kinds("SELECT v.VENDOR_NAME FROM PO_VENDORS pv") == ["unknown_alias"]
+
+
+def test_duplicate_alias():
+    assert "duplicate_alias" in _kinds("SELECT a.VENDOR_ID FROM PO_VENDORS a, AP_INVOICES_ALL a")
+
+
+def test_cartesian_product():
+    assert _kinds("SELECT i.INVOICE_NUM, v.VENDOR_NAME FROM AP_INVOICES_ALL i, PO_VENDORS v") == ["cartesian_product"]
+
+
+def test_parse_errors():
+    assert _kinds("") == ["parse_error"]
+    assert _kinds("DELETE FROM PO_VENDORS") == ["parse_error"]
+
+
+@pytest.mark.parametrize("sql", [
+    # Old-style (+) outer join
+    "SELECT i.INVOICE_NUM, v.VENDOR_NAME FROM AP_INVOICES_ALL i, PO_VENDORS v WHERE v.VENDOR_ID (+) = i.VENDOR_ID",
+    # ANSI join with a trailing semicolon
+    "SELECT i.INVOICE_NUM, v.VENDOR_NAME FROM AP_INVOICES_ALL i LEFT OUTER JOIN PO_VENDORS v ON v.VENDOR_ID = i.VENDOR_ID;",
+    # Subquery in FROM, with its own columns and alias
+    "SELECT s.INVOICE_NUM FROM (SELECT INVOICE_NUM, VENDOR_ID FROM AP_INVOICES_ALL) s",
+    # Correlated EXISTS and IN subqueries
+    "SELECT i.INVOICE_NUM FROM AP_INVOICES_ALL i WHERE EXISTS (SELECT 1 FROM AP_INVOICE_LINES_ALL l WHERE l.INVOICE_ID = i.INVOICE_ID)",
+    "SELECT INVOICE_NUM FROM AP_INVOICES_ALL WHERE VENDOR_ID IN (SELECT VENDOR_ID FROM PO_VENDORS)",
+    # Quoted column aliases, referenced again in ORDER BY
+    'SELECT i.INVOICE_NUM AS "Invoice No", i.INVOICE_AMOUNT "Amount" FROM AP_INVOICES_ALL i ORDER BY "Invoice No"',
+    # EXTRACT / CAST keywords inside function calls
+    "SELECT EXTRACT(YEAR FROM i.INVOICE_DATE), CAST(i.INVOICE_AMOUNT AS NUMBER(10, 2)) FROM AP_INVOICES_ALL i",
+    # Bind variables
+    "SELECT i.INVOICE_NUM FROM AP_INVOICES_ALL i WHERE i.ORG_ID = :org_id AND i.VENDOR_ID = :1",
+    # Comments and string literals that look like identifiers
+    "SELECT i.INVOICE_NUM -- NOT_A_COLUMN\nFROM AP_INVOICES_ALL i /* x.BOGUS */ WHERE i.INVOICE_NUM <> 'y.NOPE'",
+    # Single-table query and DUAL
+    "SELECT SYSDATE FROM DUAL",
+])
+def test_valid_oracle_constructs_are_not_flagged(sql):
+    assert validate_sql(sql, TABLE_COLUMN_MAP) == []
+
+
+def test_identifier_checks_are_skipped_without_metadata():
+    assert validate_sql("SELECT x.ANYTHING FROM WHATEVER x", {}) == []
+
+
+def test_tokenize_drops_comments_and_keeps_quoted_case():
+    assert tokenize('select "Mixed" -- note\nfrom t') == [("word", "SELECT"), ("quoted", "Mixed"), ("word", "FROM"), ("word", "T")]
+
+
+def test_format_issues():
+    assert format_issues([{"kind": "unknown_column", "message": "A"}, {"kind": "x", "message": "B"}]) == "- A\n- B"
@@ -0,0 +1,262 @@
+import hashlib
+import json
+import os
+import threading
+import uuid
+from pathlib import Path
+
+try:
+    import oracledb
+except ImportError:  # EXPLAIN PLAN is optional; nothing else needs a database
+    oracledb = None
+
+from utils.sql_validator import TOKEN_PATTERN, tokenize
+
+ORACLE_DSN = os.getenv("ORACLE_DSN", "")
+ORACLE_USER = os.getenv("ORACLE_USER", "")
+ORACLE_PASSWORD = os.getenv("ORACLE_PASSWORD", "")
+# JSON file of recorded plans; used instead of a live database when set.
+EXPLAIN_RECORDING = os.getenv("EXPLAIN_RECORDING", "")
+EXPLAIN_COST_THRESHOLD = int(os.getenv("EXPLAIN_COST_THRESHOLD", "100000"))
+
+# High-volume R12 tables a report must never full-scan.
+DEFAULT_LARGE_TABLES = (
+    "GL_JE_LINES", "GL_JE_HEADERS", "GL_BALANCES", "GL_IMPORT_REFERENCES",
+    "AP_INVOICE_LINES_ALL", "AP_INVOICE_DISTRIBUTIONS_ALL", "AP_PAYMENT_SCHEDULES_ALL", "AP_INVOICES_ALL",
+    "AR_RECEIVABLE_APPLICATIONS_ALL", "AR_PAYMENT_SCHEDULES_ALL", "RA_CUSTOMER_TRX_LINES_ALL",
+    "RA_CUST_TRX_LINE_GL_DIST_ALL", "XLA_AE_HEADERS", "XLA_AE_LINES", "XLA_DISTRIBUTION_LINKS",
+    "XLA_EVENTS", "MTL_MATERIAL_TRANSACTIONS", "MTL_TRANSACTION_ACCOUNTS", "OE_ORDER_LINES_ALL",
+)
+LARGE_TABLES = {
+    t.strip().upper()
+    for t in os.getenv("EXPLAIN_LARGE_TABLES", ",".join(DEFAULT_LARGE_TABLES)).split(",")
+    if t.strip()
+}
+
+PLAN_COLUMNS = (
+    "id", "parent_id", "operation", "options", "object_owner", "object_name", "object_type",
+    "cost", "cardinality", "bytes", "access_predicates", "filter_predicates",
+)
+
+
+def statement_text(sql):
+    """
+    Statement text for EXPLAIN PLAN ... FOR: unchanged apart from a trailing
+    semicolon, so line comments and string literals keep their meaning.
+    """
+    sql = (sql or "").strip()
+    last = None
+    for match in TOKEN_PATTERN.finditer(sql):
+        if match.lastgroup not in ("ws", "comment"):
+            last = match
+    if last is not None and last.group() == ";":
+        sql = sql[:last.start()].rstrip()
+    return sql
+
+
+def sql_fingerprint(sql):
+    """Same hash for statements that differ only in comments, whitespace, keyword case or a trailing ';'."""
+    tokens = [text for _, text in tokenize(statement_text(sql))]
+    return hashlib.sha1(" ".join(tokens).encode("utf-8")).hexdigest()
+
+
+class OracleExplainBackend:
+    """
+    Runs EXPLAIN PLAN on a live database through an oracledb session pool
+    (thin mode, no Oracle client needed). Nothing is executed: the plan rows
+    are read back from PLAN_TABLE and the transaction is rolled back.
+    """
+
+    def __init__(self, dsn=ORACLE_DSN, user=ORACLE_USER, password=ORACLE_PASSWORD, pool_max=4):
+        if oracledb is None:
+            raise ImportError("oracledb is required for EXPLAIN PLAN")
+        self.dsn = dsn
+        self._pool = oracledb.create_pool(user=user, password=password, dsn=dsn, min=0, max=pool_max, increment=1)
+
+    def explain(self, sql):
+        statement_id = uuid.uuid4().hex[:30]
+        with self._pool.acquire() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN PLAN SET STATEMENT_ID = '{statement_id}' FOR {statement_text(sql)}")
+                cursor.execute(
+                    f"SELECT {', '.join(PLAN_COLUMNS)} FROM plan_table WHERE statement_id = :statement_id ORDER BY id",
+                    statement_id=statement_id,
+                )
+                rows = [dict(zip(PLAN_COLUMNS, row)) for row in cursor.fetchall()]
+            connection.rollback()
+        return rows
+
+    def close(self):
+        self._pool.close()
+
+
+class RecordedExplainBackend:
+    """
+    Plans recorded earlier (or written by hand), keyed by sql_fingerprint().
+    default_plan answers statements that were never recorded, so tests can
+    run the analysis without a database.
+    """
+
+    def __init__(self, plans=None, default_plan=None):
+        self.plans = dict(plans or {})
+        self.default_plan = default_plan
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data.get("plans", {}), data.get("default_plan"))
+
+    def save(self, path):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"plans": self.plans, "default_plan": self.default_plan}, f, indent=2, default=str)
+
+    def record(self, sql, rows):
+        self.plans[sql_fingerprint(sql)] = rows
+
+    def explain(self, sql):
+        rows = self.plans.get(sql_fingerprint(sql), self.default_plan)
+        if rows is None:
+            raise KeyError(f"No recorded plan for statement {sql_fingerprint(sql)}")
+        return rows
+
+
+class RecordingExplainBackend:
+    """Wraps a live backend and saves every plan it returns, to replay later with RecordedExplainBackend."""
+
+    def __init__(self, backend, path):
+        self.backend = backend
+        self.path = path
+        self.recording = RecordedExplainBackend.from_file(path) if Path(path).exists() else RecordedExplainBackend()
+        self._lock = threading.Lock()
+
+    def explain(self, sql):
+        rows = self.backend.explain(sql)
+        with self._lock:
+            self.recording.record(sql, rows)
+            self.recording.save(self.path)
+        return rows
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_explain_backend():
+    """
+    The configured backend: recorded plans when EXPLAIN_RECORDING points at an
+    existing file, a live database when ORACLE_DSN is set, otherwise None.
+    """
+    global _backend
+    # Read at call time: the entry points load .env after importing this module.
+    dsn = os.getenv("ORACLE_DSN", ORACLE_DSN)
+    recording = os.getenv("EXPLAIN_RECORDING", EXPLAIN_RECORDING)
+    with _backend_lock:
+        if _backend is None:
+            if recording and Path(recording).exists() and not dsn:
+                _backend = RecordedExplainBackend.from_file(recording)
+            elif dsn and oracledb is not None:
+                _backend = OracleExplainBackend(
+                    dsn,
+                    os.getenv("ORACLE_USER", ORACLE_USER),
+                    os.getenv("ORACLE_PASSWORD", ORACLE_PASSWORD)
+                )
+                if recording:
+                    _backend = RecordingExplainBackend(_backend, recording)
+        return _backend
+
+
+def _number(value):
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def analyze_plan(rows, large_tables=LARGE_TABLES, cost_threshold=EXPLAIN_COST_THRESHOLD):
+    """
+    Summarizes PLAN_TABLE rows: total cost, every full table scan, full scans
+    of large R12 tables, and tables read without any index although the plan
+    filters them. "warnings" holds the human-readable findings.
+    """
+    rows = sorted(rows, key=lambda row: _number(row.get("id")) or 0)
+    root = rows[0] if rows else {}
+    cost = _number(root.get("cost"))
+
+    indexed_tables = {
+        (row.get("object_name") or "").upper()
+        for row in rows
+        if (row.get("operation") or "").upper() == "TABLE ACCESS" and "INDEX" in (row.get("options") or "").upper()
+    }
+
+    full_scans = []
+    for row in rows:
+        operation = (row.get("operation") or "").upper()
+        options = (row.get("options") or "").upper()
+        # FULL, or STORAGE FULL on Exadata
+        if operation == "TABLE ACCESS" and "FULL" in options.split():
+            full_scans.append({
+                "table": (row.get("object_name") or "").upper(),
+                "cost": _number(row.get("cost")),
+                "cardinality": _number(row.get("cardinality")),
+                "predicates": row.get("access_predicates") or row.get("filter_predicates") or "",
+            })
+
+    large_full_scans = [scan for scan in full_scans if scan["table"] in large_tables]
+    unindexed = [
+        scan for scan in full_scans
+        if scan["predicates"] and scan["table"] not in indexed_tables
+    ]
+
+    warnings = []
+    if cost is not None and cost >= cost_threshold:
+        warnings.append(f"Estimated cost {cost:,} is above the {cost_threshold:,} threshold.")
+    for scan in large_full_scans:
+        warnings.append(f"Full scan of large table {scan['table']} (cost {scan['cost']}, ~{scan['cardinality']} rows).")
+    for scan in unindexed:
+        if scan not in large_full_scans:
+            warnings.append(f"{scan['table']} is filtered without an index: {scan['predicates']}")
+
+    return {
+        "cost": cost,
+        "cardinality": _number(root.get("cardinality")),
+        "full_scans": full_scans,
+        "large_table_full_scans": large_full_scans,
+        "unindexed_filters": unindexed,
+        "warnings": warnings,
+        "plan": rows,
+    }
+
+
+def explain_sql(sql, backend=None):
+    """
+    EXPLAIN PLAN report for sql through backend (default: the configured one).
+    Returns None when no backend is configured; errors are returned in the
+    report instead of raised so a failed explain never blocks the outputs.
+    """
+    backend = backend or get_explain_backend()
+    if backend is None or not statement_text(sql):
+        return None
+    try:
+        rows = backend.explain(sql)
+    except Exception as e:
+        print(f"⚠️ EXPLAIN PLAN failed: {e}")
+        return {"error": str(e), "warnings": [f"EXPLAIN PLAN failed: {e}"]}
+    report = analyze_plan(rows)
+    for warning in report["warnings"]:
+        print(f"🐢 {warning}")
+    return report
+
+
+def format_plan(rows):
+    """Indented one-line-per-step text like DBMS_XPLAN, for display."""
+    depth = {}
+    lines = []
+    for row in sorted(rows, key=lambda row: _number(row.get("id")) or 0):
+        row_id = _number(row.get("id"))
+        depth[row_id] = depth.get(_number(row.get("parent_id")), -1) + 1
+        step = " ".join(p for p in (row.get("operation"), row.get("options")) if p)
+        target = f" {row['object_name']}" if row.get("object_name") else ""
+        lines.append(f"{row_id:>3} {'  ' * depth[row_id]}{step}{target}  (cost={row.get('cost')}, rows={row.get('cardinality')})")
+    return "\n".join(lines)
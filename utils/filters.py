@@ -13,8 +13,21 @@ EXCLUDED_PATTERNS = [
     re.compile(r"^Data Constraints:.*", re.IGNORECASE),
 ]
 
+USEFUL_KEYWORDS = ["date", "number", "buyer", "amount", "price", "quantity", "part", "tax"]
+
 def is_excluded_line(line):
     for pattern in EXCLUDED_PATTERNS:
         if pattern.match(line.strip()):
             return True
     return False
+
+def is_useful_line(line):
+    return any(
+        keyword in line.lower()
+        for keyword in USEFUL_KEYWORDS
+    ) and len(line.strip()) > 0
+
+def clean_text(text):
+    lines = text.split("\n")
+    useful = [line.strip() for line in lines if is_useful_line(line)]
+    return "\n".join(useful)
@@ -0,0 +1,194 @@
+import re
+from pathlib import Path
+
+import networkx as nx
+import pandas as pd
+
+from utils.metadata_catalog import SCHEMA_PREFIX_PATTERN
+from utils.sql_validator import KEYWORDS
+
+# Join metadata lives next to the column CSVs, one pipe-delimited file per area:
+#   LEFT_TABLE|LEFT_COLUMNS|RIGHT_TABLE|RIGHT_COLUMNS|WEIGHT
+#   AP_INVOICES_ALL|VENDOR_ID|PO_VENDORS|VENDOR_ID|1
+#   AP_INVOICE_LINES_ALL|INVOICE_ID|AP_INVOICES_ALL|INVOICE_ID|
+# Composite keys list their columns comma-separated in the same order on both
+# sides. WEIGHT is optional (default 1); lower weights are preferred paths.
+JOINS_DIR_NAME = "joins"
+JOIN_COLUMNS = ["left_table", "left_columns", "right_table", "right_columns"]
+# Oracle identifiers (and so column aliases) are limited to 30 bytes before 12.2.
+MAX_ALIAS_LENGTH = 30
+# Oracle reserved words (V$RESERVED_WORDS, reserved = 'Y') on top of the SQL
+# keywords the validator knows; initials such as AP_SUPPLIERS -> "as" must not
+# become table aliases.
+RESERVED_WORDS = KEYWORDS | {
+    "ACCESS", "ADD", "ALTER", "AUDIT", "CHAR", "CHECK", "CLUSTER", "COLUMN", "COMMENT", "COMPRESS",
+    "CREATE", "DECIMAL", "DEFAULT", "DELETE", "DROP", "EXCLUSIVE", "FILE", "FLOAT", "GRANT",
+    "IDENTIFIED", "IMMEDIATE", "INCREMENT", "INDEX", "INITIAL", "INSERT", "INTEGER", "INTO",
+    "LOCK", "LONG", "MAXEXTENTS", "MLSLABEL", "MODE", "MODIFY", "NOAUDIT", "NOCOMPRESS", "NUMBER",
+    "OFFLINE", "ONLINE", "OPTION", "PCTFREE", "PRIVILEGES", "PUBLIC", "RAW", "RENAME", "RESOURCE",
+    "REVOKE", "ROWLABEL", "SESSION", "SET", "SHARE", "SIZE", "SMALLINT", "SUCCESSFUL", "SYNONYM",
+    "TABLE", "TRIGGER", "VALIDATE", "VALUES", "VARCHAR", "VARCHAR2", "VIEW", "WHENEVER",
+}
+
+
+def _name(value):
+    return re.sub(SCHEMA_PREFIX_PATTERN, "", str(value).strip().upper())
+
+
+def _columns(value):
+    return tuple(_name(c) for c in str(value).split(",") if c.strip())
+
+
+class JoinGraph:
+    """
+    Undirected graph of R12 tables whose edges carry the join condition.
+    Build it with from_dataframe() or load_join_graph(); plan() picks the
+    cheapest set of joins connecting the mapped tables.
+    """
+
+    def __init__(self, graph=None):
+        self.graph = graph if graph is not None else nx.Graph()
+
+    @classmethod
+    def from_dataframe(cls, joins_df):
+        graph = nx.Graph()
+        if joins_df is None or joins_df.empty:
+            return cls(graph)
+        joins_df = joins_df.rename(columns=lambda col: str(col).strip().lower())
+        missing = [col for col in JOIN_COLUMNS if col not in joins_df.columns]
+        if missing:
+            raise ValueError(f"❌ Join metadata is missing column(s): {', '.join(missing)}")
+
+        weights = joins_df["weight"] if "weight" in joins_df.columns else pd.Series(1.0, index=joins_df.index)
+        for row, weight in zip(joins_df[JOIN_COLUMNS].fillna("").itertuples(index=False), weights):
+            left, right = _name(row.left_table), _name(row.right_table)
+            left_columns, right_columns = _columns(row.left_columns), _columns(row.right_columns)
+            if not left or not right or left == right or not left_columns or len(left_columns) != len(right_columns):
+                continue
+            weight = float(weight) if pd.notna(weight) and str(weight).strip() else 1.0
+            existing = graph.get_edge_data(left, right)
+            if existing is not None and existing["weight"] <= weight:
+                continue
+            graph.add_edge(left, right, weight=weight, on={left: left_columns, right: right_columns})
+        return cls(graph)
+
+    def __len__(self):
+        return self.graph.number_of_edges()
+
+    def has_table(self, table):
+        return _name(table) in self.graph
+
+    def condition(self, table, other):
+        """[(table_column, other_column)] for the direct join between two tables."""
+        data = self.graph.get_edge_data(_name(table), _name(other))
+        if data is None:
+            return []
+        return list(zip(data["on"][_name(table)], data["on"][_name(other)]))
+
+    def plan(self, tables):
+        """
+        Returns (root, joins, unreachable): joins is an ordered list of
+        (new_table, existing_table, [(new_column, existing_column)]) that
+        attaches every reachable table to root, possibly through bridge
+        tables that were not mapped themselves. unreachable lists the mapped
+        tables that cannot be joined to root with the known edges.
+        """
+        tables = list(dict.fromkeys(_name(t) for t in tables if t))
+        if not tables:
+            return None, [], []
+        root = tables[0]
+        if root not in self.graph:
+            return root, [], tables[1:]
+
+        component = nx.node_connected_component(self.graph, root)
+        terminals = [t for t in tables if t in component]
+        unreachable = [t for t in tables if t not in component]
+        if len(terminals) == 1:
+            return root, [], unreachable
+
+        if len(terminals) == 2:
+            path = nx.shortest_path(self.graph, terminals[0], terminals[1], weight="weight")
+            tree = nx.Graph()
+            nx.add_path(tree, path)
+        else:
+            tree = nx.algorithms.approximation.steiner_tree(self.graph, terminals, weight="weight")
+
+        joins = [
+            (child, parent, self.condition(child, parent))
+            for parent, child in nx.bfs_edges(tree, root, sort_neighbors=sorted)
+        ]
+        return root, joins, unreachable
+
+
+def load_join_graph(metadata_dir="metadata"):
+    """Returns (join_graph, files, errors) for metadata_dir/joins/*.csv."""
+    joins_dir = Path(metadata_dir) / JOINS_DIR_NAME
+    files = sorted(joins_dir.glob("*.csv"))
+    frames = []
+    errors = []
+    for path in files:
+        try:
+            frames.append(pd.read_csv(path, sep="|", dtype=str))
+        except Exception as e:
+            errors.append((path.name, str(e)))
+    joins_df = pd.concat(frames, ignore_index=True) if frames else None
+    try:
+        return JoinGraph.from_dataframe(joins_df), files, errors
+    except ValueError as e:
+        return JoinGraph(), files, errors + [(JOINS_DIR_NAME, str(e))]
+
+
+def _table_alias(table, used):
+    alias = "".join(part[0] for part in table.lower().split("_") if part) or "t"
+    if alias in used or alias.upper() in RESERVED_WORDS:
+        suffix = 2
+        while f"{alias}{suffix}" in used or f"{alias}{suffix}".upper() in RESERVED_WORDS:
+            suffix += 1
+        alias = f"{alias}{suffix}"
+    used.add(alias)
+    return alias
+
+
+def _column_alias(label):
+    alias = re.sub(r"\s+", " ", str(label)).strip().replace('"', "")
+    return alias.encode("utf-8")[:MAX_ALIAS_LENGTH].decode("utf-8", "ignore") or "COL"
+
+
+def build_select_sql(mappings, join_graph):
+    """
+    Deterministic Oracle SELECT for the mappings: one column per label,
+    aliased with the label, and ANSI joins along the planned join path.
+    Returns (sql, unreachable_tables); sql is None when some mapped table
+    cannot be joined with the known edges.
+    """
+    tables = [m["oracle_r12_table"] for m in mappings]
+    root, joins, unreachable = join_graph.plan(tables)
+    if root is None or unreachable:
+        return None, unreachable
+
+    used = set()
+    aliases = {root: _table_alias(root, used)}
+    for table, _, _ in joins:
+        aliases[table] = _table_alias(table, used)
+
+    select_lines = [
+        f'{aliases[_name(m["oracle_r12_table"])]}.{_name(m["oracle_r12_column"])} AS "{_column_alias(m["extracted_label"])}"'
+        for m in mappings
+    ]
+    lines = ["SELECT " + ",\n       ".join(select_lines), f"FROM {root} {aliases[root]}"]
+    for table, existing, condition in joins:
+        on = " AND ".join(f"{aliases[table]}.{column} = {aliases[existing]}.{other}" for column, other in condition)
+        lines.append(f"JOIN {table} {aliases[table]} ON {on}")
+    return "\n".join(lines) + ";", []
+
+
+def describe_joins(join_graph, tables):
+    """Known join conditions among the given tables, one "A.X = B.Y" line per edge."""
+    tables = list(dict.fromkeys(_name(t) for t in tables if t))
+    lines = []
+    for i, table in enumerate(tables):
+        for other in tables[i + 1:]:
+            condition = join_graph.condition(table, other)
+            if condition:
+                lines.append(" AND ".join(f"{table}.{a} = {other}.{b}" for a, b in condition))
+    return lines
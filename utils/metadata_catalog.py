@@ -0,0 +1,156 @@
+import hashlib
+import re
+from functools import cached_property
+from io import StringIO
+
+import pandas as pd
+
+# R12 physical tables and views share a root: AP_INVOICES, AP_INVOICES_ALL, AP_INVOICES_V ...
+TABLE_SUFFIX_PATTERN = r"(?:_(?:ALL|B|TL|VL|V|F))+$"
+SCHEMA_PREFIX_PATTERN = r"^.*\."
+# Order in which same-root tables are tried when the exact table does not have the column.
+VARIANT_PREFERENCE = ("", "_ALL", "_B", "_TL", "_VL", "_V", "_F")
+
+
+def table_root(table):
+    """AP.AP_INVOICES_ALL -> AP_INVOICES; returns the bare name if stripping would empty it."""
+    bare = re.sub(SCHEMA_PREFIX_PATTERN, "", table.strip().upper())
+    return re.sub(TABLE_SUFFIX_PATTERN, "", bare) or bare
+
+
+class MetadataCatalog:
+    """
+    Normalized (TABLE, COLUMN) pairs for the loaded R12 metadata.
+
+    Build it once with from_dataframe() / from_pairs() and pass the same object
+    to every mapping request instead of handing over the raw metadata frame.
+    """
+
+    def __init__(self, pairs):
+        self.pairs = pairs.reset_index(drop=True)
+
+    @classmethod
+    def from_dataframe(cls, metadata_df):
+        if metadata_df is None:
+            return cls.empty()
+
+        try:
+            if isinstance(metadata_df, (bytes, str)):
+                if isinstance(metadata_df, bytes):
+                    metadata_df = metadata_df.decode("utf-8")
+                metadata_df = pd.read_csv(StringIO(metadata_df), sep="|")
+            metadata_df = metadata_df.rename(columns=lambda col: str(col).strip().lower())
+        except Exception as e:
+            raise ValueError(f"❌ Failed to parse metadata CSV: {e}")
+
+        if metadata_df.empty:
+            return cls.empty()
+
+        source = metadata_df[["table_name", "column_list"]].dropna(subset=["table_name"])
+        pairs = pd.DataFrame({
+            "table_name": source["table_name"].astype(str).str.strip().str.upper(),
+            "column_name": source["column_list"].fillna("").astype(str).str.split(","),
+        }).explode("column_name")
+        pairs["column_name"] = pairs["column_name"].str.strip().str.upper()
+        pairs = pairs[(pairs["table_name"] != "") & (pairs["column_name"] != "")]
+
+        return cls.from_pairs(pairs)
+
+    @classmethod
+    def from_pairs(cls, pairs):
+        pairs = pairs[["table_name", "column_name"]].astype(str).drop_duplicates()
+        return cls(pairs)
+
+    @classmethod
+    def empty(cls):
+        return cls(pd.DataFrame({"table_name": pd.Series(dtype=str), "column_name": pd.Series(dtype=str)}))
+
+    def __len__(self):
+        return len(self.pairs)
+
+    @cached_property
+    def version(self):
+        """Content hash of the pairs; changes whenever the metadata does."""
+        if self.pairs.empty:
+            return "empty"
+        row_hashes = pd.util.hash_pandas_object(self.pairs, index=False).values
+        return hashlib.sha1(row_hashes.tobytes()).hexdigest()
+
+    @cached_property
+    def lookup(self):
+        return set(zip(self.pairs["table_name"], self.pairs["column_name"]))
+
+    @cached_property
+    def table_column_map(self):
+        grouped = self.pairs.groupby("table_name", sort=False)["column_name"]
+        return {table: set(columns) for table, columns in grouped}
+
+    @cached_property
+    def column_tables(self):
+        """Reverse index: column name -> set of tables that have it."""
+        grouped = self.pairs.groupby("column_name", sort=False)["table_name"]
+        return {column: set(tables) for column, tables in grouped}
+
+    @cached_property
+    def table_roots(self):
+        """Base-name index: table root -> set of physical tables sharing it."""
+        tables = pd.Series(self.pairs["table_name"].unique(), dtype=str)
+        roots = tables.str.replace(TABLE_SUFFIX_PATTERN, "", regex=True)
+        roots = roots.where(roots != "", tables)
+        index = {}
+        for root, table in zip(roots, tables):
+            index.setdefault(root, set()).add(table)
+        return index
+
+    def has(self, table, column):
+        return (table, column) in self.lookup
+
+    def columns_for(self, table):
+        return self.table_column_map.get(table, set())
+
+    def tables_for(self, column):
+        return self.column_tables.get(column, set())
+
+    def resolve(self, table, column):
+        """
+        Validates or corrects an LLM suggestion.
+
+        Returns (table, column, how) where how is "exact", "variant" (another
+        table with the same root, e.g. _ALL/_B/_TL) or "column" (right column,
+        wrong table: the column exists in exactly one table, or one table is
+        the closest by name). Returns None when nothing plausible exists.
+        """
+        table = re.sub(SCHEMA_PREFIX_PATTERN, "", (table or "").strip().upper())
+        column = re.sub(SCHEMA_PREFIX_PATTERN, "", (column or "").strip().upper())
+        if not column:
+            return None
+
+        if self.has(table, column):
+            return table, column, "exact"
+
+        owners = self.tables_for(column)
+        if not owners:
+            return None
+
+        root = table_root(table) if table else ""
+        same_root = self.table_roots.get(root, set()) & owners
+        if same_root:
+            for suffix in VARIANT_PREFERENCE:
+                if root + suffix in same_root:
+                    return root + suffix, column, "variant"
+            return sorted(same_root)[0], column, "variant"
+
+        if len(owners) == 1:
+            return next(iter(owners)), column, "column"
+
+        # Several tables have the column: take the one sharing most name tokens with the suggestion.
+        root_tokens = set(root.split("_")) - {""}
+        if not root_tokens:
+            return None
+        scored = sorted(
+            ((len(root_tokens & set(table_root(owner).split("_"))), owner) for owner in owners),
+            reverse=True,
+        )
+        if scored[0][0] > 0 and (len(scored) == 1 or scored[0][0] > scored[1][0]):
+            return scored[0][1], column, "column"
+        return None
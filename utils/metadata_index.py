@@ -0,0 +1,197 @@
+import hashlib
+import json
+from pathlib import Path
+
+import pandas as pd
+
+from clean_metadata_csv import clean_and_load_metadata
+from utils.metadata_catalog import MetadataCatalog
+
+INDEX_DIR_NAME = ".index"
+INDEX_FILE = "metadata.parquet"
+PAIRS_FILE = "catalog_pairs.parquet"
+MANIFEST_FILE = "manifest.json"
+INDEX_FORMAT_VERSION = 2
+
+
+def file_digest(path):
+    """sha256 of a file, read in 1 MiB blocks."""
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def _stat_entry(path):
+    stat = path.stat()
+    return {"name": path.name, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _read_manifest(index_dir):
+    manifest_path = index_dir / MANIFEST_FILE
+    if not manifest_path.exists():
+        return None
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("format_version") != INDEX_FORMAT_VERSION:
+        return None
+    return manifest
+
+
+def _write_manifest(index_dir, manifest):
+    tmp_path = index_dir / (MANIFEST_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    tmp_path.replace(index_dir / MANIFEST_FILE)
+
+
+def _manifest_is_current(manifest, index_dir, files):
+    """
+    Cheap check first (name/size/mtime). Files whose stat changed are re-hashed,
+    so a touched-but-identical CSV does not force a rebuild.
+    Returns (is_current, refreshed_sources).
+    """
+    if manifest is None:
+        return False, None
+    if not (index_dir / INDEX_FILE).exists() or not (index_dir / PAIRS_FILE).exists():
+        return False, None
+
+    known = {entry["name"]: entry for entry in manifest.get("sources", [])}
+    if set(known) != {f.name for f in files}:
+        return False, None
+
+    refreshed = []
+    for path in files:
+        stat = _stat_entry(path)
+        previous = known[path.name]
+        if stat["size"] == previous["size"] and stat["mtime_ns"] == previous["mtime_ns"]:
+            refreshed.append(previous)
+            continue
+        digest = file_digest(path)
+        if digest != previous.get("sha256"):
+            return False, None
+        # Same content: keep everything recorded at build time (e.g. "error").
+        entry = dict(previous)
+        entry.update(size=stat["size"], mtime_ns=stat["mtime_ns"], sha256=digest)
+        refreshed.append(entry)
+
+    return True, refreshed
+
+
+def build_metadata_index(metadata_dir="metadata", index_dir=None):
+    """
+    Parses every TABLE_NAME|COLUMN_LIST CSV in metadata_dir once and writes the
+    combined frame to a Parquet index plus a manifest of source size/mtime/sha256.
+
+    The exploded (table_name, column_name) pairs of the MetadataCatalog are
+    stored next to it so the catalog can be loaded without re-splitting.
+
+    Returns (metadata_df, errors) where errors is a list of (file_name, message).
+    """
+    metadata_dir = Path(metadata_dir)
+    index_dir = Path(index_dir) if index_dir else metadata_dir / INDEX_DIR_NAME
+    index_dir.mkdir(parents=True, exist_ok=True)
+
+    frames = []
+    sources = []
+    errors = []
+    for path in sorted(metadata_dir.glob("*.csv")):
+        entry = _stat_entry(path)
+        try:
+            with open(path, "rb") as f:
+                file_data = f.read()
+            entry["sha256"] = hashlib.sha256(file_data).hexdigest()
+            temp_df = clean_and_load_metadata(file_data)
+            frames.append(temp_df[["table_name", "column_list"]])
+        except Exception as e:
+            errors.append((path.name, str(e)))
+            entry["error"] = str(e)
+        sources.append(entry)
+
+    if frames:
+        metadata_df = pd.concat(frames, ignore_index=True)
+    else:
+        metadata_df = pd.DataFrame(columns=["table_name", "column_list"])
+    metadata_df["table_name"] = metadata_df["table_name"].astype(str)
+    metadata_df["column_list"] = metadata_df["column_list"].astype(str)
+
+    tmp_path = index_dir / (INDEX_FILE + ".tmp")
+    metadata_df.to_parquet(tmp_path, index=False)
+    tmp_path.replace(index_dir / INDEX_FILE)
+
+    catalog = MetadataCatalog.from_dataframe(metadata_df)
+    tmp_path = index_dir / (PAIRS_FILE + ".tmp")
+    catalog.pairs.to_parquet(tmp_path, index=False)
+    tmp_path.replace(index_dir / PAIRS_FILE)
+
+    _write_manifest(index_dir, {
+        "format_version": INDEX_FORMAT_VERSION,
+        "sources": sources,
+    })
+    print(f"🗂️ Rebuilt metadata index from {len(sources)} file(s) into {index_dir}")
+
+    return metadata_df, errors
+
+
+def metadata_signature(metadata_dir="metadata"):
+    """Cheap (name, size, mtime_ns) tuple of the source CSVs; changes whenever a CSV does."""
+    return tuple(
+        (entry["name"], entry["size"], entry["mtime_ns"])
+        for entry in (_stat_entry(path) for path in sorted(Path(metadata_dir).glob("*.csv")))
+    )
+
+
+def load_metadata_index(metadata_dir="metadata", index_dir=None):
+    """
+    Returns (metadata_df, source_files, errors) for all CSVs in metadata_dir.
+
+    The Parquet index is only rebuilt when a CSV was added, removed or its
+    contents changed; otherwise it is read straight from disk.
+    """
+    metadata_dir = Path(metadata_dir)
+    index_dir = Path(index_dir) if index_dir else metadata_dir / INDEX_DIR_NAME
+    files = sorted(metadata_dir.glob("*.csv"))
+
+    if not files:
+        return pd.DataFrame(columns=["table_name", "column_list"]), [], []
+
+    manifest = _read_manifest(index_dir)
+    is_current, refreshed = _manifest_is_current(manifest, index_dir, files)
+
+    if is_current:
+        try:
+            metadata_df = pd.read_parquet(index_dir / INDEX_FILE)
+            if refreshed != manifest["sources"]:
+                _write_manifest(index_dir, {
+                    "format_version": INDEX_FORMAT_VERSION,
+                    "sources": refreshed,
+                })
+            errors = [(s["name"], s["error"]) for s in refreshed if s.get("error")]
+            return metadata_df, files, errors
+        except Exception as e:
+            print(f"⚠️ Metadata index unreadable, rebuilding: {e}")
+
+    metadata_df, errors = build_metadata_index(metadata_dir, index_dir)
+    return metadata_df, files, errors
+
+
+def load_metadata_catalog(metadata_dir="metadata", index_dir=None):
+    """
+    Returns (catalog, metadata_df, source_files, errors), refreshing the index
+    first if any source CSV changed.
+    """
+    metadata_dir = Path(metadata_dir)
+    index_dir = Path(index_dir) if index_dir else metadata_dir / INDEX_DIR_NAME
+    metadata_df, files, errors = load_metadata_index(metadata_dir, index_dir)
+
+    pairs_path = index_dir / PAIRS_FILE
+    if files and pairs_path.exists():
+        catalog = MetadataCatalog(pd.read_parquet(pairs_path))
+    else:
+        catalog = MetadataCatalog.from_dataframe(metadata_df)
+
+    return catalog, metadata_df, files, errors
@@ -0,0 +1,445 @@
+import re
+
+# Lightweight checks for the Oracle SELECT statements we generate: every table
+# and column must exist in the loaded metadata, unqualified columns must not be
+# ambiguous, and every table in a FROM clause must be joined to the others.
+# Not a full SQL grammar - just enough structure for SELECT / FROM / JOIN /
+# WHERE / GROUP BY / HAVING / ORDER BY, set operators, subqueries and WITH.
+
+TOKEN_PATTERN = re.compile(r"""
+    (?P<ws>\s+)
+  | (?P<comment>--[^\n]*|/\*.*?\*/)
+  | (?P<string>[nN]?'(?:[^']|'')*')
+  | (?P<quoted>"[^"]*")
+  | (?P<number>\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+  | (?P<bind>:\w+)
+  | (?P<word>[A-Za-z_][\w$#]*)
+  | (?P<op><>|!=|\^=|<=|>=|\|\||=>|[(),.;*+\-/<>=%@])
+""", re.X | re.S)
+
+CLAUSE_KEYWORDS = {"SELECT", "FROM", "WHERE", "GROUP", "HAVING", "ORDER", "CONNECT", "START", "FETCH", "OFFSET", "FOR", "MODEL"}
+SET_OPERATORS = {"UNION", "INTERSECT", "MINUS", "EXCEPT"}
+JOIN_WORDS = {"JOIN", "INNER", "LEFT", "RIGHT", "FULL", "OUTER", "CROSS", "NATURAL"}
+
+# Words that are never column references in the positions we scan.
+KEYWORDS = {
+    "SELECT", "FROM", "WHERE", "GROUP", "BY", "HAVING", "ORDER", "ASC", "DESC", "NULLS", "FIRST", "LAST",
+    "AND", "OR", "NOT", "IN", "IS", "NULL", "LIKE", "ESCAPE", "BETWEEN", "EXISTS", "ANY", "ALL", "SOME",
+    "CASE", "WHEN", "THEN", "ELSE", "END", "AS", "DISTINCT", "UNIQUE", "ON", "USING", "JOIN", "INNER",
+    "LEFT", "RIGHT", "FULL", "OUTER", "CROSS", "NATURAL", "UNION", "INTERSECT", "MINUS", "EXCEPT",
+    "OVER", "PARTITION", "ROWS", "RANGE", "UNBOUNDED", "PRECEDING", "FOLLOWING", "CURRENT", "ROW",
+    "WITHIN", "KEEP", "DENSE_RANK", "PRIOR", "CONNECT", "START", "WITH", "NOCYCLE", "SIBLINGS",
+    "FETCH", "NEXT", "ONLY", "OFFSET", "FOR", "UPDATE", "OF", "NOWAIT", "WAIT", "SKIP", "LOCKED",
+    "DATE", "TIMESTAMP", "INTERVAL", "YEAR", "MONTH", "DAY", "HOUR", "MINUTE", "SECOND", "TO",
+    "ROWNUM", "ROWID", "LEVEL", "SYSDATE", "SYSTIMESTAMP", "USER", "UID", "CURRENT_DATE",
+    "CURRENT_TIMESTAMP", "TRUE", "FALSE", "BOTH", "LEADING", "TRAILING", "AT", "TIME", "ZONE",
+    "CONNECT_BY_ROOT", "CONNECT_BY_ISLEAF", "SEPARATOR", "IGNORE", "RESPECT",
+}
+PSEUDO_COLUMNS = {"NEXTVAL", "CURRVAL"}
+ALWAYS_KNOWN_TABLES = {"DUAL"}
+
+
+def tokenize(sql):
+    """[(kind, text)] with whitespace and comments dropped; words are upper-cased."""
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(sql):
+        kind = match.lastgroup
+        if kind in ("ws", "comment"):
+            continue
+        text = match.group()
+        if kind == "word":
+            text = text.upper()
+        elif kind == "quoted":
+            text = text[1:-1]
+        tokens.append((kind, text))
+    return tokens
+
+
+def _is(token, *values):
+    return token is not None and token[0] in ("word", "op") and token[1] in values
+
+
+def _matching_paren(tokens, start):
+    depth = 0
+    for i in range(start, len(tokens)):
+        if _is(tokens[i], "("):
+            depth += 1
+        elif _is(tokens[i], ")"):
+            depth -= 1
+            if depth == 0:
+                return i
+    return len(tokens) - 1
+
+
+def _split_top(tokens, is_separator):
+    """Splits at depth-0 tokens for which is_separator(tokens, i) is true; separators are dropped."""
+    parts = [[]]
+    depth = 0
+    for i, token in enumerate(tokens):
+        if _is(token, "("):
+            depth += 1
+        elif _is(token, ")"):
+            depth -= 1
+        if depth == 0 and is_separator(tokens, i):
+            parts.append([])
+            continue
+        parts[-1].append(token)
+    return parts
+
+
+def _issue(kind, message):
+    return {"kind": kind, "message": message}
+
+
+class _Scope:
+    def __init__(self, parent=None):
+        self.parent = parent
+        # alias -> table, or None for subqueries, CTEs and unknown tables
+        self.sources = {}
+        # table name -> alias, so TABLE.COLUMN is tolerated next to an alias
+        self.table_aliases = {}
+
+    def local_alias(self, qualifier):
+        if qualifier in self.sources:
+            return qualifier
+        return self.table_aliases.get(qualifier)
+
+    def resolve(self, qualifier):
+        """(scope, table) the qualifier refers to, searching outer queries too."""
+        scope = self
+        while scope is not None:
+            alias = scope.local_alias(qualifier)
+            if alias is not None:
+                return scope, scope.sources[alias]
+            scope = scope.parent
+        return None, None
+
+
+class _Validator:
+    def __init__(self, table_column_map):
+        self.tables = table_column_map or {}
+        self.check_identifiers = bool(self.tables)
+        self.issues = []
+        self._seen = set()
+
+    def report(self, kind, message):
+        if (kind, message) not in self._seen:
+            self._seen.add((kind, message))
+            self.issues.append(_issue(kind, message))
+
+    # -- statements -------------------------------------------------------
+
+    def query(self, tokens, parent=None, ctes=frozenset()):
+        if _is(tokens[0] if tokens else None, "WITH"):
+            tokens, ctes = self._with_clause(tokens[1:], parent, ctes)
+
+        parts = _split_top(tokens, lambda ts, i: _is(ts[i], *SET_OPERATORS) or (_is(ts[i], "ALL") and i > 0 and _is(ts[i - 1], "UNION")))
+        for part in parts:
+            if not part:
+                continue
+            if _is(part[0], "(") and _matching_paren(part, 0) == len(part) - 1:
+                self.query(part[1:-1], parent, ctes)
+            elif _is(part[0], "SELECT"):
+                self._select(part, parent, ctes)
+            else:
+                self.report("parse_error", "Expected a SELECT statement.")
+
+    def _with_clause(self, tokens, parent, ctes):
+        ctes = set(ctes)
+        i = 0
+        while i < len(tokens) and tokens[i][0] in ("word", "quoted"):
+            name = tokens[i][1]
+            i += 1
+            if _is(tokens[i] if i < len(tokens) else None, "("):
+                i = _matching_paren(tokens, i) + 1  # column alias list
+            if not _is(tokens[i] if i < len(tokens) else None, "AS"):
+                break
+            i += 1
+            if not _is(tokens[i] if i < len(tokens) else None, "("):
+                break
+            end = _matching_paren(tokens, i)
+            self.query(tokens[i + 1:end], parent, frozenset(ctes))
+            ctes.add(name)
+            i = end + 1
+            if _is(tokens[i] if i < len(tokens) else None, ","):
+                i += 1
+                continue
+            break
+        return tokens[i:], frozenset(ctes)
+
+    def _clauses(self, tokens):
+        clauses = {}
+        current = None
+        depth = 0
+        for i, token in enumerate(tokens):
+            if _is(token, "("):
+                depth += 1
+            elif _is(token, ")"):
+                depth -= 1
+            if depth == 0 and _is(token, *CLAUSE_KEYWORDS):
+                current = token[1]
+                clauses[current] = []
+                continue
+            if depth == 0 and _is(token, "BY") and current in ("GROUP", "ORDER", "CONNECT") and not clauses[current]:
+                continue
+            if current is not None:
+                clauses[current].append(token)
+        return clauses
+
+    def _select(self, tokens, parent, ctes):
+        if tokens and _is(tokens[-1], ";"):
+            tokens = tokens[:-1]
+        clauses = self._clauses(tokens)
+        scope = _Scope(parent)
+        items, joins = self._from_clause(clauses.get("FROM", []), scope, ctes)
+
+        select_aliases = set()
+        for item in _split_top(clauses.get("SELECT", []), lambda ts, i: _is(ts[i], ",")):
+            expression, alias = self._strip_alias(item)
+            if alias:
+                select_aliases.add(alias)
+            self._expression(expression, scope, ctes)
+
+        for on_tokens in joins:
+            self._expression(on_tokens, scope, ctes)
+        for name in ("WHERE", "GROUP", "HAVING", "CONNECT", "START"):
+            self._expression(clauses.get(name, []), scope, ctes)
+        self._expression(clauses.get("ORDER", []), scope, ctes, allowed=select_aliases)
+
+        self._check_cartesian(items, joins, clauses.get("WHERE", []), scope)
+
+    # -- FROM -------------------------------------------------------------
+
+    def _from_clause(self, tokens, scope, ctes):
+        """Registers sources in scope; returns ([(alias, linked_by)], [on_tokens])."""
+        items = []
+        ons = []
+        i = 0
+        linked_by = None
+        while i < len(tokens):
+            token = tokens[i]
+            if _is(token, ","):
+                linked_by = None
+                i += 1
+                continue
+            if _is(token, *JOIN_WORDS):
+                words = []
+                while i < len(tokens) and _is(tokens[i], *JOIN_WORDS):
+                    words.append(tokens[i][1])
+                    i += 1
+                linked_by = "cross" if ("CROSS" in words or "NATURAL" in words) else "join"
+                continue
+
+            i, alias = self._table_reference(tokens, i, scope, ctes)
+            on_tokens = []
+            if i < len(tokens) and _is(tokens[i], "ON"):
+                j = i + 1
+                depth = 0
+                while j < len(tokens):
+                    if _is(tokens[j], "("):
+                        depth += 1
+                    elif _is(tokens[j], ")"):
+                        depth -= 1
+                    elif depth == 0 and _is(tokens[j], ",", *JOIN_WORDS):
+                        break
+                    j += 1
+                on_tokens = tokens[i + 1:j]
+                ons.append(on_tokens)
+                i = j
+            elif i < len(tokens) and _is(tokens[i], "USING"):
+                end = _matching_paren(tokens, i + 1)
+                i = end + 1
+                linked_by = "cross"
+            items.append((alias, linked_by, on_tokens))
+            linked_by = None
+        return items, ons
+
+    def _table_reference(self, tokens, i, scope, ctes):
+        if _is(tokens[i], "("):
+            end = _matching_paren(tokens, i)
+            self.query(tokens[i + 1:end], scope.parent, ctes)
+            i = end + 1
+            table = None
+            label = "(subquery)"
+        else:
+            names = [tokens[i][1]]
+            i += 1
+            while i + 1 < len(tokens) and _is(tokens[i], ".") and tokens[i + 1][0] in ("word", "quoted"):
+                names.append(tokens[i + 1][1])
+                i += 2
+            if i < len(tokens) and _is(tokens[i], "@"):
+                i += 2  # database link
+            table = names[-1]
+            label = table
+            if table in ctes:
+                table = None
+            elif table not in self.tables and table not in ALWAYS_KNOWN_TABLES:
+                if self.check_identifiers:
+                    self.report("unknown_table", f"Table {'.'.join(names)} is not in the R12 metadata.")
+                table = None
+
+        alias = None
+        if i < len(tokens) and _is(tokens[i], "AS"):
+            i += 1
+        if i < len(tokens) and tokens[i][0] in ("word", "quoted") and tokens[i][1] not in KEYWORDS:
+            alias = tokens[i][1]
+            i += 1
+        alias = alias or label
+        if alias in scope.sources:
+            self.report("duplicate_alias", f"Alias {alias} is used for more than one table.")
+        scope.sources[alias] = table
+        if table is not None:
+            scope.table_aliases.setdefault(table, alias)
+        return i, alias
+
+    # -- expressions ------------------------------------------------------
+
+    @staticmethod
+    def _strip_alias(item):
+        if len(item) >= 2 and _is(item[-2], "AS"):
+            return item[:-2], item[-1][1]
+        if len(item) >= 2 and item[-1][0] in ("word", "quoted") and item[-1][1] not in KEYWORDS:
+            previous = item[-2]
+            if previous[0] in ("word", "quoted", "string", "number") or _is(previous, ")"):
+                if not _is(previous, "."):
+                    return item[:-1], item[-1][1]
+        return item, None
+
+    def _expression(self, tokens, scope, ctes, allowed=frozenset()):
+        i = 0
+        while i < len(tokens):
+            kind, text = tokens[i]
+            if _is(tokens[i], "(") and i + 1 < len(tokens) and _is(tokens[i + 1], "SELECT", "WITH"):
+                end = _matching_paren(tokens, i)
+                self.query(tokens[i + 1:end], scope, ctes)
+                i = end + 1
+                continue
+            if kind not in ("word", "quoted") or (kind == "word" and text in KEYWORDS):
+                i += 1
+                continue
+            if i > 0 and _is(tokens[i - 1], "AS"):
+                i += 1  # CAST(x AS type)
+                continue
+
+            names = [text]
+            j = i + 1
+            while j + 1 < len(tokens) and _is(tokens[j], ".") and tokens[j + 1][0] in ("word", "quoted", "op"):
+                if _is(tokens[j + 1], "*"):
+                    names.append("*")
+                    j += 2
+                    break
+                names.append(tokens[j + 1][1])
+                j += 2
+            if j < len(tokens) and (_is(tokens[j], "(") or _is(tokens[j], "=>")):
+                i = j  # function call / named argument
+                continue
+            self._column(names, scope, allowed)
+            i = j
+
+    def _column(self, names, scope, allowed):
+        column = names[-1]
+        if column == "*" or column in PSEUDO_COLUMNS:
+            return
+        if len(names) == 1:
+            if column in allowed:
+                return
+            self._unqualified(column, scope)
+            return
+
+        qualifier = names[-2]
+        owner_scope, table = scope.resolve(qualifier)
+        if owner_scope is None:
+            self.report("unknown_alias", f"{qualifier}.{column}: {qualifier} is not a table or alias in the FROM clause.")
+            return
+        if table is None or not self.check_identifiers or table in ALWAYS_KNOWN_TABLES:
+            return
+        if column not in self.tables.get(table, set()):
+            self.report("unknown_column", f"Column {column} does not exist in {table} ({qualifier}.{column}).")
+
+    def _unqualified(self, column, scope):
+        current = scope
+        while current is not None:
+            owners = [alias for alias, table in current.sources.items() if table is not None and column in self.tables.get(table, set())]
+            if len(owners) > 1:
+                self.report("ambiguous_column", f"Column {column} exists in {', '.join(sorted(owners))}; qualify it with a table alias.")
+                return
+            if owners:
+                return
+            if any(table is None for table in current.sources.values()):
+                return  # may come from a subquery, CTE or unknown table
+            current = current.parent
+        if self.check_identifiers:
+            self.report("unknown_column", f"Column {column} does not exist in any table of the query.")
+
+    # -- joins ------------------------------------------------------------
+
+    def _aliases_in(self, tokens, scope):
+        """Local aliases referenced by a predicate (qualified or resolvable unqualified columns)."""
+        found = set()
+        for i, token in enumerate(tokens):
+            if token[0] not in ("word", "quoted") or token[1] in KEYWORDS:
+                continue
+            if i + 1 < len(tokens) and _is(tokens[i + 1], "."):
+                alias = scope.local_alias(token[1])
+                if alias is not None:
+                    found.add(alias)
+                continue
+            if i > 0 and _is(tokens[i - 1], "."):
+                continue
+            owners = [alias for alias, table in scope.sources.items() if table is not None and token[1] in self.tables.get(table, set())]
+            if len(owners) == 1:
+                found.add(owners[0])
+        return found
+
+    def _check_cartesian(self, items, joins, where_tokens, scope):
+        aliases = [alias for alias, _, _ in items]
+        if len(aliases) < 2:
+            return
+        parent = {alias: alias for alias in aliases}
+
+        def find(alias):
+            while parent[alias] != alias:
+                alias = parent[alias]
+            return alias
+
+        def union(group):
+            group = [a for a in group if a in parent]
+            for other in group[1:]:
+                parent[find(other)] = find(group[0])
+
+        for index, (alias, linked_by, on_tokens) in enumerate(items):
+            if index and linked_by == "cross":
+                union([alias, aliases[index - 1]])
+            elif on_tokens:
+                union([alias] + sorted(self._aliases_in(on_tokens, scope)))
+
+        for conjunct in _split_top(where_tokens, lambda ts, i: _is(ts[i], "AND")):
+            union(sorted(self._aliases_in(conjunct, scope)))
+
+        groups = {}
+        for alias in aliases:
+            groups.setdefault(find(alias), []).append(alias)
+        if len(groups) > 1:
+            described = " | ".join(", ".join(group) for group in groups.values())
+            self.report("cartesian_product", f"No join predicate connects these table groups: {described}.")
+
+
+def validate_sql(sql, table_column_map):
+    """
+    Returns a list of {"kind", "message"} issues for an Oracle SELECT:
+    unknown_table, unknown_column, unknown_alias, ambiguous_column,
+    duplicate_alias, cartesian_product or parse_error. Identifier checks are
+    skipped when table_column_map is empty (no metadata loaded).
+    """
+    tokens = tokenize(sql or "")
+    while tokens and _is(tokens[-1], ";"):
+        tokens = tokens[:-1]
+    validator = _Validator(table_column_map)
+    if not tokens:
+        return [_issue("parse_error", "Empty SQL statement.")]
+    validator.query(tokens)
+    return validator.issues
+
+
+def format_issues(issues):
+    return "\n".join(f"- {issue['message']}" for issue in issues)